@@ -9,8 +9,19 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
+from roleplay.clients import client_registry
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
 
 application = get_asgi_application()
+
+# 첫 요청이 TCP/TLS 연결 비용을 치르지 않도록 공유 클라이언트를 미리 준비 (관리 명령에서는 실행하지 않음)
+client_registry.warmup()
+
+# runserver와 동일하게 개발 환경에서는 정적 파일도 함께 서빙
+if settings.DEBUG:
+    application = ASGIStaticFilesHandler(application)
@@ -98,6 +98,24 @@ DATABASES = {
     # },
 }
 
+# 캐시 (대화 기록 캐시 창, 사용량 제한 상태 등) - 여러 워커 프로세스가 상태를 공유하려면 REDIS_URL 설정
+# (redis 패키지 필요). 비워두면 프로세스별 메모리 캐시(LocMemCache)를 사용하며 배포 점검(check --deploy)에서 경고
+REDIS_URL = os.environ.get("REDIS_URL", "")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -151,6 +169,96 @@ CRISPY_TEMPLATE_PACK = "tailwind"
 
 # API Keys
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL", "")
+
+# OpenAI 클라이언트 커넥션 풀 (roleplay.clients)
+OPENAI_CLIENT_POOL = {
+    "MAX_CONNECTIONS": 100,
+    "MAX_KEEPALIVE_CONNECTIONS": 20,
+    "KEEPALIVE_EXPIRY": 30.0,
+    "TIMEOUT": 60.0,
+    "CONNECT_TIMEOUT": 5.0,
+    "WARMUP_CONNECTIONS": int(os.environ.get("OPENAI_WARMUP_CONNECTIONS", "0")),
+}
+
+# 채팅 응답 캐시 (roleplay.cache) - 온도가 MAX_TEMPERATURE 이하인 요청만 캐시
+# BACKEND: "lru" (프로세스 메모리) 또는 "django" (CACHE_ALIAS 캐시 백엔드, 워커 간 공유)
+ROLEPLAY_RESPONSE_CACHE = {
+    "BACKEND": os.environ.get("ROLEPLAY_RESPONSE_CACHE_BACKEND", "lru"),
+    "TTL": 60 * 60,
+    "MAX_TEMPERATURE": 0.3,
+    "MAX_ENTRIES": 1000,
+}
+
+# LLM 엔드포인트 사용자별 사용량 제한 (roleplay.ratelimit) - 상태는 CACHE_ALIAS 캐시에 저장
+# 여러 워커 프로세스에서 제한이 유지되려면 공유 캐시 백엔드(Redis, Memcached 등)를 사용
+ROLEPLAY_RATE_LIMIT = {
+    "ENABLED": os.environ.get("ROLEPLAY_RATE_LIMIT", "1") == "1",
+    "REQUESTS_PER_MINUTE": 20,
+    "REQUEST_BURST": 10,
+    "TOKENS_PER_MINUTE": 40_000,
+    "TOKEN_BURST": 40_000,
+    "MAX_CONCURRENT_STREAMS": 2,
+    "CACHE_ALIAS": "default",
+}
+
+# 채팅 API 호출의 재시도/시도별 제한 시간/서킷 브레이커 (roleplay.resilience)
+# 재시도는 일시적인 오류(타임아웃, 연결 오류, 429, 5xx)만, 대기 시간은 BASE_DELAY * 2^n (최대 MAX_DELAY) 범위의 난수
+# 최근 WINDOW_SIZE번 호출의 실패율이 FAILURE_RATE_THRESHOLD 이상이면 OPEN_SECONDS 동안 호출하지 않고 바로 실패
+ROLEPLAY_RESILIENCE = {
+    "MAX_ATTEMPTS": 3,
+    "BASE_DELAY": 0.5,
+    "MAX_DELAY": 4.0,
+    "ATTEMPT_TIMEOUT": 30.0,
+    "CONNECT_TIMEOUT": 5.0,
+    "FAILURE_RATE_THRESHOLD": 0.5,
+    "WINDOW_SIZE": 20,
+    "MINIMUM_CALLS": 10,
+    "OPEN_SECONDS": 30.0,
+}
+
+# 지연 시간 기반 모델 라우팅 (roleplay.routing)
+# 세션 모델의 최근 TTFT(PERCENTILE 백분위수)가 TTFT_TARGET초를 넘거나 생성 속도(중앙값)가 MIN_TOKENS_PER_SECOND보다
+# 느리면 FALLBACKS의 대체 모델로 먼저 요청하고, 세션 모델 요청이 실패해도 같은 턴에서 대체 모델로 다시 요청
+# (대체 모델의 비용이 더 비싸지 않도록 FALLBACKS에는 같거나 저렴한 모델만 지정)
+ROLEPLAY_MODEL_ROUTING = {
+    "ENABLED": os.environ.get("ROLEPLAY_MODEL_ROUTING", "") == "1",
+    "FALLBACKS": {"gpt-4o": "gpt-4o-mini"},
+    "TTFT_TARGET": 3.0,
+    "MIN_TOKENS_PER_SECOND": 10.0,
+    "PERCENTILE": 90,
+    "WINDOW_SECONDS": 120.0,
+    "MINIMUM_SAMPLES": 5,
+}
+
+# 채팅 턴 단계별 소요 시간 span 기록 (roleplay.tracing)
+# SINKS: logging(roleplay.tracing 로거), ring_buffer(최근 RING_BUFFER_SIZE개 보관, /roleplay/tracing-stats/ 통계)
+# EXPORTER: span을 받을 함수의 dotted path (예: OpenTelemetry, StatsD로 내보내기)
+ROLEPLAY_TRACING = {
+    "ENABLED": os.environ.get("ROLEPLAY_TRACING", "") == "1",
+    "SINKS": ["logging", "ring_buffer"],
+    "RING_BUFFER_SIZE": 1000,
+    "EXPORTER": None,
+}
+
+# 추천 표현 생성 방식 (roleplay.core.PhraseSuggester)
+# SEPARATE이면 대화 모델은 응답 text만 일반 텍스트로 생성하고, 추천 표현은 advice 패널이 요청할 때
+# MODEL(저렴한 모델)로 따로 생성하여 assistant 메시지별로 캐시. 꺼져 있으면 대화 모델이 응답과 함께 생성
+ROLEPLAY_SUGGESTED_PHRASES = {
+    "SEPARATE": os.environ.get("ROLEPLAY_SEPARATE_PHRASES", "") == "1",
+    "MODEL": "gpt-4o-mini",
+    "MAX_TOKENS": 200,
+    "CONTEXT_MESSAGES": 6,
+}
+
+# 부하 테스트용 가짜 LLM 백엔드 (roleplay.fake_llm) - ENABLED이면 OpenAI API 대신 프로세스 내부에서 응답
+# TTFT: 첫 토큰까지의 시간(초), TOKENS_PER_SECOND: 생성 속도, ERROR_RATE: 500 오류 비율
+ROLEPLAY_FAKE_LLM = {
+    "ENABLED": os.environ.get("ROLEPLAY_FAKE_LLM", "") == "1",
+    "TTFT": float(os.environ.get("ROLEPLAY_FAKE_LLM_TTFT", "0.3")),
+    "TOKENS_PER_SECOND": float(os.environ.get("ROLEPLAY_FAKE_LLM_TOKENS_PER_SECOND", "50")),
+    "ERROR_RATE": float(os.environ.get("ROLEPLAY_FAKE_LLM_ERROR_RATE", "0")),
+}
 
 # Authentication settings
 LOGIN_URL = "accounts:login"
@@ -11,6 +11,11 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from roleplay.clients import client_registry
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
 
 application = get_wsgi_application()
+
+# 첫 요청이 TCP/TLS 연결 비용을 치르지 않도록 공유 클라이언트를 미리 준비 (관리 명령에서는 실행하지 않음)
+client_registry.warmup()
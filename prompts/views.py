@@ -3,8 +3,8 @@ from django.db.models import Q
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods, require_POST
 from django.views.decorators.csrf import csrf_exempt
-from django.conf import settings
-from openai import OpenAI
+from roleplay.clients import get_openai_client
+from roleplay.ratelimit import RateLimiter, RateLimitExceeded
 from .models import Prompt
 from .forms import PromptForm
 
@@ -152,6 +152,18 @@ def poem_view(request):
         # 시 생성 처리
         message = request.POST.get("message", "").strip()
 
+        rate_limiter = RateLimiter.from_settings()
+        client_key = RateLimiter.client_key(request)
+        if message and rate_limiter:
+            try:
+                rate_limiter.acquire(client_key)
+            except RateLimitExceeded as e:
+                response = render(
+                    request, "prompts/partials/poem_response.html", {"poem": str(e), "theme": message}, status=429
+                )
+                response["Retry-After"] = str(e.retry_after)
+                return response
+
         if message:
             try:
                 # 시 작성을 위한 프롬프트
@@ -163,7 +175,7 @@ def poem_view(request):
 - 감성적이고 서정적인 표현
 - 한국어의 아름다움을 살린 표현"""
 
-                client = OpenAI(api_key=settings.OPENAI_API_KEY)
+                client = get_openai_client()
                 response = client.chat.completions.create(
                     model="gpt-4o-mini",
                     messages=[{"role": "user", "content": poem_prompt}],
@@ -171,8 +183,13 @@ def poem_view(request):
                     temperature=0.9,  # 창의성을 위해 온도 높임
                 )
                 ai_response = response.choices[0].message.content
+                if rate_limiter and response.usage:
+                    rate_limiter.charge(client_key, response.usage.prompt_tokens + response.usage.completion_tokens)
             except Exception as e:
                 ai_response = f"오류가 발생했습니다: {str(e)}"
+            finally:
+                if rate_limiter:
+                    rate_limiter.release(client_key)
         else:
             ai_response = "시의 주제를 입력해주세요."
 
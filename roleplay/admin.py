@@ -13,7 +13,7 @@ admin.site.site_title = "파이콘 2025"
 class ChatSessionAdmin(admin.ModelAdmin):
     """채팅 세션 Admin (읽기 전용)"""
 
-    list_display = ["id", "title_display", "user", "model", "created_at"]
+    list_display = ["id", "title_display", "user", "model", "input_tokens", "output_tokens", "created_at"]
     list_filter = ["model", "created_at"]
     search_fields = ["title", "instruction", "user__username"]
     date_hierarchy = "created_at"
@@ -26,6 +26,9 @@ class ChatSessionAdmin(admin.ModelAdmin):
         "model",
         "temperature",
         "max_tokens",
+        "input_tokens",
+        "output_tokens",
+        "cached_input_tokens",
         "created_at",
         "updated_at",
     ]
@@ -34,6 +37,7 @@ class ChatSessionAdmin(admin.ModelAdmin):
         ("기본 정보", {"fields": ("user", "title")}),
         ("시스템 프롬프트", {"fields": ("instruction",)}),
         ("AI 모델 설정", {"fields": ("model", "temperature", "max_tokens")}),
+        ("토큰 사용량", {"fields": ("input_tokens", "output_tokens", "cached_input_tokens")}),
         (
             "타임스탬프",
             {
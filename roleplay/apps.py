@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RoleplayConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "roleplay"
+
+    def ready(self):
+        from . import checks  # noqa: F401
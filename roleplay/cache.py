@@ -0,0 +1,196 @@
+"""
+Deterministic response cache for ChatService.
+
+같은 모델/설정/시스템 프롬프트/대화 내용으로 다시 요청하면 API를 호출하지 않고
+저장된 응답을 돌려줍니다. 온도가 낮은 (결정적인) 요청만 캐시합니다.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class BaseResponseCache(ABC):
+    """응답 캐시의 추상 기반 클래스
+
+    저장되는 값은 JSON 직렬화 가능한 dict이며, ChatResponse 변환은 ChatService가 담당합니다.
+    """
+
+    def __init__(self, ttl: Optional[float] = 3600, max_temperature: float = 0.3):
+        """
+        Args:
+            ttl: 캐시 유지 시간 (초, None이면 만료 없음)
+            max_temperature: 이 온도 이하의 요청만 캐시 (높은 온도는 매번 다른 응답을 기대)
+        """
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(request: dict) -> str:
+        """모델, 온도, 최대 토큰, 메시지 목록(시스템 프롬프트 포함)의 해시
+
+        구조화된 출력 없이(일반 텍스트로) 요청한 응답은 추천 표현이 없으므로 다른 키를 사용합니다.
+        """
+        values = {
+            "model": request["model"],
+            "temperature": request["temperature"],
+            "max_tokens": request["max_tokens"],
+            "messages": request["messages"],
+        }
+        if "response_format" not in request:
+            values["plain_text"] = True
+        payload = json.dumps(
+            values,
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, request: dict) -> bool:
+        return request["temperature"] <= self.max_temperature
+
+    def lookup(self, key: str) -> Optional[dict]:
+        """캐시 조회 후 적중/미스 집계"""
+        value = self.get(key)
+        self._record(value is not None)
+        return value
+
+    async def alookup(self, key: str) -> Optional[dict]:
+        """캐시 조회 후 적중/미스 집계 (비동기)"""
+        value = await self.aget(key)
+        self._record(value is not None)
+        return value
+
+    def _record(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[dict]:
+        """저장된 값 반환 (없거나 만료되었으면 None)"""
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: dict) -> None:
+        """값 저장"""
+        pass
+
+    async def aget(self, key: str) -> Optional[dict]:
+        return self.get(key)
+
+    async def aset(self, key: str, value: dict) -> None:
+        self.set(key, value)
+
+
+class LRUResponseCache(BaseResponseCache):
+    """프로세스 메모리 기반 LRU 캐시"""
+
+    def __init__(self, max_entries: int = 1000, **kwargs):
+        super().__init__(**kwargs)
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[Optional[float], dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "entries": len(self._entries), "max_entries": self.max_entries}
+
+
+class DjangoResponseCache(BaseResponseCache):
+    """Django 캐시 백엔드 기반 캐시 (여러 워커 프로세스가 공유)
+
+    최대 항목 수는 settings.CACHES 에서 해당 캐시 백엔드의 MAX_ENTRIES 옵션으로 제한합니다.
+    """
+
+    KEY_PREFIX = "roleplay:response:"
+
+    def __init__(self, cache_alias: str = "default", max_entries: Optional[int] = None, **kwargs):
+        # max_entries는 LRU 캐시와 같은 설정을 쓸 수 있도록 받기만 하고 백엔드 설정을 따름
+        super().__init__(**kwargs)
+        self.cache_alias = cache_alias
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.cache.get(self.KEY_PREFIX + key)
+
+    def set(self, key: str, value: dict) -> None:
+        self.cache.set(self.KEY_PREFIX + key, value, timeout=self.ttl)
+
+    async def aget(self, key: str) -> Optional[dict]:
+        return await self.cache.aget(self.KEY_PREFIX + key)
+
+    async def aset(self, key: str, value: dict) -> None:
+        await self.cache.aset(self.KEY_PREFIX + key, value, timeout=self.ttl)
+
+
+RESPONSE_CACHE_BACKENDS = {
+    "lru": LRUResponseCache,
+    "django": DjangoResponseCache,
+}
+
+_response_cache: Optional[BaseResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[BaseResponseCache]:
+    """settings.ROLEPLAY_RESPONSE_CACHE 설정으로 만든 프로세스 공유 캐시 (설정이 없으면 None)"""
+    global _response_cache
+
+    options = getattr(settings, "ROLEPLAY_RESPONSE_CACHE", None)
+    if not options:
+        return None
+
+    with _response_cache_lock:
+        if _response_cache is None:
+            options = {key.lower(): value for key, value in options.items()}
+            backend_class = RESPONSE_CACHE_BACKENDS[options.pop("backend", "lru")]
+            _response_cache = backend_class(**options)
+    return _response_cache
@@ -0,0 +1,53 @@
+"""
+System checks for the roleplay app.
+
+CachedChatHistoryStore와 RateLimiter는 워커 간에 공유되는 캐시를 전제로 합니다. 프로세스별 캐시(LocMemCache 등)에서는
+다른 워커가 저장한 메시지가 캐시 창에 보이지 않고 사용량 제한이 워커마다 따로 적용되므로,
+배포 점검(manage.py check --deploy)에서 경고합니다.
+"""
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .ratelimit import RateLimitConfig
+
+# 워커 프로세스끼리 상태를 공유하지 않는 캐시 백엔드
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def _is_process_local(alias: str) -> bool:
+    """alias 캐시가 프로세스별 백엔드인지 여부"""
+    backend = settings.CACHES.get(alias, {}).get("BACKEND", "")
+    return backend in PROCESS_LOCAL_CACHE_BACKENDS
+
+
+@register(Tags.caches, deploy=True)
+def check_history_cache(app_configs, **kwargs):
+    """대화 기록 캐시 창(CachedChatHistoryStore)이 공유 캐시를 사용하는지 확인"""
+    if not _is_process_local("default"):
+        return []
+    return [
+        Warning(
+            "CachedChatHistoryStore가 프로세스별 캐시('default')를 사용합니다.",
+            hint="여러 워커 프로세스로 실행하면 REDIS_URL을 설정해 공유 캐시를 사용하세요.",
+            id="roleplay.W001",
+        )
+    ]
+
+
+@register(Tags.caches, deploy=True)
+def check_rate_limit_cache(app_configs, **kwargs):
+    """사용량 제한(RateLimiter) 상태를 저장하는 캐시가 공유 캐시인지 확인"""
+    config = RateLimitConfig.from_settings()
+    if config is None or not _is_process_local(config.cache_alias):
+        return []
+    return [
+        Warning(
+            f"사용량 제한이 프로세스별 캐시('{config.cache_alias}')를 사용합니다.",
+            hint="여러 워커 프로세스로 실행하면 REDIS_URL을 설정해 공유 캐시를 사용하세요.",
+            id="roleplay.W002",
+        )
+    ]
@@ -0,0 +1,314 @@
+"""
+Process-wide OpenAI client registry.
+
+OpenAI 클라이언트는 각자 HTTP 커넥션 풀을 가지므로, 요청마다 새로 만들면
+매번 TCP/TLS 연결을 새로 맺게 됩니다. 이 모듈은 (api_key, base_url) 별로
+클라이언트를 하나씩만 만들어 프로세스 전체에서 keep-alive 연결을 재사용합니다.
+"""
+
+import asyncio
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+from django.conf import settings
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+from roleplay.fake_llm import AsyncFakeLLMTransport, FakeLLMBackend, FakeLLMConfig, FakeLLMTransport
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ClientPoolConfig:
+    """HTTP 커넥션 풀 설정"""
+
+    max_connections: int = 100  # 동시에 열 수 있는 최대 연결 수
+    max_keepalive_connections: int = 20  # 유휴 상태로 유지할 최대 연결 수
+    keepalive_expiry: float = 30.0  # 유휴 연결 유지 시간 (초)
+    timeout: float = 60.0  # 요청 전체 타임아웃 (초)
+    connect_timeout: float = 5.0  # 연결 수립 타임아웃 (초)
+    warmup_connections: int = 0  # 시작 시 미리 맺어둘 연결 수 (0이면 비활성화)
+
+    @classmethod
+    def from_settings(cls) -> "ClientPoolConfig":
+        """settings.OPENAI_CLIENT_POOL 에서 설정 로드"""
+        options = getattr(settings, "OPENAI_CLIENT_POOL", {})
+        return cls(**{key.lower(): value for key, value in options.items()})
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    @property
+    def httpx_timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+
+@dataclass
+class PoolStats:
+    """커넥션 풀 사용 통계"""
+
+    requests: int = 0  # 풀을 통해 보낸 요청 수
+    new_connections: int = 0  # 새로 맺은 연결 수
+    connections_in_use: int = 0  # 현재 요청을 처리 중인 연결 수
+    idle_connections: int = 0  # keep-alive 상태로 대기 중인 연결 수
+
+    @property
+    def reuse_ratio(self) -> float:
+        """기존 연결을 재사용한 요청의 비율"""
+        if not self.requests:
+            return 0.0
+        return max(self.requests - self.new_connections, 0) / self.requests
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "connections_in_use": self.connections_in_use,
+            "idle_connections": self.idle_connections,
+            "reuse_ratio": round(self.reuse_ratio, 4),
+        }
+
+
+class _ConnectionTracker:
+    """httpx 이벤트 훅으로 요청 수와 새 연결 수를 집계"""
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self._lock = threading.Lock()
+        # 연결마다 하나씩 존재하는 network_stream 객체로 연결 재사용 여부를 판별
+        self._seen_streams = weakref.WeakSet()
+
+    def record(self, response: httpx.Response) -> None:
+        network_stream = response.extensions.get("network_stream")
+        with self._lock:
+            self.requests += 1
+            if network_stream is None:
+                return
+            if network_stream not in self._seen_streams:
+                self._seen_streams.add(network_stream)
+                self.new_connections += 1
+
+    def on_response(self, response: httpx.Response) -> None:
+        self.record(response)
+
+    async def on_async_response(self, response: httpx.Response) -> None:
+        self.record(response)
+
+
+class _PooledClient:
+    """레지스트리에 등록된 클라이언트와 풀 통계 정보"""
+
+    def __init__(self, client: OpenAI | AsyncOpenAI, http_client: httpx.Client | httpx.AsyncClient, tracker):
+        self.client = client
+        self.http_client = http_client
+        self.tracker = tracker
+
+    def stats(self) -> PoolStats:
+        stats = PoolStats(requests=self.tracker.requests, new_connections=self.tracker.new_connections)
+
+        # httpx는 풀 상태를 공개 API로 노출하지 않으므로 transport의 httpcore 풀을 직접 조회
+        pool = getattr(getattr(self.http_client, "_transport", None), "_pool", None)
+        for connection in getattr(pool, "connections", []):
+            if connection.is_closed():
+                continue
+            if connection.is_idle():
+                stats.idle_connections += 1
+            else:
+                stats.connections_in_use += 1
+
+        return stats
+
+
+class OpenAIClientRegistry:
+    """(api_key, base_url) 별 OpenAI 클라이언트를 공유하는 레지스트리
+
+    비동기 클라이언트의 연결은 이벤트 루프에 묶이므로 루프마다 따로 보관합니다.
+    ASGI 서버에서는 프로세스당 루프가 하나이므로 결과적으로 풀도 하나입니다.
+    WSGI에서는 요청마다 루프가 새로 만들어지므로, 루프가 끝날 때 그 루프의 클라이언트를 닫아
+    연결이 남지 않도록 합니다 (이 경우 비동기 클라이언트의 keep-alive 재사용은 요청 안으로 한정됩니다).
+    """
+
+    def __init__(self, config: Optional[ClientPoolConfig] = None):
+        self._config = config
+        self._lock = threading.Lock()
+        self._clients: dict[tuple, _PooledClient] = {}
+        self._async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._warmup_tasks: set[asyncio.Task] = set()
+        self._loop_watchers: set[asyncio.Task] = set()
+        self._fake_backend: Optional[FakeLLMBackend] = None
+
+    @property
+    def config(self) -> ClientPoolConfig:
+        if self._config is None:
+            self._config = ClientPoolConfig.from_settings()
+        return self._config
+
+    def _transport_options(self, is_async: bool = False) -> dict:
+        """settings.ROLEPLAY_FAKE_LLM이 켜져 있으면 네트워크 대신 가짜 백엔드로 응답하는 transport 사용"""
+        fake_config = FakeLLMConfig.from_settings()
+        if fake_config is None:
+            return {}
+        if self._fake_backend is None or self._fake_backend.config != fake_config:
+            self._fake_backend = FakeLLMBackend(fake_config)
+        transport_class = AsyncFakeLLMTransport if is_async else FakeLLMTransport
+        return {"transport": transport_class(self._fake_backend)}
+
+    @staticmethod
+    def _resolve(api_key: Optional[str], base_url: Optional[str]) -> tuple[str, Optional[str]]:
+        if api_key is None:
+            api_key = settings.OPENAI_API_KEY
+        if base_url is None:
+            base_url = getattr(settings, "OPENAI_BASE_URL", None) or None
+        return api_key, base_url
+
+    def get_client(self, api_key: Optional[str] = None, base_url: Optional[str] = None) -> OpenAI:
+        """공유 동기 클라이언트 반환 (없으면 생성)"""
+        key = self._resolve(api_key, base_url)
+
+        with self._lock:
+            pooled = self._clients.get(key)
+            if pooled is None:
+                tracker = _ConnectionTracker()
+                http_client = DefaultHttpxClient(
+                    limits=self.config.limits,
+                    timeout=self.config.httpx_timeout,
+                    event_hooks={"response": [tracker.on_response]},
+                    **self._transport_options(),
+                )
+                client = OpenAI(api_key=key[0], base_url=key[1], http_client=http_client)
+                pooled = self._clients[key] = _PooledClient(client, http_client, tracker)
+
+        return pooled.client
+
+    def get_async_client(self, api_key: Optional[str] = None, base_url: Optional[str] = None) -> AsyncOpenAI:
+        """현재 이벤트 루프용 공유 비동기 클라이언트 반환 (없으면 생성)"""
+        key = self._resolve(api_key, base_url)
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            loop_clients = self._async_clients.get(loop)
+            if loop_clients is None:
+                loop_clients = self._async_clients[loop] = {}
+                self._close_with_loop(loop)
+            pooled = loop_clients.get(key)
+            if pooled is None:
+                tracker = _ConnectionTracker()
+                http_client = DefaultAsyncHttpxClient(
+                    limits=self.config.limits,
+                    timeout=self.config.httpx_timeout,
+                    event_hooks={"response": [tracker.on_async_response]},
+                    **self._transport_options(is_async=True),
+                )
+                client = AsyncOpenAI(api_key=key[0], base_url=key[1], http_client=http_client)
+                pooled = loop_clients[key] = _PooledClient(client, http_client, tracker)
+                self._schedule_async_warmup(loop, client)
+
+        return pooled.client
+
+    def _close_with_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """루프가 끝날 때 (asyncio.run 등이 남은 태스크를 취소할 때) 그 루프의 비동기 클라이언트를 닫음"""
+
+        async def close_on_exit():
+            try:
+                await loop.create_future()
+            finally:
+                with self._lock:
+                    loop_clients = self._async_clients.pop(loop, {})
+                for pooled in loop_clients.values():
+                    await pooled.client.close()
+
+        task = loop.create_task(close_on_exit())
+        # 루프가 끝날 때까지 태스크가 GC 되지 않도록 참조 유지
+        self._loop_watchers.add(task)
+        task.add_done_callback(self._loop_watchers.discard)
+
+    def warmup(self, api_key: Optional[str] = None, base_url: Optional[str] = None) -> None:
+        """시작 시 클라이언트를 만들고 설정된 수만큼 연결을 미리 맺어둠
+
+        서버 진입점(mysite/asgi.py, mysite/wsgi.py)에서 호출하므로 관리 명령에서는 실행되지 않습니다.
+        연결 수립은 백그라운드 스레드에서 수행하므로 서버 시작을 지연시키지 않습니다.
+        """
+        client = self.get_client(api_key, base_url)
+        connections = self.config.warmup_connections
+        if connections <= 0:
+            return
+
+        def connect(_):
+            try:
+                client.models.list()
+            except Exception as e:
+                logger.warning("OpenAI connection warmup failed: %s", e)
+
+        def run():
+            with ThreadPoolExecutor(max_workers=connections) as executor:
+                list(executor.map(connect, range(connections)))
+
+        threading.Thread(target=run, name="openai-client-warmup", daemon=True).start()
+
+    def _schedule_async_warmup(self, loop: asyncio.AbstractEventLoop, client: AsyncOpenAI) -> None:
+        """비동기 풀은 이벤트 루프가 떠 있어야 만들 수 있으므로, 처음 생성될 때 백그라운드로 연결을 미리 맺음"""
+        connections = self.config.warmup_connections
+        if connections <= 0:
+            return
+
+        async def connect():
+            try:
+                await client.models.list()
+            except Exception as e:
+                logger.warning("OpenAI connection warmup failed: %s", e)
+
+        for _ in range(connections):
+            task = loop.create_task(connect())
+            # 완료 전에 태스크가 GC 되지 않도록 참조 유지
+            self._warmup_tasks.add(task)
+            task.add_done_callback(self._warmup_tasks.discard)
+
+    def stats(self) -> dict[str, dict]:
+        """base_url 별 커넥션 풀 통계 (API 키는 노출하지 않음)"""
+        with self._lock:
+            pooled_clients = list(self._clients.values())
+            for loop_clients in self._async_clients.values():
+                pooled_clients.extend(loop_clients.values())
+
+        totals: dict[str, PoolStats] = {}
+        for pooled in pooled_clients:
+            stats = pooled.stats()
+            total = totals.setdefault(str(pooled.client.base_url), PoolStats())
+            total.requests += stats.requests
+            total.new_connections += stats.new_connections
+            total.connections_in_use += stats.connections_in_use
+            total.idle_connections += stats.idle_connections
+
+        return {base_url: stats.to_dict() for base_url, stats in totals.items()}
+
+    def close(self) -> None:
+        """등록된 동기 클라이언트를 모두 닫음"""
+        with self._lock:
+            pooled_clients = list(self._clients.values())
+            self._clients.clear()
+        for pooled in pooled_clients:
+            pooled.client.close()
+
+
+client_registry = OpenAIClientRegistry()
+
+
+def get_openai_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> OpenAI:
+    """프로세스 공유 OpenAI 클라이언트 반환"""
+    return client_registry.get_client(api_key, base_url)
+
+
+def get_async_openai_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> AsyncOpenAI:
+    """프로세스(이벤트 루프) 공유 AsyncOpenAI 클라이언트 반환"""
+    return client_registry.get_async_client(api_key, base_url)
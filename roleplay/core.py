@@ -3,18 +3,29 @@ Django-independent core classes for the roleplay application.
 This module can be used with any Python framework.
 """
 
+import asyncio
+import time
 from abc import ABC, abstractmethod
+from contextlib import aclosing, closing
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-from typing import Optional, Literal, cast
+from typing import AsyncGenerator, Generator, Iterable, Optional, Literal, cast
 from uuid import uuid4
 
 from django.conf import settings
-from openai import OpenAI
-from openai.types.chat import ChatCompletionMessageParam
+from openai import AsyncOpenAI, OpenAI
+from openai.types.chat import ChatCompletionMessageParam, ParsedChatCompletion
 from pydantic import BaseModel
 
+from roleplay.cache import BaseResponseCache
+from roleplay.clients import get_async_openai_client, get_openai_client
+from roleplay.resilience import CircuitOpenError, Resilience, get_resilience, is_retryable
+from roleplay.routing import ModelRouter
+from roleplay.partial_json import ChatResponseStreamParser, PlainTextStreamParser
+from roleplay.tokens import count_message_tokens, get_context_window
+from roleplay.tracing import Tracer, get_tracer
+
 
 class Difficulty(Enum):
     """난이도 레벨"""
@@ -30,10 +41,17 @@ class UsageInfo:
 
     input_tokens: int
     output_tokens: int
+    cached_input_tokens: int = 0  # 입력 토큰 중 제공자의 프롬프트 캐시(prefix)에서 처리된 토큰 수
+    cached: bool = False  # 응답 캐시에서 가져온 경우 True (토큰 수는 원래 요청 기준, 실제 과금 없음)
+    model: Optional[str] = None  # 응답을 생성한 모델 (라우팅으로 대체 모델이 응답했을 수 있음)
 
     def __str__(self) -> str:
         """토큰 사용량을 읽기 쉬운 문자열로 반환"""
-        return f"Input: {self.input_tokens}, Output: {self.output_tokens}, Total: {self.total_tokens}"
+        usage = (
+            f"Input: {self.input_tokens} (Cached: {self.cached_input_tokens}), "
+            f"Output: {self.output_tokens}, Total: {self.total_tokens}"
+        )
+        return f"{usage} (cached)" if self.cached else usage
 
     @property
     def total_tokens(self) -> int:
@@ -57,6 +75,14 @@ class ChatResponse(BaseModel):
         return self.text
 
 
+@dataclass(frozen=True)
+class SuggestedPhrase:
+    """스트리밍 중에 완성된 추천 표현 하나 (send_stream(include_phrases=True)에서 yield)"""
+
+    index: int  # suggested_phrases 안에서의 순서 (0부터)
+    text: str
+
+
 @dataclass
 class Message:
     """대화 메시지를 나타내는 데이터 클래스"""
@@ -66,6 +92,44 @@ class Message:
     created_at: datetime = field(default_factory=datetime.now)
     usage: Optional[UsageInfo] = None  # Assistant 메시지인 경우 사용량 정보 포함
     dom_id: str = field(default_factory=lambda: f"id_{uuid4().hex}")
+    id: Optional[int] = None  # 저장소에서 부여한 식별자 (저장 순서대로 증가)
+    token_count: Optional[int] = None  # 컨텍스트에서 차지하는 토큰 수 (저장 시 함께 기록)
+    latency_ms: Optional[int] = None  # Assistant 메시지인 경우 응답 생성에 걸린 시간 (밀리초)
+    truncated: bool = False  # 클라이언트 연결이 끊겨 생성을 중단한 (받은 데까지만 저장된) 응답
+
+    def get_token_count(self) -> int:
+        """토큰 수 반환 (기록된 값이 없으면 추정)"""
+        if self.token_count is None:
+            self.token_count = count_message_tokens(self.content)
+        return self.token_count
+
+
+def pack_messages(newest_first: Iterable[Message], token_budget: int) -> list[Message]:
+    """최신 메시지부터 토큰 예산 안에 들어가는 만큼 채워 시간순으로 반환
+
+    가장 최근 메시지(현재 사용자 입력)는 예산을 넘더라도 항상 포함합니다.
+
+    Args:
+        newest_first: 최신순으로 정렬된 메시지들 (필요한 만큼만 소비)
+        token_budget: 대화 기록에 쓸 수 있는 최대 토큰 수
+    """
+    packed: list[Message] = []
+    used_tokens = 0
+    for message in newest_first:
+        used_tokens += message.get_token_count()
+        if packed and used_tokens > token_budget:
+            break
+        packed.append(message)
+    packed.reverse()
+    return packed
+
+
+@dataclass
+class ConversationSummary:
+    """컨텍스트 윈도우 밖으로 밀려난 대화의 누적 요약"""
+
+    text: str = ""
+    until_id: Optional[int] = None  # 요약에 포함된 (컨텍스트에서 제외된) 마지막 메시지 id
 
 
 class BaseChatConfig(ABC):
@@ -133,22 +197,252 @@ class SimpleChatConfig(BaseChatConfig):
         return self.instruction
 
 
+class ConversationSummarizer:
+    """컨텍스트 윈도우 밖으로 밀려난 메시지를 기존 요약에 점진적으로 합치는 요약기
+
+    전체 대화를 매번 다시 요약하지 않고, 새로 밀려난 메시지만 기존 요약에 합칩니다.
+    """
+
+    PROMPT_TEMPLATE = """You maintain a running summary of a conversation between a user and an assistant.
+Update the summary with the new messages below. Keep facts, names, preferences, decisions and open
+questions that later turns may depend on. Write in the language of the conversation, in under {max_words} words.
+
+[Current summary]
+{summary}
+
+[New messages]
+{messages}"""
+
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini",
+        api_key: str = None,
+        base_url: str = None,
+        threshold_tokens: int = 1000,
+        max_tokens: int = 500,
+    ):
+        """
+        Args:
+            model: 요약에 사용할 (저렴한) 모델
+            threshold_tokens: 요약되지 않은 채 밀려난 메시지가 이 토큰 수를 넘으면 요약
+            max_tokens: 요약 응답의 최대 토큰 수
+        """
+        self.model = model
+        self.api_key = api_key
+        self.base_url = base_url
+        self.threshold_tokens = threshold_tokens
+        self.max_tokens = max_tokens
+
+    def needs_summary(self, evicted: list[Message]) -> bool:
+        """밀려난 메시지가 요약할 만큼 쌓였는지 여부"""
+        return sum(message.get_token_count() for message in evicted) >= self.threshold_tokens
+
+    def _build_request(self, summary: str, messages: list[Message]) -> dict:
+        transcript = "\n".join(f"{message.role}: {message.content}" for message in messages)
+        prompt = self.PROMPT_TEMPLATE.format(
+            max_words=self.max_tokens // 2,
+            summary=summary or "(empty)",
+            messages=transcript,
+        )
+        return {
+            "messages": [{"role": "user", "content": prompt}],
+            "model": self.model,
+            "temperature": 0.0,
+            "max_tokens": self.max_tokens,
+        }
+
+    def summarize(self, summary: str, messages: list[Message]) -> str:
+        """기존 요약에 새 메시지들을 합친 요약 반환"""
+        client = get_openai_client(api_key=self.api_key, base_url=self.base_url)
+        completion = client.chat.completions.create(**self._build_request(summary, messages))
+        return completion.choices[0].message.content.strip()
+
+    async def asummarize(self, summary: str, messages: list[Message]) -> str:
+        """기존 요약에 새 메시지들을 합친 요약 반환 (비동기)"""
+        client = get_async_openai_client(api_key=self.api_key, base_url=self.base_url)
+        completion = await client.chat.completions.create(**self._build_request(summary, messages))
+        return completion.choices[0].message.content.strip()
+
+
+class SuggestedPhrases(BaseModel):
+    """PhraseSuggester의 구조화된 응답 형식"""
+
+    suggested_phrases: list[str]
+
+
+class PhraseSuggester:
+    """대화에 이어 사용자가 쓸 수 있는 표현을 대화 모델과 따로 (저렴한 모델로) 생성
+
+    ChatService(inline_phrases=False)로 응답 text만 먼저 생성하고, 추천 표현은 필요할 때 따로 만듭니다.
+    """
+
+    PROMPT_TEMPLATE = """The user is practicing a conversation in the role-play below.
+Suggest 3-5 short phrases the user could say next in reply to the assistant's last message.
+Write them in the language of the conversation.
+
+[Role-play instruction]
+{instruction}
+
+[Recent messages]
+{messages}"""
+
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini",
+        api_key: str = None,
+        base_url: str = None,
+        max_tokens: int = 200,
+        context_messages: int = 6,
+    ):
+        """
+        Args:
+            model: 추천 표현 생성에 사용할 (저렴한) 모델
+            max_tokens: 응답의 최대 토큰 수
+            context_messages: 프롬프트에 넣을 최근 메시지 수
+        """
+        self.model = model
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_tokens = max_tokens
+        self.context_messages = context_messages
+
+    @classmethod
+    def from_settings(cls) -> Optional["PhraseSuggester"]:
+        """settings.ROLEPLAY_SUGGESTED_PHRASES 에서 설정 로드 (SEPARATE가 꺼져 있으면 None)"""
+        options = getattr(settings, "ROLEPLAY_SUGGESTED_PHRASES", None)
+        if not options or not options.get("SEPARATE"):
+            return None
+        return cls(
+            model=options.get("MODEL", "gpt-4o-mini"),
+            max_tokens=options.get("MAX_TOKENS", 200),
+            context_messages=options.get("CONTEXT_MESSAGES", 6),
+        )
+
+    def _build_request(self, instruction: str, messages: list[Message]) -> dict:
+        recent = messages[-self.context_messages :]
+        transcript = "\n".join(f"{message.role}: {message.content}" for message in recent)
+        prompt = self.PROMPT_TEMPLATE.format(instruction=instruction or "(none)", messages=transcript)
+        return {
+            "messages": [{"role": "user", "content": prompt}],
+            "model": self.model,
+            "temperature": 0.7,
+            "max_tokens": self.max_tokens,
+            "response_format": SuggestedPhrases,
+        }
+
+    @staticmethod
+    def _parse_completion(completion: ParsedChatCompletion) -> list[str]:
+        parsed = completion.choices[0].message.parsed
+        return parsed.suggested_phrases if parsed else []
+
+    def suggest(self, instruction: str, messages: list[Message]) -> list[str]:
+        """대화(마지막은 assistant 메시지)에 이어 쓸 수 있는 표현 목록 반환"""
+        client = get_openai_client(api_key=self.api_key, base_url=self.base_url)
+        completion = client.beta.chat.completions.parse(**self._build_request(instruction, messages))
+        return self._parse_completion(completion)
+
+    async def asuggest(self, instruction: str, messages: list[Message]) -> list[str]:
+        """대화(마지막은 assistant 메시지)에 이어 쓸 수 있는 표현 목록 반환 (비동기)"""
+        client = get_async_openai_client(api_key=self.api_key, base_url=self.base_url)
+        completion = await client.beta.chat.completions.parse(**self._build_request(instruction, messages))
+        return self._parse_completion(completion)
+
+
+@dataclass
+class StreamTiming:
+    """스트리밍 시도 하나의 시각 기록 (time.perf_counter() 값)"""
+
+    started_at: float = 0.0
+    first_delta_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self.first_delta_at = None
+        self.finished_at = None
+
+    def mark_delta(self) -> None:
+        if self.first_delta_at is None:
+            self.first_delta_at = time.perf_counter()
+
+    def finish(self) -> None:
+        self.finished_at = time.perf_counter()
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """첫 text 증가분까지의 시간 (초)"""
+        return self.first_delta_at - self.started_at if self.first_delta_at is not None else None
+
+    @property
+    def total_seconds(self) -> float:
+        """요청부터 응답 완료까지의 시간 (초)"""
+        return self.finished_at - self.started_at if self.finished_at is not None else 0.0
+
+    @property
+    def generation_seconds(self) -> float:
+        """첫 text 증가분부터 응답 완료까지의 시간 (초)"""
+        if self.finished_at is None:
+            return 0.0
+        return self.finished_at - (self.first_delta_at if self.first_delta_at is not None else self.started_at)
+
+
 class ChatService:
     """Framework-independent chat service"""
 
+    # 입력 토큰 상한을 지정하지 않았을 때, 최대 응답 토큰 대비 대화 기록 예산 배수
+    HISTORY_BUDGET_RATIO = 4
+
+    # 이전 대화 요약을 시스템 프롬프트 다음에 넣을 때 사용하는 형식
+    SUMMARY_TEMPLATE = "Summary of the earlier conversation:\n{summary}"
+
+    # 대화 기록이 예산을 넘었을 때 컨텍스트에 남길 최근 메시지의 비율.
+    # 컨텍스트 시작점을 매 턴 한 칸씩 밀지 않고 한 번에 크게 옮겨서, 그 사이의 턴들은
+    # 요청 앞부분(prefix)이 바이트 단위로 같아 제공자의 프롬프트 캐시를 사용할 수 있습니다.
+    CONTEXT_RETAIN_RATIO = 0.5
+
     def __init__(
         self,
         config: BaseChatConfig,
         chat_history_store: Optional["BaseChatHistoryStore"] = None,
         api_key: str = None,
+        base_url: str = None,
         model: str = "gpt-4o",
         temperature: float = 1.0,
         max_tokens: int = 1000,
-        verbose: bool = False,
+        max_input_tokens: Optional[int] = None,
+        summarizer: Optional[ConversationSummarizer] = None,
+        response_cache: Optional[BaseResponseCache] = None,
+        prompt_cache_key: Optional[str] = None,
+        client: Optional[OpenAI | AsyncOpenAI] = None,
+        resilience: Optional[Resilience] = None,
+        router: Optional[ModelRouter] = None,
+        tracer: Optional[Tracer] = None,
+        inline_phrases: bool = True,
     ):
+        """
+        Args:
+            prompt_cache_key: 같은 prefix를 공유하는 요청들을 묶는 키 (예: 세션별 키).
+                제공자가 같은 캐시로 라우팅하여 프롬프트 캐시 적중률을 높입니다.
+            client: 사용할 OpenAI 클라이언트 (AsyncChatService는 AsyncOpenAI).
+                지정하지 않으면 프로세스 공유 클라이언트를 사용합니다.
+                (예: roleplay.fake_llm transport를 쓰는 클라이언트로 오프라인 부하 테스트)
+            resilience: API 호출의 재시도/시도별 제한 시간/서킷 브레이커 정책.
+                지정하지 않으면 settings.ROLEPLAY_RESILIENCE 설정과 모델별 공유 서킷 브레이커를 사용합니다.
+            router: 모델별 지연 시간을 기준으로 요청할 모델을 고르고, 실패하면 대체 모델로 넘기는 라우터.
+                지정하지 않으면 model로만 요청합니다.
+            tracer: 턴의 단계별 소요 시간을 span으로 기록할 tracer.
+                지정하지 않으면 settings.ROLEPLAY_TRACING 설정을 사용합니다 (설정이 없으면 기록하지 않음).
+            inline_phrases: 추천 표현을 응답과 함께 구조화된 출력(ChatResponse JSON)으로 생성할지 여부.
+                False이면 응답 text만 일반 텍스트로 생성하고 suggested_phrases는 비워 둡니다
+                (추천 표현은 PhraseSuggester로 따로 생성).
+        """
         self.config = config
         self.chat_history_store = chat_history_store
-        self.verbose = verbose
+        self.summarizer = summarizer
+        self.response_cache = response_cache
+        self.prompt_cache_key = prompt_cache_key
+        self.tracer = tracer if tracer is not None else get_tracer()
+        self.inline_phrases = inline_phrases
 
         if api_key is None:
             self.api_key = settings.OPENAI_API_KEY
@@ -158,16 +452,45 @@ class ChatService:
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
-        self.client = OpenAI(api_key=self.api_key)
+        self.base_url = base_url
+        self.router = router
+        self.resilience = resilience if resilience is not None else get_resilience(model)
+        self._custom_resilience = resilience is not None
+        # 재시도는 resilience 정책으로만 하도록 SDK 자체 재시도는 끄고 시도별 제한 시간 적용
+        client = client if client is not None else self._get_client()
+        self.client = client.with_options(**self.resilience.client_options)
 
         # Build system prompt once during initialization
         self._system_prompt = config.build_system_prompt()
 
+        # 대화 기록에 쓸 토큰 예산: 모델 컨텍스트에서 응답과 시스템 프롬프트 몫을 뺀 값을
+        # 입력 상한(기본값: 최대 응답 토큰의 HISTORY_BUDGET_RATIO 배)으로 제한
+        if max_input_tokens is None:
+            max_input_tokens = max_tokens * self.HISTORY_BUDGET_RATIO
+        available_tokens = get_context_window(model) - max_tokens
+        self.history_token_budget = min(available_tokens, max_input_tokens) - count_message_tokens(
+            self._system_prompt, model
+        )
+
     @property
     def system_prompt(self) -> str:
         """Get the system prompt"""
         return self._system_prompt
 
+    def _get_client(self) -> OpenAI:
+        """프로세스 공유 클라이언트 사용 (요청마다 커넥션 풀을 새로 만들지 않음)"""
+        return get_openai_client(api_key=self.api_key, base_url=self.base_url)
+
+    def prepare_request(self, message: str) -> dict:
+        """send()가 보낼 API 요청 인자 (저장소의 요약과 대화 기록 포함, API 호출과 저장은 하지 않음)
+
+        Batch API처럼 요청을 모아 따로 보내는 경우에 사용합니다.
+        """
+        summary, history = ConversationSummary(), None
+        if self.chat_history_store:
+            summary, history = self._load_context(self._new_message("user", message))
+        return self._build_request(message, history, summary)
+
     def send(self, message: str) -> ChatResponse:
         """OpenAI API 호출 (구조화된 응답)
 
@@ -177,85 +500,659 @@ class ChatService:
         Returns:
             ChatResponse 객체
         """
-        # 사용자 메시지를 저장
-        user_message = Message(role="user", content=message)
-        if self.chat_history_store:
-            self.chat_history_store.add_message(user_message)
+        with self.tracer.span("chat.turn", model=self.model, stream=False):
+            # 컨텍스트로 쓸 요약과 최근 대화 조회 (사용자 메시지는 응답과 함께 저장)
+            summary, history = ConversationSummary(), None
+            user_message = self._new_message("user", message)
+            if self.chat_history_store:
+                with self.tracer.span("history.read"):
+                    summary, history = self._load_context(user_message)
+
+            # 같은 요청의 캐시된 응답이 없을 때만 OpenAI API 호출 (구조화된 응답)
+            with self.tracer.span("prompt.build") as span:
+                request = self._build_request(message, history, summary)
+                span["messages"] = len(request["messages"])
+            cache_key = self._cache_key(request)
+            started_at = time.perf_counter()
+            chat_response = self._cached_response(self.response_cache.lookup(cache_key)) if cache_key else None
+            if chat_response is None:
+                chat_response = self._complete(request)
+                if cache_key:
+                    self.response_cache.set(cache_key, chat_response.to_dict())
+
+            # 사용자 메시지와 assistant 응답(text와 usage 정보 포함)을 한 번에 저장
+            if self.chat_history_store:
+                with self.tracer.span("history.write"):
+                    assistant_message = self._assistant_message(chat_response, started_at)
+                    self.chat_history_store.add_messages([user_message, assistant_message])
+                    self.chat_history_store.flush()
+                with self.tracer.span("history.compact"):
+                    self._compact_history(summary, history)
+
+            return chat_response
+
+    def send_stream(
+        self, message: str, include_phrases: bool = False
+    ) -> Generator[str | SuggestedPhrase | ChatResponse, None, None]:
+        """OpenAI API 스트리밍 호출 (구조화된 응답)
+
+        응답의 text 필드가 생성되는 대로 증가분(delta) 문자열을 yield 하고,
+        마지막으로 사용량 정보가 포함된 ChatResponse 객체를 yield 합니다.
+
+        Args:
+            message: 사용자 메시지
+            include_phrases: suggested_phrases의 항목이 완성될 때마다 SuggestedPhrase 객체도 yield
+
+        Yields:
+            text 증가분 문자열들 (include_phrases이면 SuggestedPhrase 객체들도), 마지막에 ChatResponse 객체
+        """
+        with self.tracer.span("chat.turn", model=self.model, stream=True):
+            summary, history = ConversationSummary(), None
+            user_message = self._new_message("user", message)
+            if self.chat_history_store:
+                with self.tracer.span("history.read"):
+                    summary, history = self._load_context(user_message)
+
+            with self.tracer.span("prompt.build") as span:
+                request = self._build_request(message, history, summary)
+                span["messages"] = len(request["messages"])
+            cache_key = self._cache_key(request)
+            started_at = time.perf_counter()
+            chat_response = self._cached_response(self.response_cache.lookup(cache_key)) if cache_key else None
+            if chat_response is not None:
+                # 캐시 적중: 전체 텍스트를 한 번에 전달
+                yield chat_response.text
+                if include_phrases:
+                    for index, phrase in enumerate(chat_response.suggested_phrases):
+                        yield SuggestedPhrase(index, phrase)
+            else:
+                text = ""
+                try:
+                    # 스트림을 닫으면 진행 중인 API 응답도 바로 닫아 남은 생성을 받지 않음
+                    with closing(self._stream_response(request)) as stream:
+                        for chunk in stream:
+                            if isinstance(chunk, ChatResponse):
+                                chat_response = chunk
+                            elif isinstance(chunk, SuggestedPhrase):
+                                if include_phrases:
+                                    yield chunk
+                            else:
+                                text += chunk
+                                yield chunk
+                except GeneratorExit:
+                    # 클라이언트 연결이 끊겨 소비하던 쪽이 스트림을 닫음: 받은 데까지만 저장
+                    if self.chat_history_store:
+                        with self.tracer.span("history.write", truncated=True):
+                            messages = self._truncated_messages(user_message, text, started_at)
+                            self.chat_history_store.add_messages(messages)
+                            self.chat_history_store.flush()
+                    raise
+
+                if cache_key:
+                    self.response_cache.set(cache_key, chat_response.to_dict())
+
+            if self.chat_history_store:
+                with self.tracer.span("history.write"):
+                    assistant_message = self._assistant_message(chat_response, started_at)
+                    self.chat_history_store.add_messages([user_message, assistant_message])
+
+            try:
+                yield chat_response
+            finally:
+                # 응답 전송이 끝나면 (클라이언트가 연결을 끊었더라도) 지연 쓰기 저장소의 메시지를 저장
+                if self.chat_history_store:
+                    with self.tracer.span("history.flush"):
+                        self.chat_history_store.flush()
+
+            # 응답을 모두 전달한 뒤 요약하여 사용자 대기 시간에 포함되지 않도록 함
+            if self.chat_history_store:
+                with self.tracer.span("history.compact"):
+                    self._compact_history(summary, history)
+
+    def _complete(self, request: dict) -> ChatResponse:
+        """라우팅, 재시도, 서킷 브레이커를 적용한 구조화된 응답 API 호출"""
+        models = self._route()
+        for index, model in enumerate(models):
+            started_at = time.perf_counter()
+            try:
+                completion = self._call(
+                    self._resilience_for(model),
+                    lambda: self.client.beta.chat.completions.parse(**{**request, "model": model}),
+                )
+            except Exception as e:
+                if not self._should_fall_back(e, models, index):
+                    raise
+                continue
+
+            with self.tracer.span("response.parse"):
+                chat_response = self._parse_completion(completion)
+            elapsed = time.perf_counter() - started_at
+            self._record_served(model, chat_response, None, elapsed, elapsed)
+            return chat_response
+
+    def _stream_response(self, request: dict) -> Generator[str | SuggestedPhrase | ChatResponse, None, None]:
+        """라우팅, 재시도, 서킷 브레이커를 적용한 스트리밍 API 호출
+
+        text 증가분 문자열들과 완성된 추천 표현들, 마지막에 ChatResponse 객체를 yield 합니다.
+        text를 하나라도 보낸 뒤의 오류는 (이미 보낸 내용과 중복되므로) 재시도하거나 다른 모델로 넘기지 않습니다.
+        """
+        models = self._route()
+        for index, model in enumerate(models):
+            timing = StreamTiming()
+            try:
+                for chunk in self._stream_attempts(self._resilience_for(model), {**request, "model": model}, timing):
+                    if isinstance(chunk, (str, SuggestedPhrase)):
+                        yield chunk
+                    else:
+                        completion = chunk
+            except Exception as e:
+                if timing.first_delta_at is not None or not self._should_fall_back(e, models, index):
+                    raise
+                continue
+
+            with self.tracer.span("response.parse"):
+                chat_response = self._parse_completion(completion)
+            self._record_served(model, chat_response, timing.ttft, timing.generation_seconds, timing.total_seconds)
+            yield chat_response
+            return
+
+    def _call(self, resilience: Resilience, func):
+        """재시도 정책과 서킷 브레이커를 적용하여 API 호출"""
+        for attempt in resilience.attempts():
+            try:
+                result = func()
+            except Exception as e:
+                delay = resilience.failure_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+            else:
+                resilience.record_success()
+                return result
+
+    def _stream_attempts(
+        self, resilience: Resilience, request: dict, timing: "StreamTiming"
+    ) -> Generator[str | SuggestedPhrase | ParsedChatCompletion, None, None]:
+        """재시도 정책과 서킷 브레이커를 적용한 스트리밍 API 호출
+
+        text 증가분 문자열들과 완성된 추천 표현들, 마지막에 완성된 completion 객체를 yield 하고,
+        마지막 시도의 시각을 timing에 기록
+        """
+        for attempt in resilience.attempts():
+            timing.start()
+            try:
+                with self.client.beta.chat.completions.stream(
+                    **request, stream_options={"include_usage": True}
+                ) as stream:
+                    parser = self._stream_parser()
+                    for event in stream:
+                        for chunk in self._stream_chunks(parser, event):
+                            timing.mark_delta()
+                            yield chunk
+
+                    completion = stream.get_final_completion()
+            except Exception as e:
+                delay = resilience.failure_delay(e, attempt, retry=timing.first_delta_at is None)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+            else:
+                resilience.record_success()
+                timing.finish()
+                yield completion
+                return
+
+    def _route(self) -> list[str]:
+        """요청할 모델 순서 (라우터가 없으면 세션 모델만)"""
+        return self.router.route(self.model) if self.router else [self.model]
+
+    def _resilience_for(self, model: str) -> Resilience:
+        """모델별 서킷 브레이커 (resilience를 직접 지정했으면 모든 모델에 같은 정책 사용)"""
+        if model == self.model or self._custom_resilience:
+            return self.resilience
+        return get_resilience(model)
+
+    def _should_fall_back(self, exc: Exception, models: list[str], index: int) -> bool:
+        """models[index] 요청의 실패를 다음 모델로 넘길지 여부 (일시적인 오류나 열린 서킷만)"""
+        if index + 1 >= len(models) or not (is_retryable(exc) or isinstance(exc, CircuitOpenError)):
+            return False
+        self.router.record_error(models[index], exc, fallback=models[index + 1])
+        return True
+
+    def _record_served(
+        self,
+        model: str,
+        chat_response: ChatResponse,
+        ttft: Optional[float],
+        generation_seconds: float,
+        total_seconds: float,
+    ) -> None:
+        """응답한 모델을 사용량 정보에 남기고 라우터와 tracer에 지연 시간 기록"""
+        usage = chat_response.usage
+        # API 호출은 스트리밍 제너레이터 안에서 yield를 사이에 두고 진행되므로 with span 대신 측정값으로 기록
+        self.tracer.record("llm.call", total_seconds, model=model)
+        if ttft is not None:
+            self.tracer.record("llm.ttft", ttft, model=model)
+        if usage:
+            usage.model = model
+        if self.router:
+            tokens_per_second = usage.output_tokens / generation_seconds if usage and generation_seconds > 0 else None
+            self.router.record(model, ttft=ttft, tokens_per_second=tokens_per_second, fallback=model != self.model)
+
+    def _history_budget(self, summary: ConversationSummary) -> int:
+        """요약이 차지하는 토큰을 뺀 대화 기록 예산"""
+        if not summary.text:
+            return self.history_token_budget
+        return self.history_token_budget - count_message_tokens(summary.text, self.model)
+
+    def _retain_budget(self, summary: ConversationSummary) -> int:
+        """컨텍스트 시작점을 옮길 때 남길 최근 메시지의 토큰 예산"""
+        return int(self._history_budget(summary) * self.CONTEXT_RETAIN_RATIO)
+
+    def _load_context(self, user_message: Message) -> tuple[ConversationSummary, list[Message]]:
+        """저장된 요약과, 요약 이후의 메시지 중 예산 안에 들어가는 최근 메시지 조회
+
+        아직 저장하지 않은 현재 사용자 메시지는 메모리의 사본을 대화 기록 끝에 붙입니다.
+        요약 이후의 메시지가 모두 예산 안에 들어가면 컨텍스트는 매 턴 뒤에만 덧붙여지므로
+        이전 요청과 같은 prefix를 유지합니다.
+        """
+        store = self.chat_history_store
+        summary = store.get_summary()
+        budget = self._history_budget(summary) - user_message.get_token_count()
+        history = store.get_recent_messages(budget, after_id=summary.until_id) if budget > 0 else []
+        history.append(user_message)
+        return summary, history
+
+    def _compact_history(self, summary: ConversationSummary, history: list[Message]) -> None:
+        """대화 기록이 예산을 넘었으면 컨텍스트 시작점을 한 번에 옮김
+
+        요약기가 있으면 밀려난 메시지를 기존 요약에 합쳐 저장하고, 없으면 시작점만 옮깁니다.
+        """
+        if not history or history[0].id is None:
+            return
+
+        store = self.chat_history_store
+        if not store.has_messages_between(after_id=summary.until_id, before_id=history[0].id):
+            return
+
+        retained = store.get_recent_messages(self._retain_budget(summary), after_id=summary.until_id)
+        if self.summarizer is None:
+            self._save_context_start(ConversationSummary(text=summary.text, until_id=retained[0].id - 1))
+            return
+
+        evicted = store.get_messages_between(after_id=summary.until_id, before_id=retained[0].id)
+        if not self.summarizer.needs_summary(evicted):
+            return
+
+        text = self.summarizer.summarize(summary.text, evicted)
+        store.save_summary(ConversationSummary(text=text, until_id=evicted[-1].id))
+
+    def _save_context_start(self, summary: ConversationSummary) -> None:
+        try:
+            self.chat_history_store.save_summary(summary)
+        except NotImplementedError:
+            # 요약을 저장할 수 없는 저장소는 매 턴 예산 안의 최근 메시지만 사용
+            pass
+
+    def _build_request(
+        self,
+        message: str,
+        history: Optional[list[Message]],
+        summary: Optional[ConversationSummary] = None,
+    ) -> dict:
+        """API 요청 인자 구성 (동기/비동기 서비스 공용)
 
-        # 메시지 구성
+        Args:
+            message: 사용자 메시지
+            history: 컨텍스트로 사용할 대화 기록 (저장소가 없으면 None)
+            summary: 컨텍스트 윈도우 이전 대화의 요약
+        """
+        # 메시지 구성: 고정된 시스템 프롬프트 → 요약 → 시간순 대화 기록 순서로,
+        # 턴마다 바뀌는 내용을 앞쪽에 두지 않아 제공자의 프롬프트 캐시(prefix)를 재사용
         messages: list[ChatCompletionMessageParam] = []
 
         if self.system_prompt:
             messages.append(cast(ChatCompletionMessageParam, {"role": "system", "content": self.system_prompt}))
 
-        if self.chat_history_store:
-            # 최근 10개 메시지만 컨텍스트로 사용
-            recent_messages = self.chat_history_store.get_messages(limit=10)
+        if summary and summary.text:
+            summary_prompt = self.SUMMARY_TEMPLATE.format(summary=summary.text)
+            messages.append(cast(ChatCompletionMessageParam, {"role": "system", "content": summary_prompt}))
+
+        if history is not None:
             messages.extend(
-                [
-                    cast(ChatCompletionMessageParam, {"role": msg.role, "content": msg.content})
-                    for msg in recent_messages
-                ]
+                [cast(ChatCompletionMessageParam, {"role": msg.role, "content": msg.content}) for msg in history]
             )
         else:
             # No history store, just add the current message
             messages.append(cast(ChatCompletionMessageParam, {"role": "user", "content": message}))
 
-        # Verbose 모드 출력
-        if self.verbose:
-            print("\n" + "=" * 50)
-            print("=== VERBOSE MODE ===")
-            print("=" * 50)
-            print("\n[System Prompt]")
-            print("-" * 50)
-            print(self.system_prompt)
-            print("-" * 50)
-
-            print("\n[Messages to OpenAI API]")
-            print("-" * 50)
-            for i, msg in enumerate(messages, 1):
-                role = msg["role"]
-                content = msg["content"]
-                # 긴 메시지는 축약해서 표시
-                if len(content) > 200 and role != "user":
-                    content = content[:200] + "..."
-                print(f"{i}. {role}: {content}")
-            print("-" * 50)
-
-            print("\n[API Configuration]")
-            print(f"- Model: {self.model}")
-            print(f"- Temperature: {self.temperature}")
-            print(f"- Max Tokens: {self.max_tokens}")
-            print("=" * 50 + "\n")
-
-        # OpenAI API 호출 (구조화된 응답)
-        completion = self.client.beta.chat.completions.parse(
-            messages=messages,
-            model=self.model,
-            temperature=self.temperature,
-            max_tokens=self.max_tokens,
-            response_format=ChatResponse,
-        )
-
-        # 구조화된 응답 가져오기
-        role_play_response = completion.choices[0].message.parsed
+        request = {
+            "messages": messages,
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+        }
+        if self.inline_phrases:
+            request["response_format"] = ChatResponse
+        if self.prompt_cache_key:
+            request["prompt_cache_key"] = self.prompt_cache_key
+        return request
+
+    def _cache_key(self, request: dict) -> Optional[str]:
+        """응답 캐시 키 (캐시가 없거나 캐시하지 않는 요청이면 None)"""
+        if self.response_cache is None or not self.response_cache.is_cacheable(request):
+            return None
+        return self.response_cache.make_key(request)
+
+    @staticmethod
+    def _cached_response(value: Optional[dict]) -> Optional[ChatResponse]:
+        """캐시에 저장된 값을 사용량이 cached로 표시된 ChatResponse로 복원"""
+        if value is None:
+            return None
+        chat_response = ChatResponse.model_validate(value)
+        if chat_response.usage:
+            chat_response.usage.cached = True
+        return chat_response
+
+    def _stream_parser(self) -> ChatResponseStreamParser | PlainTextStreamParser:
+        """스트리밍 응답의 파서 (추천 표현을 따로 생성하면 일반 텍스트)"""
+        return ChatResponseStreamParser() if self.inline_phrases else PlainTextStreamParser()
+
+    @staticmethod
+    def _stream_chunks(parser: ChatResponseStreamParser | PlainTextStreamParser, event) -> list[str | SuggestedPhrase]:
+        """스트림 이벤트에서 text 증가분과 새로 완성된 추천 표현 추출
+
+        SDK의 parsed 값은 닫히지 않은 문자열을 버리므로 JSON을 직접 증분 파싱합니다.
+        스냅샷은 뒤에만 덧붙으므로 파서가 아직 받지 않은 부분만 넘깁니다.
+        """
+        if event.type != "content.delta":
+            return []
+        delta, phrases = parser.feed(event.snapshot[parser.received :])
+        chunks: list[str | SuggestedPhrase] = [delta] if delta else []
+        start = len(parser.phrases) - len(phrases)
+        chunks.extend(SuggestedPhrase(start + offset, phrase) for offset, phrase in enumerate(phrases))
+        return chunks
+
+    @staticmethod
+    def _parse_completion(completion: ParsedChatCompletion) -> ChatResponse:
+        """완료된 응답에서 사용량 정보가 포함된 ChatResponse 추출"""
+
+        # 구조화된 응답 가져오기 (response_format 없이 요청했으면 일반 텍스트를 text로 사용)
+        message = completion.choices[0].message
+        role_play_response = message.parsed
+        if role_play_response is None:
+            role_play_response = ChatResponse(text=message.content or "", suggested_phrases=[])
 
         # 사용량 정보 추출
-        usage_info = None
         if hasattr(completion, "usage") and completion.usage:
-            usage_info = UsageInfo(
+            prompt_tokens_details = getattr(completion.usage, "prompt_tokens_details", None)
+            role_play_response.usage = UsageInfo(
                 input_tokens=completion.usage.prompt_tokens,
                 output_tokens=completion.usage.completion_tokens,
+                cached_input_tokens=getattr(prompt_tokens_details, "cached_tokens", None) or 0,
             )
-            role_play_response.usage = usage_info
-
-        # assistant 응답 저장 (text와 usage 정보 포함)
-        if self.chat_history_store:
-            assistant_message = Message(role="assistant", content=role_play_response.text, usage=usage_info)
-            self.chat_history_store.add_message(assistant_message)
 
         return role_play_response
 
+    def _new_message(self, role: str, content: str, usage: Optional[UsageInfo] = None) -> Message:
+        """토큰 수가 기록된 저장용 메시지 생성 (이후 컨텍스트 구성 시 다시 토큰화하지 않음)"""
+        return Message(role=role, content=content, usage=usage, token_count=count_message_tokens(content, self.model))
+
+    def _assistant_message(self, chat_response: ChatResponse, started_at: float) -> Message:
+        """저장할 assistant 메시지 생성 (started_at: 응답 요청을 시작한 time.perf_counter() 값)"""
+        message = self._new_message("assistant", chat_response.text, chat_response.usage)
+        message.latency_ms = round((time.perf_counter() - started_at) * 1000)
+        return message
+
+    def _truncated_messages(self, user_message: Message, text: str, started_at: float) -> list[Message]:
+        """생성 도중 중단된 턴에서 저장할 메시지 (받은 text가 없으면 사용자 메시지만)
+
+        API 사용량은 응답 마지막에 전달되므로 중단된 응답에는 기록하지 않습니다.
+        """
+        if not text:
+            return [user_message]
+        message = self._new_message("assistant", text)
+        message.latency_ms = round((time.perf_counter() - started_at) * 1000)
+        message.truncated = True
+        return [user_message, message]
+
+
+class AsyncChatService(ChatService):
+    """AsyncOpenAI 기반 비동기 채팅 서비스
+
+    ASGI 환경에서 LLM 응답을 기다리는 동안 스레드를 점유하지 않도록
+    API 호출과 대화 기록 저장소 접근을 모두 await 합니다.
+    """
+
+    def _get_client(self) -> AsyncOpenAI:
+        return get_async_openai_client(api_key=self.api_key, base_url=self.base_url)
+
+    async def send(self, message: str) -> ChatResponse:
+        """OpenAI API 비동기 호출 (구조화된 응답)
+
+        Args:
+            message: 사용자 메시지
+
+        Returns:
+            ChatResponse 객체
+        """
+        with self.tracer.span("chat.turn", model=self.model, stream=False):
+            summary, history = ConversationSummary(), None
+            user_message = self._new_message("user", message)
+            if self.chat_history_store:
+                with self.tracer.span("history.read"):
+                    summary, history = await self._aload_context(user_message)
+
+            with self.tracer.span("prompt.build") as span:
+                request = self._build_request(message, history, summary)
+                span["messages"] = len(request["messages"])
+            cache_key = self._cache_key(request)
+            started_at = time.perf_counter()
+            chat_response = self._cached_response(await self.response_cache.alookup(cache_key)) if cache_key else None
+            if chat_response is None:
+                chat_response = await self._acomplete(request)
+                if cache_key:
+                    await self.response_cache.aset(cache_key, chat_response.to_dict())
+
+            if self.chat_history_store:
+                with self.tracer.span("history.write"):
+                    assistant_message = self._assistant_message(chat_response, started_at)
+                    await self.chat_history_store.aadd_messages([user_message, assistant_message])
+                    await self.chat_history_store.aflush()
+                with self.tracer.span("history.compact"):
+                    await self._acompact_history(summary, history)
+
+            return chat_response
+
+    async def send_stream(
+        self, message: str, include_phrases: bool = False
+    ) -> AsyncGenerator[str | SuggestedPhrase | ChatResponse, None]:
+        """OpenAI API 비동기 스트리밍 호출 (구조화된 응답)
+
+        Args:
+            message: 사용자 메시지
+            include_phrases: suggested_phrases의 항목이 완성될 때마다 SuggestedPhrase 객체도 yield
+
+        Yields:
+            text 증가분 문자열들 (include_phrases이면 SuggestedPhrase 객체들도), 마지막에 ChatResponse 객체
+        """
+        with self.tracer.span("chat.turn", model=self.model, stream=True):
+            summary, history = ConversationSummary(), None
+            user_message = self._new_message("user", message)
+            if self.chat_history_store:
+                with self.tracer.span("history.read"):
+                    summary, history = await self._aload_context(user_message)
+
+            with self.tracer.span("prompt.build") as span:
+                request = self._build_request(message, history, summary)
+                span["messages"] = len(request["messages"])
+            cache_key = self._cache_key(request)
+            started_at = time.perf_counter()
+            chat_response = self._cached_response(await self.response_cache.alookup(cache_key)) if cache_key else None
+            if chat_response is not None:
+                yield chat_response.text
+                if include_phrases:
+                    for index, phrase in enumerate(chat_response.suggested_phrases):
+                        yield SuggestedPhrase(index, phrase)
+            else:
+                text = ""
+                try:
+                    async with aclosing(self._astream_response(request)) as stream:
+                        async for chunk in stream:
+                            if isinstance(chunk, ChatResponse):
+                                chat_response = chunk
+                            elif isinstance(chunk, SuggestedPhrase):
+                                if include_phrases:
+                                    yield chunk
+                            else:
+                                text += chunk
+                                yield chunk
+                except (GeneratorExit, asyncio.CancelledError):
+                    # 스트림이 닫히거나 (소비하던 쪽이 연결 끊김으로 정리) 태스크가 취소됨 (API 응답을 기다리는 중):
+                    # 진행 중인 API 응답은 닫혔으므로 받은 데까지만 저장
+                    if self.chat_history_store:
+                        with self.tracer.span("history.write", truncated=True):
+                            messages = self._truncated_messages(user_message, text, started_at)
+                            await self.chat_history_store.aadd_messages(messages)
+                            await self.chat_history_store.aflush()
+                    raise
+
+                if cache_key:
+                    await self.response_cache.aset(cache_key, chat_response.to_dict())
+
+            if self.chat_history_store:
+                with self.tracer.span("history.write"):
+                    assistant_message = self._assistant_message(chat_response, started_at)
+                    await self.chat_history_store.aadd_messages([user_message, assistant_message])
+
+            try:
+                yield chat_response
+            finally:
+                if self.chat_history_store:
+                    with self.tracer.span("history.flush"):
+                        await self.chat_history_store.aflush()
+
+            if self.chat_history_store:
+                with self.tracer.span("history.compact"):
+                    await self._acompact_history(summary, history)
+
+    async def _acomplete(self, request: dict) -> ChatResponse:
+        models = self._route()
+        for index, model in enumerate(models):
+            started_at = time.perf_counter()
+            try:
+                completion = await self._acall(
+                    self._resilience_for(model),
+                    lambda: self.client.beta.chat.completions.parse(**{**request, "model": model}),
+                )
+            except Exception as e:
+                if not self._should_fall_back(e, models, index):
+                    raise
+                continue
+
+            with self.tracer.span("response.parse"):
+                chat_response = self._parse_completion(completion)
+            elapsed = time.perf_counter() - started_at
+            self._record_served(model, chat_response, None, elapsed, elapsed)
+            return chat_response
+
+    async def _astream_response(self, request: dict) -> AsyncGenerator[str | SuggestedPhrase | ChatResponse, None]:
+        models = self._route()
+        for index, model in enumerate(models):
+            timing = StreamTiming()
+            try:
+                async for chunk in self._astream_attempts(
+                    self._resilience_for(model), {**request, "model": model}, timing
+                ):
+                    if isinstance(chunk, (str, SuggestedPhrase)):
+                        yield chunk
+                    else:
+                        completion = chunk
+            except Exception as e:
+                if timing.first_delta_at is not None or not self._should_fall_back(e, models, index):
+                    raise
+                continue
+
+            with self.tracer.span("response.parse"):
+                chat_response = self._parse_completion(completion)
+            self._record_served(model, chat_response, timing.ttft, timing.generation_seconds, timing.total_seconds)
+            yield chat_response
+            return
+
+    async def _acall(self, resilience: Resilience, func):
+        for attempt in resilience.attempts():
+            try:
+                result = await func()
+            except Exception as e:
+                delay = resilience.failure_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+            else:
+                resilience.record_success()
+                return result
+
+    async def _astream_attempts(
+        self, resilience: Resilience, request: dict, timing: "StreamTiming"
+    ) -> AsyncGenerator[str | SuggestedPhrase | ParsedChatCompletion, None]:
+        for attempt in resilience.attempts():
+            timing.start()
+            try:
+                async with self.client.beta.chat.completions.stream(
+                    **request, stream_options={"include_usage": True}
+                ) as stream:
+                    parser = self._stream_parser()
+                    async for event in stream:
+                        for chunk in self._stream_chunks(parser, event):
+                            timing.mark_delta()
+                            yield chunk
+
+                    completion = await stream.get_final_completion()
+            except Exception as e:
+                delay = resilience.failure_delay(e, attempt, retry=timing.first_delta_at is None)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+            else:
+                resilience.record_success()
+                timing.finish()
+                yield completion
+                return
+
+    async def _aload_context(self, user_message: Message) -> tuple[ConversationSummary, list[Message]]:
+        store = self.chat_history_store
+        summary = await store.aget_summary()
+        budget = self._history_budget(summary) - user_message.get_token_count()
+        history = await store.aget_recent_messages(budget, after_id=summary.until_id) if budget > 0 else []
+        history.append(user_message)
+        return summary, history
+
+    async def _acompact_history(self, summary: ConversationSummary, history: list[Message]) -> None:
+        if not history or history[0].id is None:
+            return
+
+        store = self.chat_history_store
+        if not await store.ahas_messages_between(after_id=summary.until_id, before_id=history[0].id):
+            return
+
+        retained = await store.aget_recent_messages(self._retain_budget(summary), after_id=summary.until_id)
+        if self.summarizer is None:
+            await self._asave_context_start(ConversationSummary(text=summary.text, until_id=retained[0].id - 1))
+            return
+
+        evicted = await store.aget_messages_between(after_id=summary.until_id, before_id=retained[0].id)
+        if not self.summarizer.needs_summary(evicted):
+            return
+
+        text = await self.summarizer.asummarize(summary.text, evicted)
+        await store.asave_summary(ConversationSummary(text=text, until_id=evicted[-1].id))
+
+    async def _asave_context_start(self, summary: ConversationSummary) -> None:
+        try:
+            await self.chat_history_store.asave_summary(summary)
+        except NotImplementedError:
+            pass
+
 
 class BaseChatHistoryStore(ABC):
     """대화 기록 저장소의 추상 인터페이스"""
@@ -266,29 +1163,134 @@ class BaseChatHistoryStore(ABC):
         pass
 
     @abstractmethod
-    def get_messages(self, limit: Optional[int] = None) -> list[Message]:
-        """저장된 메시지 목록을 가져옴"""
+    def get_messages(self, limit: Optional[int] = None, before_id: Optional[int] = None) -> list[Message]:
+        """저장된 메시지 목록을 시간순으로 가져옴
+
+        Args:
+            limit: 지정하면 가장 최근 메시지부터 최대 limit개
+            before_id: 지정하면 이 id 이전의 메시지만 대상으로 함 (이전 페이지 조회용 커서)
+        """
         pass
 
+    def add_messages(self, messages: list[Message]) -> None:
+        """여러 메시지를 순서대로 한 번에 저장 (트랜잭션을 지원하는 저장소는 한 트랜잭션으로 저장)"""
+        for message in messages:
+            self.add_message(message)
+
+    def flush(self) -> None:
+        """쓰기를 모아두는 (write-behind) 저장소가 아직 저장하지 않은 메시지를 저장
+
+        ChatService는 응답 전송이 끝날 때마다 호출합니다. 즉시 저장하는 저장소는 할 일이 없습니다.
+        """
+
     @abstractmethod
     def clear_history(self) -> None:
         """모든 대화 기록을 삭제"""
         pass
 
+    def get_recent_messages(self, token_budget: int, after_id: Optional[int] = None) -> list[Message]:
+        """토큰 예산 안에 들어가는 최근 메시지 목록을 시간순으로 가져옴
+
+        Args:
+            token_budget: 대화 기록에 쓸 수 있는 최대 토큰 수
+            after_id: 지정하면 이 id 이후의 메시지만 대상으로 함 (요약된 메시지 제외)
+        """
+        return pack_messages(reversed(self.get_messages_between(after_id=after_id)), token_budget)
+
+    def get_messages_between(self, after_id: Optional[int] = None, before_id: Optional[int] = None) -> list[Message]:
+        """after_id 초과, before_id 미만인 메시지 목록을 시간순으로 가져옴"""
+        return [
+            message
+            for message in self.get_messages()
+            if (after_id is None or message.id > after_id) and (before_id is None or message.id < before_id)
+        ]
+
+    def has_messages_between(self, after_id: Optional[int] = None, before_id: Optional[int] = None) -> bool:
+        """after_id 초과, before_id 미만인 메시지가 있는지 여부"""
+        return bool(self.get_messages_between(after_id=after_id, before_id=before_id))
+
+    def get_summary(self) -> ConversationSummary:
+        """저장된 대화 요약을 가져옴"""
+        return ConversationSummary()
+
+    def save_summary(self, summary: ConversationSummary) -> None:
+        """대화 요약을 저장"""
+        raise NotImplementedError(f"{type(self).__name__} does not support conversation summaries")
+
+    # 비동기 인터페이스: 기본 구현은 동기 메서드를 그대로 호출하므로
+    # I/O가 있는 저장소는 블로킹 없이 동작하도록 재정의해야 합니다.
+
+    async def aadd_message(self, message: Message) -> None:
+        """메시지를 저장소에 추가 (비동기)"""
+        self.add_message(message)
+
+    async def aadd_messages(self, messages: list[Message]) -> None:
+        """여러 메시지를 순서대로 한 번에 저장 (비동기)"""
+        self.add_messages(messages)
+
+    async def aflush(self) -> None:
+        """아직 저장하지 않은 메시지를 저장 (비동기)"""
+        self.flush()
+
+    async def aget_messages(self, limit: Optional[int] = None, before_id: Optional[int] = None) -> list[Message]:
+        """저장된 메시지 목록을 가져옴 (비동기)"""
+        return self.get_messages(limit=limit, before_id=before_id)
+
+    async def aclear_history(self) -> None:
+        """모든 대화 기록을 삭제 (비동기)"""
+        self.clear_history()
+
+    async def aget_recent_messages(self, token_budget: int, after_id: Optional[int] = None) -> list[Message]:
+        """토큰 예산 안에 들어가는 최근 메시지 목록을 가져옴 (비동기)"""
+        return self.get_recent_messages(token_budget, after_id=after_id)
+
+    async def aget_messages_between(
+        self, after_id: Optional[int] = None, before_id: Optional[int] = None
+    ) -> list[Message]:
+        """after_id 초과, before_id 미만인 메시지 목록을 가져옴 (비동기)"""
+        return self.get_messages_between(after_id=after_id, before_id=before_id)
+
+    async def ahas_messages_between(self, after_id: Optional[int] = None, before_id: Optional[int] = None) -> bool:
+        """after_id 초과, before_id 미만인 메시지가 있는지 여부 (비동기)"""
+        return self.has_messages_between(after_id=after_id, before_id=before_id)
+
+    async def aget_summary(self) -> ConversationSummary:
+        """저장된 대화 요약을 가져옴 (비동기)"""
+        return self.get_summary()
+
+    async def asave_summary(self, summary: ConversationSummary) -> None:
+        """대화 요약을 저장 (비동기)"""
+        self.save_summary(summary)
+
 
 class InMemoryStore(BaseChatHistoryStore):
     """메모리 기반 대화 기록 저장소"""
 
     def __init__(self):
         self._messages: list[Message] = []
+        self._summary = ConversationSummary()
+        self._last_id = 0
 
     def add_message(self, message: Message) -> None:
+        if message.id is None:
+            self._last_id += 1
+            message.id = self._last_id
         self._messages.append(message)
 
-    def get_messages(self, limit: Optional[int] = None) -> list[Message]:
+    def get_messages(self, limit: Optional[int] = None, before_id: Optional[int] = None) -> list[Message]:
+        messages = self._messages
+        if before_id is not None:
+            messages = [message for message in messages if message.id < before_id]
         if limit is None:
-            return self._messages.copy()
-        return self._messages[-limit:].copy()
+            return messages.copy()
+        return messages[-limit:].copy()
 
     def clear_history(self) -> None:
         self._messages.clear()
+        self._summary = ConversationSummary()
+
+    def get_summary(self) -> ConversationSummary:
+        return self._summary
+
+    def save_summary(self, summary: ConversationSummary) -> None:
+        self._summary = summary
@@ -2,14 +2,44 @@
 Django-specific chat history storage implementation.
 """
 
+import atexit
+import logging
+import threading
+import time
 from typing import Optional
-from roleplay.core import Message, BaseChatHistoryStore
-from roleplay.models import ChatSession
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+from roleplay.core import ConversationSummary, Message, BaseChatHistoryStore, UsageInfo, pack_messages
+from roleplay.models import ChatMessage, ChatSession
+
+logger = logging.getLogger(__name__)
 
 
 class DjangoChatHistoryStore(BaseChatHistoryStore):
     """단순한 Django 채팅 히스토리 스토어"""
 
+    # 컨텍스트 구성 시 한 번에 읽어올 메시지 수
+    RECENT_CHUNK_SIZE = 20
+
+    # Message 생성에 필요한 컬럼만 튜플로 읽어 모델 인스턴스 생성 비용을 없앰
+    MESSAGE_FIELDS = (
+        "id",
+        "role",
+        "content",
+        "created_at",
+        "token_count",
+        "input_tokens",
+        "output_tokens",
+        "cached_input_tokens",
+        "latency_ms",
+        "model",
+        "truncated",
+    )
+
     def __init__(self, session: ChatSession):
         """
         Django 모델을 사용한 채팅 기록 저장소 초기화
@@ -19,36 +49,460 @@ class DjangoChatHistoryStore(BaseChatHistoryStore):
         """
         self.session = session
 
-    def add_message(self, message: Message) -> None:
-        """메시지를 데이터베이스에 추가"""
+    @staticmethod
+    def _to_message(row: tuple) -> Message:
+        """MESSAGE_FIELDS 순서의 튜플을 Message로 변환"""
+        (
+            pk,
+            role,
+            content,
+            created_at,
+            token_count,
+            input_tokens,
+            output_tokens,
+            cached_input_tokens,
+            latency_ms,
+            model,
+            truncated,
+        ) = row
+        usage = None
+        if input_tokens is not None:
+            usage = UsageInfo(
+                input_tokens=input_tokens,
+                output_tokens=output_tokens or 0,
+                cached_input_tokens=cached_input_tokens or 0,
+                model=model or None,
+            )
+        return Message(
+            role=role,
+            content=content,
+            created_at=created_at,
+            usage=usage,
+            id=pk,
+            token_count=token_count,
+            latency_ms=latency_ms,
+            truncated=truncated,
+        )
+
+    @staticmethod
+    def _billed_usage(message: Message) -> Optional[UsageInfo]:
+        """API 호출로 발생한 사용량 (응답 캐시 적중은 과금되지 않으므로 제외)"""
+        if message.usage is None or message.usage.cached:
+            return None
+        return message.usage
 
-        # 메시지 생성
-        self.session.message_set.create(
+    def _filter_between(self, after_id: Optional[int] = None, before_id: Optional[int] = None):
+        """세션의 메시지 중 id 범위에 해당하는 쿼리셋 ((session, id) 인덱스로 조회)"""
+        queryset = self.session.message_set.all()
+        if after_id is not None:
+            queryset = queryset.filter(id__gt=after_id)
+        if before_id is not None:
+            queryset = queryset.filter(id__lt=before_id)
+        return queryset
+
+    def _rows_between(self, after_id: Optional[int] = None, before_id: Optional[int] = None):
+        """_filter_between의 결과를 MESSAGE_FIELDS 튜플로 조회하는 쿼리셋"""
+        return self._filter_between(after_id, before_id).values_list(*self.MESSAGE_FIELDS)
+
+    def _to_chat_message(self, message: Message) -> ChatMessage:
+        usage = self._billed_usage(message)
+        return ChatMessage(
+            session=self.session,
             role=message.role,
             content=message.content,
+            token_count=message.get_token_count(),
+            input_tokens=usage.input_tokens if usage else None,
+            output_tokens=usage.output_tokens if usage else None,
+            cached_input_tokens=usage.cached_input_tokens if usage else None,
+            latency_ms=message.latency_ms,
+            model=(message.usage.model if message.usage else None) or "",
+            truncated=message.truncated,
         )
 
-    def get_messages(self, limit: Optional[int] = None) -> list[Message]:
-        """데이터베이스에서 메시지 목록을 가져옴"""
+    def add_message(self, message: Message) -> None:
+        """메시지를 데이터베이스에 추가하고 세션의 누적 사용량을 갱신"""
+
+        self.add_messages([message])
 
-        queryset = self.session.message_set.all()
+    def add_messages(self, messages: list[Message]) -> None:
+        """여러 메시지를 한 트랜잭션에서 bulk_create로 저장하고 세션의 누적 사용량을 갱신"""
+
+        usages = [usage for usage in map(self._billed_usage, messages) if usage]
+        with transaction.atomic():
+            chat_messages = ChatMessage.objects.bulk_create([self._to_chat_message(message) for message in messages])
+            if usages:
+                # 동시에 저장되는 다른 응답의 사용량을 덮어쓰지 않도록 DB에서 직접 증가
+                ChatSession.objects.filter(pk=self.session.pk).update(
+                    input_tokens=F("input_tokens") + sum(usage.input_tokens for usage in usages),
+                    output_tokens=F("output_tokens") + sum(usage.output_tokens for usage in usages),
+                    cached_input_tokens=F("cached_input_tokens") + sum(usage.cached_input_tokens for usage in usages),
+                )
+
+        # 데이터베이스가 생성된 pk를 돌려주지 않으면 (예: 구버전 SQLite) id 없이 둠
+        for message, chat_message in zip(messages, chat_messages):
+            message.id = chat_message.pk
+
+    def get_messages(self, limit: Optional[int] = None, before_id: Optional[int] = None) -> list[Message]:
+        """데이터베이스에서 메시지 목록을 가져옴
+
+        before_id를 커서로 쓰는 keyset 페이지네이션이므로 OFFSET 없이 세션 길이와 무관하게 조회합니다.
+        """
+
+        queryset = self._rows_between(before_id=before_id)
 
         if limit:
-            queryset = reversed(queryset.order_by("-id")[:limit])
+            rows = reversed(queryset.order_by("-id")[:limit])
         else:
-            queryset = queryset.order_by("id")
+            rows = queryset.order_by("id")
 
-        return [
-            Message(role=chat_message.role, content=chat_message.content, created_at=chat_message.created_at)
-            for chat_message in queryset
-        ]
+        return [self._to_message(row) for row in rows]
+
+    def get_recent_messages(self, token_budget: int, after_id: Optional[int] = None) -> list[Message]:
+        """토큰 예산 안에 들어가는 최근 메시지만 최신순으로 필요한 만큼 읽어옴"""
+
+        rows = self._rows_between(after_id=after_id).order_by("-id").iterator(chunk_size=self.RECENT_CHUNK_SIZE)
+        return pack_messages((self._to_message(row) for row in rows), token_budget)
+
+    def get_messages_between(self, after_id: Optional[int] = None, before_id: Optional[int] = None) -> list[Message]:
+        """after_id 초과, before_id 미만인 메시지 목록을 가져옴"""
+
+        rows = self._rows_between(after_id, before_id).order_by("id")
+        return [self._to_message(row) for row in rows]
+
+    def has_messages_between(self, after_id: Optional[int] = None, before_id: Optional[int] = None) -> bool:
+        """after_id 초과, before_id 미만인 메시지가 있는지 여부 (메시지를 읽지 않고 확인)"""
+
+        return self._filter_between(after_id, before_id).exists()
+
+    def get_summary(self) -> ConversationSummary:
+        """세션에 저장된 대화 요약을 가져옴"""
+
+        return ConversationSummary(text=self.session.summary, until_id=self.session.summary_until_id)
+
+    def save_summary(self, summary: ConversationSummary) -> None:
+        """대화 요약을 세션에 저장"""
+
+        self.session.summary = summary.text
+        self.session.summary_until_id = summary.until_id
+        ChatSession.objects.filter(pk=self.session.pk).update(summary=summary.text, summary_until_id=summary.until_id)
 
     def clear_history(self) -> None:
-        """해당 세션의 모든 메시지를 삭제"""
+        """해당 세션의 모든 메시지와 요약을 삭제"""
 
         self.session.message_set.all().delete()
+        self.save_summary(ConversationSummary())
+
+    async def aadd_message(self, message: Message) -> None:
+        """메시지를 데이터베이스에 추가 (비동기)"""
+
+        await self.aadd_messages([message])
+
+    async def aadd_messages(self, messages: list[Message]) -> None:
+        """여러 메시지를 한 트랜잭션으로 저장 (비동기)
+
+        비동기 ORM은 트랜잭션을 지원하지 않으므로 동기 구현을 스레드에서 실행합니다.
+        """
+
+        await sync_to_async(self.add_messages)(messages)
+
+    async def aget_messages(self, limit: Optional[int] = None, before_id: Optional[int] = None) -> list[Message]:
+        """데이터베이스에서 메시지 목록을 가져옴 (비동기)"""
+
+        queryset = self._rows_between(before_id=before_id)
+
+        if limit:
+            rows = [row async for row in queryset.order_by("-id")[:limit]]
+            rows.reverse()
+        else:
+            rows = [row async for row in queryset.order_by("id")]
+
+        return [self._to_message(row) for row in rows]
+
+    async def aget_recent_messages(self, token_budget: int, after_id: Optional[int] = None) -> list[Message]:
+        """토큰 예산 안에 들어가는 최근 메시지만 최신순으로 필요한 만큼 읽어옴 (비동기)
+
+        values_list 쿼리셋의 aiterator()는 쿼리를 동기로 실행하므로, 동기 구현을 스레드에서 실행합니다.
+        """
+
+        return await sync_to_async(self.get_recent_messages)(token_budget, after_id=after_id)
+
+    async def aget_messages_between(
+        self, after_id: Optional[int] = None, before_id: Optional[int] = None
+    ) -> list[Message]:
+        """after_id 초과, before_id 미만인 메시지 목록을 가져옴 (비동기)"""
+
+        rows = self._rows_between(after_id, before_id).order_by("id")
+        return [self._to_message(row) async for row in rows]
+
+    async def ahas_messages_between(self, after_id: Optional[int] = None, before_id: Optional[int] = None) -> bool:
+        """after_id 초과, before_id 미만인 메시지가 있는지 여부 (비동기)"""
+
+        return await self._filter_between(after_id, before_id).aexists()
+
+    async def aget_summary(self) -> ConversationSummary:
+        """세션에 저장된 대화 요약을 가져옴 (비동기)"""
+
+        return self.get_summary()
+
+    async def asave_summary(self, summary: ConversationSummary) -> None:
+        """대화 요약을 세션에 저장 (비동기)"""
+
+        self.session.summary = summary.text
+        self.session.summary_until_id = summary.until_id
+        await ChatSession.objects.filter(pk=self.session.pk).aupdate(
+            summary=summary.text, summary_until_id=summary.until_id
+        )
+
+    async def aclear_history(self) -> None:
+        """해당 세션의 모든 메시지와 요약을 삭제 (비동기)"""
+
+        await self.session.message_set.all().adelete()
+        await self.asave_summary(ConversationSummary())
 
     def get_message_count(self) -> int:
         """세션의 총 메시지 수 반환"""
 
         return self.session.message_set.all().count()
+
+    async def aget_message_count(self) -> int:
+        """세션의 총 메시지 수 반환 (비동기)"""
+
+        return await self.session.message_set.all().acount()
+
+
+class CachedChatHistoryStore(DjangoChatHistoryStore):
+    """최근 대화 창을 Django 캐시에 두고, DB에는 모아서 나중에 쓰는 (write-behind) 저장소
+
+    - 읽기: 컨텍스트 구성과 최근 페이지 조회는 캐시된 최근 메시지 창에서 처리하고,
+      창이 요청 범위를 담고 있지 않을 때만 DB를 조회합니다.
+    - 쓰기: add_message(s)는 메모리에 모아두기만 하고, flush() 때 한 트랜잭션으로 DB에 저장한 뒤
+      (id가 부여된) 메시지를 캐시 창에 반영합니다.
+    - 일관성: DB에 저장할 때마다 세션의 버전을 올리고 (cache.incr), 창에는 만들 때의 버전을 기록합니다.
+      여러 워커가 동시에 저장해 창의 버전이 현재 버전과 다르면, 창을 믿지 않고 DB에서 다시 만듭니다.
+    - 내구성: ChatService는 응답 전송이 끝나면 (클라이언트가 연결을 끊어도) flush()를 호출하고,
+      워커가 정상 종료될 때 atexit 훅이 남은 메시지를 저장합니다. 그 사이에 프로세스가 강제 종료되면
+      (SIGKILL, OOM 등) 아직 저장되지 않은 마지막 턴은 유실될 수 있습니다.
+
+    캐시는 여러 워커가 공유하는 백엔드(Redis, Memcached 등)를 사용해야 다른 워커의 쓰기가 보입니다.
+    (settings의 REDIS_URL, 프로세스별 캐시를 쓰면 check --deploy에서 roleplay.W001 경고)
+    """
+
+    CACHE_KEY_TEMPLATE = "roleplay:history:{session_id}"
+    VERSION_KEY_TEMPLATE = "roleplay:history:{session_id}:version"
+
+    # 캐시에 유지할 최근 메시지 수
+    WINDOW_SIZE = 100
+
+    def __init__(self, session: ChatSession, cache_alias: str = "default", timeout: Optional[int] = 60 * 60):
+        """
+        Args:
+            session: ChatSession 객체 (필수)
+            cache_alias: 최근 메시지 창을 저장할 Django 캐시
+            timeout: 캐시 유지 시간 (초)
+        """
+        super().__init__(session)
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self._pending: list[Message] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    @property
+    def cache_key(self) -> str:
+        return self.CACHE_KEY_TEMPLATE.format(session_id=self.session.pk)
+
+    @property
+    def version_key(self) -> str:
+        return self.VERSION_KEY_TEMPLATE.format(session_id=self.session.pk)
+
+    def _get_version(self) -> Optional[int]:
+        """세션 기록의 현재 버전 (없으면 이전에 만든 창과 겹치지 않도록 현재 시각에서 시작)"""
+        version = self.cache.get(self.version_key)
+        if version is None:
+            self.cache.add(self.version_key, time.time_ns(), timeout=self.timeout)
+            version = self.cache.get(self.version_key)
+        return version
+
+    def _get_window(self) -> dict:
+        """캐시된 최근 메시지 창 (없거나 현재 버전과 다르면 DB에서 읽어 캐시)
+
+        버전은 DB를 읽기 전에 가져옵니다. 읽는 동안 다른 워커가 저장하면 버전이 올라가므로,
+        이 창은 다음 조회 때 다시 만들어집니다.
+
+        Returns:
+            {"messages": 시간순 메시지 목록, "floor_id": 창 바로 앞 메시지의 id (창이 전체 기록이면 None),
+             "version": 창을 만들 때의 버전}
+        """
+        version = self._get_version()
+        window = self.cache.get(self.cache_key)
+        if window is None or version is None or window.get("version") != version:
+            messages = super().get_messages(limit=self.WINDOW_SIZE + 1)
+            floor_id = messages.pop(0).id if len(messages) > self.WINDOW_SIZE else None
+            window = {"messages": messages, "floor_id": floor_id, "version": version}
+            self.cache.set(self.cache_key, window, timeout=self.timeout)
+        return window
+
+    def _bump_version(self) -> Optional[int]:
+        """DB에 쓴 뒤 버전을 올림 (버전이 없으면 창도 믿을 수 없으므로 버림)"""
+        try:
+            return self.cache.incr(self.version_key)
+        except ValueError:
+            self.cache.delete(self.cache_key)
+            return None
+
+    def _append_to_window(self, messages: list[Message]) -> None:
+        """저장된 메시지를 캐시 창 뒤에 붙이고 WINDOW_SIZE를 넘는 오래된 메시지는 버림
+
+        창이 바로 이전 버전일 때만 이어 붙입니다. 그 사이에 다른 워커가 저장했다면 창의 버전이 맞지 않으므로
+        그대로 두고, 다음 조회 때 DB에서 다시 만듭니다. 저장한 뒤 버전을 올리기 전에 다른 워커가 창을 만들었다면
+        창에 이미 이 메시지들이 들어 있으므로, 창의 마지막 메시지보다 id가 큰 메시지만 붙입니다.
+        """
+        version = self._bump_version()
+        if version is None:
+            return
+        window = self.cache.get(self.cache_key)
+        if window is None or window.get("version") != version - 1:
+            return
+
+        last_id = window["messages"][-1].id if window["messages"] else 0
+        window_messages = window["messages"] + [message for message in messages if message.id > last_id]
+        if len(window_messages) > self.WINDOW_SIZE:
+            evicted = window_messages[: -self.WINDOW_SIZE]
+            window_messages = window_messages[-self.WINDOW_SIZE :]
+            window["floor_id"] = evicted[-1].id
+        window["messages"] = window_messages
+        window["version"] = version
+        self.cache.set(self.cache_key, window, timeout=self.timeout)
+
+    def add_message(self, message: Message) -> None:
+        """메시지를 저장 대기열에 추가 (flush() 때 DB에 저장)"""
+
+        self.add_messages([message])
+
+    def add_messages(self, messages: list[Message]) -> None:
+        """메시지들을 저장 대기열에 추가 (flush() 때 DB에 저장)"""
+
+        with self._lock:
+            self._pending.extend(messages)
+            _unflushed_stores.add(self)
+
+    def flush(self) -> None:
+        """대기 중인 메시지를 한 트랜잭션으로 DB에 저장하고 캐시 창에 반영"""
+
+        with self._lock:
+            messages, self._pending = self._pending, []
+            _unflushed_stores.discard(self)
+            if not messages:
+                return
+
+            try:
+                super().add_messages(messages)
+            except Exception:
+                # 저장에 실패하면 다음 flush()에서 다시 시도할 수 있도록 대기열에 되돌림
+                self._pending[:0] = messages
+                _unflushed_stores.add(self)
+                raise
+
+            if all(message.id is not None for message in messages):
+                self._append_to_window(messages)
+            else:
+                # DB가 생성된 id를 돌려주지 않으면 창을 버리고 다음 조회 때 다시 읽음
+                self._bump_version()
+                self.cache.delete(self.cache_key)
+
+    def get_messages(self, limit: Optional[int] = None, before_id: Optional[int] = None) -> list[Message]:
+        """최근 메시지 조회는 캐시 창에서 처리하고, 이전 페이지나 전체 조회는 DB에서 가져옴"""
+
+        if before_id is None and limit:
+            window = self._get_window()
+            messages = window["messages"] + self._pending
+            if window["floor_id"] is None or len(messages) >= limit:
+                return messages[-limit:]
+
+        self.flush()
+        return super().get_messages(limit=limit, before_id=before_id)
+
+    def get_recent_messages(self, token_budget: int, after_id: Optional[int] = None) -> list[Message]:
+        """토큰 예산 안에 들어가는 최근 메시지를 캐시 창에서 가져옴 (창이 부족하면 DB 조회)"""
+
+        window = self._get_window()
+        candidates = [
+            message
+            for message in window["messages"] + self._pending
+            if after_id is None or message.id is None or message.id > after_id
+        ]
+        packed = pack_messages(reversed(candidates), token_budget)
+
+        # 창이 전체 기록이거나, after_id 이후를 모두 담고 있거나, 창 안에서 예산이 찼으면 DB 조회 불필요
+        floor_id = window["floor_id"]
+        if floor_id is None or (after_id is not None and after_id >= floor_id) or len(packed) < len(candidates):
+            return packed
+
+        self.flush()
+        return super().get_recent_messages(token_budget, after_id=after_id)
+
+    def get_messages_between(self, after_id: Optional[int] = None, before_id: Optional[int] = None) -> list[Message]:
+        self.flush()
+        return super().get_messages_between(after_id=after_id, before_id=before_id)
+
+    def has_messages_between(self, after_id: Optional[int] = None, before_id: Optional[int] = None) -> bool:
+        self.flush()
+        return super().has_messages_between(after_id=after_id, before_id=before_id)
+
+    def clear_history(self) -> None:
+        """대기 중인 메시지와 캐시 창, DB의 메시지와 요약을 모두 삭제"""
+
+        with self._lock:
+            self._pending = []
+            _unflushed_stores.discard(self)
+        super().clear_history()
+        # 삭제 전에 다른 워커가 만든 창이 남지 않도록 버전도 올림
+        self._bump_version()
+        self.cache.delete(self.cache_key)
+
+    def get_message_count(self) -> int:
+        return super().get_message_count() + len(self._pending)
+
+    # 캐시와 DB 접근이 섞여 있으므로 비동기 메서드는 동기 구현을 스레드에서 실행
+
+    async def aadd_messages(self, messages: list[Message]) -> None:
+        self.add_messages(messages)
+
+    async def aflush(self) -> None:
+        await sync_to_async(self.flush)()
+
+    async def aget_messages(self, limit: Optional[int] = None, before_id: Optional[int] = None) -> list[Message]:
+        return await sync_to_async(self.get_messages)(limit=limit, before_id=before_id)
+
+    async def aget_messages_between(
+        self, after_id: Optional[int] = None, before_id: Optional[int] = None
+    ) -> list[Message]:
+        return await sync_to_async(self.get_messages_between)(after_id=after_id, before_id=before_id)
+
+    async def ahas_messages_between(self, after_id: Optional[int] = None, before_id: Optional[int] = None) -> bool:
+        return await sync_to_async(self.has_messages_between)(after_id=after_id, before_id=before_id)
+
+    async def aclear_history(self) -> None:
+        await sync_to_async(self.clear_history)()
+
+    async def aget_message_count(self) -> int:
+        return await sync_to_async(self.get_message_count)()
+
+
+# 아직 flush 되지 않은 메시지가 있는 저장소들 (워커 종료 시 저장)
+_unflushed_stores: set[CachedChatHistoryStore] = set()
+
+
+def flush_pending_history() -> None:
+    """대기 중인 메시지가 있는 모든 CachedChatHistoryStore를 flush"""
+    for store in list(_unflushed_stores):
+        try:
+            store.flush()
+        except Exception:
+            logger.exception("Failed to flush chat history for session %s", store.session.pk)
+
+
+atexit.register(flush_pending_history)
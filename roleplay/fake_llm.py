@@ -0,0 +1,248 @@
+"""
+Fake chat-completions backend for offline load testing.
+
+실제 API 비용과 네트워크 없이 채팅 경로를 부하 테스트할 수 있도록
+OpenAI chat completions 프로토콜을 흉내내는 가짜 백엔드입니다.
+첫 토큰까지의 시간(TTFT), 초당 토큰 수, 오류 비율을 설정할 수 있고,
+구조화된 출력(response_format=json_schema) 요청에는 ChatResponse 형식의 JSON을 돌려줍니다.
+
+두 가지 방식으로 사용할 수 있습니다.
+
+- 프로세스 내부: FakeLLMTransport / AsyncFakeLLMTransport를 OpenAI 클라이언트의 httpx transport로 사용
+  (settings.ROLEPLAY_FAKE_LLM["ENABLED"]가 켜져 있으면 roleplay.clients 레지스트리가 자동으로 사용)
+- 로컬 HTTP 서버: ``python manage.py fake_llm_server`` 실행 후 OPENAI_BASE_URL=http://127.0.0.1:8001/v1
+"""
+
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator, Optional
+from uuid import uuid4
+
+import httpx
+from django.conf import settings
+
+from roleplay.tokens import estimate_tokens
+
+DEFAULT_REPLY = (
+    "좋은 질문이에요! 오늘은 따뜻한 라떼와 갓 구운 크루아상을 추천드려요. 다른 메뉴도 궁금하시면 말씀해 주세요."
+)
+
+DEFAULT_SUGGESTED_PHRASES = ["A latte, please.", "What do you recommend?", "How much is it?"]
+
+
+@dataclass(frozen=True)
+class FakeLLMConfig:
+    """가짜 백엔드 응답 특성"""
+
+    ttft: float = 0.3  # 요청부터 첫 토큰까지의 시간 (초)
+    tokens_per_second: float = 50.0  # 첫 토큰 이후 생성 속도 (0 이하이면 지연 없음)
+    error_rate: float = 0.0  # 500 오류로 응답할 요청의 비율 (0.0~1.0)
+    reply: str = DEFAULT_REPLY  # 응답 텍스트 (max_tokens 만큼 잘림)
+    seed: Optional[int] = None  # 오류 발생 난수 시드 (재현 가능한 부하 테스트용)
+
+    @classmethod
+    def from_settings(cls) -> Optional["FakeLLMConfig"]:
+        """settings.ROLEPLAY_FAKE_LLM 에서 설정 로드 (ENABLED가 꺼져 있으면 None)"""
+        options = dict(getattr(settings, "ROLEPLAY_FAKE_LLM", {}))
+        if not options.pop("ENABLED", False):
+            return None
+        return cls(**{key.lower(): value for key, value in options.items()})
+
+
+@dataclass
+class FakeResponse:
+    """가짜 백엔드의 HTTP 응답 (chunks: 전송 전에 기다릴 시간(초)과 보낼 데이터의 목록)"""
+
+    status_code: int
+    content_type: str
+    chunks: list[tuple[float, bytes]]
+
+
+class FakeLLMBackend:
+    """chat completions 요청 하나를 받아 (지연 시간이 포함된) 응답을 만드는 백엔드"""
+
+    def __init__(self, config: Optional[FakeLLMConfig] = None):
+        self.config = config or FakeLLMConfig()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+
+    def handle(self, method: str, path: str, body: bytes) -> FakeResponse:
+        if method == "POST" and path.rstrip("/").endswith("/chat/completions"):
+            return self.chat_completions(json.loads(body or b"{}"))
+        if method == "GET" and path.rstrip("/").endswith("/models"):
+            # 클라이언트 연결 워밍업(models.list) 용
+            return self._json(200, {"object": "list", "data": []})
+        return self._json(404, {"error": {"message": f"Unknown endpoint: {method} {path}", "type": "not_found"}})
+
+    def chat_completions(self, request: dict) -> FakeResponse:
+        with self._lock:
+            failed = self._random.random() < self.config.error_rate
+        if failed:
+            error = {"error": {"message": "Fake LLM backend error", "type": "server_error", "code": None}}
+            return FakeResponse(500, "application/json", [(self.config.ttft, json.dumps(error).encode())])
+
+        # 구조화된 출력 요청이면 ChatResponse 형식의 JSON, 아니면 일반 텍스트
+        structured = (request.get("response_format") or {}).get("type") == "json_schema"
+        if structured:
+            content = json.dumps(
+                {"text": self.config.reply, "suggested_phrases": DEFAULT_SUGGESTED_PHRASES}, ensure_ascii=False
+            )
+        else:
+            content = self.config.reply
+
+        # 스트리밍 단위는 단어와 뒤따르는 공백. JSON은 잘리면 파싱할 수 없으므로 max_tokens는 일반 텍스트에만 적용
+        tokens = re.findall(r"\S+\s*|\s+", content)
+        if request.get("max_tokens") and not structured:
+            tokens = tokens[: request["max_tokens"]]
+        content = "".join(tokens)
+        usage = {
+            "prompt_tokens": sum(estimate_tokens(str(m.get("content", ""))) for m in request.get("messages", [])),
+            "completion_tokens": len(tokens),
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-fake-{uuid4().hex}"
+        model = request.get("model", "fake")
+
+        if not request.get("stream"):
+            completion = {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+            delay = self.config.ttft + len(tokens) * self._token_interval
+            return FakeResponse(200, "application/json", [(delay, json.dumps(completion).encode())])
+
+        def chunk(delta: Optional[dict], finish_reason: Optional[str] = None, usage: Optional[dict] = None) -> bytes:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if usage is not None:
+                data["usage"] = usage
+            return f"data: {json.dumps(data)}\n\n".encode()
+
+        chunks = [(self.config.ttft, chunk({"role": "assistant", "content": ""}))]
+        chunks += [(self._token_interval, chunk({"content": token})) for token in tokens]
+        chunks.append((0.0, chunk({}, "stop")))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            chunks.append((0.0, chunk(None, usage=usage)))
+        chunks.append((0.0, b"data: [DONE]\n\n"))
+        return FakeResponse(200, "text/event-stream", chunks)
+
+    @property
+    def _token_interval(self) -> float:
+        if self.config.tokens_per_second <= 0:
+            return 0.0
+        return 1 / self.config.tokens_per_second
+
+    @staticmethod
+    def _json(status_code: int, data: dict) -> FakeResponse:
+        return FakeResponse(status_code, "application/json", [(0.0, json.dumps(data).encode())])
+
+
+class _SyncFakeStream(httpx.SyncByteStream):
+    def __init__(self, chunks: list[tuple[float, bytes]]):
+        self.chunks = chunks
+
+    def __iter__(self) -> Iterator[bytes]:
+        for delay, data in self.chunks:
+            if delay > 0:
+                time.sleep(delay)
+            yield data
+
+
+class _AsyncFakeStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: list[tuple[float, bytes]]):
+        self.chunks = chunks
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for delay, data in self.chunks:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield data
+
+
+class FakeLLMTransport(httpx.BaseTransport):
+    """네트워크 없이 FakeLLMBackend로 응답하는 동기 httpx transport"""
+
+    def __init__(self, backend: Optional[FakeLLMBackend] = None):
+        self.backend = backend or FakeLLMBackend()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        response = self.backend.handle(request.method, request.url.path, request.read())
+        return httpx.Response(
+            response.status_code,
+            headers={"content-type": response.content_type},
+            stream=_SyncFakeStream(response.chunks),
+        )
+
+
+class AsyncFakeLLMTransport(httpx.AsyncBaseTransport):
+    """네트워크 없이 FakeLLMBackend로 응답하는 비동기 httpx transport (대기는 asyncio.sleep)"""
+
+    def __init__(self, backend: Optional[FakeLLMBackend] = None):
+        self.backend = backend or FakeLLMBackend()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = self.backend.handle(request.method, request.url.path, await request.aread())
+        return httpx.Response(
+            response.status_code,
+            headers={"content-type": response.content_type},
+            stream=_AsyncFakeStream(response.chunks),
+        )
+
+
+class FakeLLMApp:
+    """FakeLLMBackend를 HTTP로 제공하는 ASGI 애플리케이션 (fake_llm_server 명령에서 uvicorn으로 실행)"""
+
+    def __init__(self, backend: Optional[FakeLLMBackend] = None):
+        self.backend = backend or FakeLLMBackend()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        response = self.backend.handle(scope["method"], scope["path"], body)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [(b"content-type", response.content_type.encode())],
+            }
+        )
+        for delay, data in response.chunks:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await send({"type": "http.response.body", "body": data, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
@@ -0,0 +1,273 @@
+import asyncio
+import json
+import platform
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Callable, Optional
+
+import django
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+
+from melon.models import Album, Artist, Song
+from prompts.models import Prompt
+from roleplay.models import ChatMessage, ChatSession
+from todo.models import Todo
+
+
+@dataclass
+class Scenario:
+    """측정할 요청 하나 (make_request: (클라이언트, 요청 순번) -> 응답 코루틴)"""
+
+    name: str
+    make_request: Callable
+    stream: bool = False  # 스트리밍 응답이면 첫 바이트까지의 시간(TTFB)도 측정
+
+
+class QueryCounter:
+    """connection.execute_wrapper로 실행된 쿼리 수를 집계"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """nearest-rank 백분위수"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(p / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(values: list[float]) -> dict:
+    values = sorted(values)
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "mean": round(sum(values) / len(values), 3) if values else 0.0,
+        "max": round(values[-1], 3) if values else 0.0,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "주요 엔드포인트(채팅 스트리밍, 세션 목록, 프롬프트 검색, 멜론 곡 목록, 할 일) 처리량/지연 시간 벤치마크. "
+        "시드 데이터와 가짜 LLM 백엔드(roleplay.fake_llm)를 사용하고 결과를 JSON으로 출력합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="시나리오별 요청 수")
+        parser.add_argument("--concurrency", type=int, default=20, help="동시에 요청하는 클라이언트 수")
+        parser.add_argument("--sessions", type=int, default=50, help="시드할 채팅 세션 수")
+        parser.add_argument("--history", type=int, default=20, help="세션별 시드 메시지 수")
+        parser.add_argument("--ttft", type=float, default=0.2, help="가짜 LLM 첫 토큰까지의 시간 (초)")
+        parser.add_argument("--tokens-per-second", type=float, default=100.0, help="가짜 LLM 생성 속도")
+        parser.add_argument("--scenario", action="append", dest="scenarios", help="실행할 시나리오 (여러 번 지정 가능)")
+        parser.add_argument("--output", help="결과 JSON을 저장할 파일 (기본값: 표준 출력)")
+        parser.add_argument("--seed", type=int, default=0, help="요청 대상 선택 난수 시드")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        fake_llm = {"ENABLED": True, "TTFT": options["ttft"], "TOKENS_PER_SECOND": options["tokens_per_second"]}
+
+        # 시드 데이터와 요청으로 바뀐 데이터는 모두 롤백하여 데이터베이스에 남기지 않음.
+        # async_to_sync로 실행하므로 비동기 뷰의 ORM 호출도 이 스레드의 연결(트랜잭션)을 사용합니다.
+        # 한 사용자로 요청을 몰아 보내므로 사용자별 사용량 제한은 끔
+        overrides = {
+            "ROLEPLAY_FAKE_LLM": fake_llm,
+            "ROLEPLAY_RATE_LIMIT": {"ENABLED": False},
+            "ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "testserver"],
+        }
+        with override_settings(**overrides), transaction.atomic():
+            fixtures = self.seed(options["sessions"], options["history"])
+            scenarios = self.get_scenarios(fixtures)
+            if options["scenarios"]:
+                unknown = set(options["scenarios"]) - {scenario.name for scenario in scenarios}
+                if unknown:
+                    raise CommandError(f"Unknown scenario: {', '.join(sorted(unknown))}")
+                scenarios = [scenario for scenario in scenarios if scenario.name in options["scenarios"]]
+
+            results = {}
+            for scenario in scenarios:
+                # ORM 호출은 모두 이 스레드의 연결에서 실행되므로 여기서 쿼리 수를 집계
+                clients = async_to_sync(self.login_clients)(fixtures["user"], options["concurrency"])
+                counter = QueryCounter()
+                with connection.execute_wrapper(counter):
+                    result = async_to_sync(self.run_scenario)(scenario, clients, options["requests"])
+                result["queries_per_request"] = round(counter.count / result["requests"], 2)
+                results[scenario.name] = result
+            transaction.set_rollback(True)
+
+        report = {
+            "meta": {
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "requests": options["requests"],
+                "concurrency": options["concurrency"],
+                "sessions": options["sessions"],
+                "history": options["history"],
+                "fake_llm": {"ttft": options["ttft"], "tokens_per_second": options["tokens_per_second"]},
+            },
+            "results": results,
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(output + "\n")
+            self.stderr.write(f"Benchmark results written to {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    def seed(self, session_count: int, history: int) -> dict:
+        user = User.objects.create_user(username=f"benchmark-{time.time_ns()}", password="benchmark")
+
+        sessions = ChatSession.objects.bulk_create(
+            [
+                ChatSession(user=user, title=f"benchmark {i}", instruction="You are a barista.")
+                for i in range(session_count)
+            ]
+        )
+        if sessions and sessions[0].pk is None:
+            sessions = list(ChatSession.objects.filter(user=user).order_by("pk"))
+        ChatMessage.objects.bulk_create(
+            [
+                ChatMessage(
+                    session=session,
+                    role="user" if i % 2 == 0 else "assistant",
+                    content=f"오늘의 추천 메뉴는 무엇인가요? ({i})",
+                    token_count=20,
+                )
+                for session in sessions
+                for i in range(history)
+            ]
+        )
+
+        categories = [value for value, _ in Prompt.CATEGORY_CHOICES]
+        Prompt.objects.bulk_create(
+            [
+                Prompt(
+                    title=f"벤치마크 프롬프트 {i}",
+                    content=f"coffee 추천 프롬프트 내용 {i}",
+                    category=categories[i % len(categories)],
+                    tags=["benchmark", "coffee"],
+                )
+                for i in range(200)
+            ]
+        )
+
+        artist_uid = Artist.objects.order_by("-uid").values_list("uid", flat=True).first() or 0
+        album_uid = Album.objects.order_by("-uid").values_list("uid", flat=True).first() or 0
+        song_uid = Song.objects.order_by("-uid").values_list("uid", flat=True).first() or 0
+        artists = [Artist.objects.create(uid=artist_uid + i + 1, name=f"Artist {i}") for i in range(20)]
+        albums = [Album.objects.create(uid=album_uid + i + 1, name=f"Album {i}") for i in range(20)]
+        Song.objects.bulk_create(
+            [
+                Song(
+                    uid=song_uid + i + 1,
+                    rank=i + 1,
+                    title=f"Song {i}",
+                    artist=artists[i % len(artists)],
+                    album=albums[i % len(albums)],
+                    genre=["발라드"],
+                    release_date=date(2025, 1, 1),
+                )
+                for i in range(100)
+            ]
+        )
+
+        todos = Todo.objects.bulk_create([Todo(title=f"할 일 {i}") for i in range(50)])
+        if todos and todos[0].pk is None:
+            todos = list(Todo.objects.filter(title__startswith="할 일 ").order_by("pk"))
+
+        return {"user": user, "sessions": sessions, "todos": todos}
+
+    def get_scenarios(self, fixtures: dict) -> list[Scenario]:
+        sessions, todos = fixtures["sessions"], fixtures["todos"]
+
+        def chat(client, i):
+            url = reverse("roleplay:chat", args=(self.random.choice(sessions).pk,))
+            return client.post(url, {"message": f"라떼 한 잔 주세요 ({i})"})
+
+        return [
+            Scenario("roleplay.chat", chat, stream=True),
+            Scenario("roleplay.chatsession_list", lambda client, i: client.get(reverse("roleplay:chatsession_list"))),
+            Scenario(
+                "prompts.search",
+                lambda client, i: client.get(reverse("prompts:search"), {"q": "coffee", "category": "coding"}),
+            ),
+            Scenario(
+                "melon.song_list",
+                lambda client, i: client.get(
+                    reverse("melon:song_list"), {"page": i % 10 + 1}, headers={"HX-Request": "true"}
+                ),
+            ),
+            Scenario("todo.list", lambda client, i: client.get(reverse("todo:list"))),
+            Scenario("todo.add", lambda client, i: client.post(reverse("todo:add"), {"title": f"새 할 일 {i}"})),
+            Scenario(
+                "todo.toggle",
+                lambda client, i: client.put(reverse("todo:toggle", args=(self.random.choice(todos).pk,))),
+            ),
+        ]
+
+    @staticmethod
+    async def login_clients(user: User, count: int) -> list[AsyncClient]:
+        """로그인한 클라이언트들 (동시 요청 수만큼)"""
+        clients = [AsyncClient() for _ in range(count)]
+        for client in clients:
+            await client.aforce_login(user)
+        return clients
+
+    async def run_scenario(self, scenario: Scenario, clients: list[AsyncClient], total: int) -> dict:
+        """클라이언트들이 요청 total개를 나눠 동시에 보내며 지연 시간/TTFB/처리량 측정"""
+        latencies, ttfbs, errors = [], [], 0
+        next_index = iter(range(total))
+
+        async def worker(client: AsyncClient) -> None:
+            nonlocal errors
+            for i in next_index:
+                started_at = time.perf_counter()
+                response = await scenario.make_request(client, i)
+                first_byte_at: Optional[float] = None
+                if response.streaming:
+                    async for _ in response.streaming_content:
+                        if first_byte_at is None:
+                            first_byte_at = time.perf_counter()
+                finished_at = time.perf_counter()
+
+                latencies.append((finished_at - started_at) * 1000)
+                if scenario.stream:
+                    ttfbs.append(((first_byte_at or finished_at) - started_at) * 1000)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(worker(client) for client in clients))
+        elapsed = time.perf_counter() - started_at
+
+        result = {
+            "requests": total,
+            "errors": errors,
+            "elapsed_s": round(elapsed, 3),
+            "rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": summarize(latencies),
+        }
+        if scenario.stream:
+            result["ttfb_ms"] = summarize(ttfbs)
+        return result
@@ -0,0 +1,127 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from roleplay.django_stores import DjangoChatHistoryStore
+from roleplay.models import ChatMessage, ChatSession
+
+
+class Command(BaseCommand):
+    help = "대화 기록 조회 쿼리 벤치마크 ((session, id) 인덱스와 컬럼 프로젝션 적용 전후 비교)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=1_000_000, help="생성할 전체 메시지 수")
+        parser.add_argument("--sessions", type=int, default=1000, help="메시지를 나눠 담을 세션 수")
+        parser.add_argument("--repeat", type=int, default=50, help="쿼리별 반복 측정 횟수 (2 이상)")
+        parser.add_argument("--page-size", type=int, default=30, help="한 페이지 메시지 수")
+        parser.add_argument("--batch-size", type=int, default=10_000, help="bulk_create 배치 크기")
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 2:
+            raise CommandError("--repeat must be at least 2 to compute percentiles.")
+
+        # 측정용 데이터와 인덱스 변경은 모두 롤백하여 데이터베이스에 남기지 않음
+        with transaction.atomic():
+            session = self.populate(options["messages"], options["sessions"], options["batch_size"])
+            self.run(session, options["repeat"], options["page_size"])
+            transaction.set_rollback(True)
+
+    def populate(self, total: int, session_count: int, batch_size: int) -> ChatSession:
+        """여러 세션에 메시지를 번갈아 생성 (실제처럼 세션들의 id가 섞이도록)"""
+        started_at = time.perf_counter()
+        sessions = ChatSession.objects.bulk_create(
+            [ChatSession(title=f"benchmark {i}", instruction="benchmark") for i in range(session_count)]
+        )
+        if sessions[0].pk is None:
+            sessions = list(ChatSession.objects.filter(instruction="benchmark").order_by("pk"))
+
+        content = "안녕하세요. 오늘의 추천 메뉴를 알려주세요. " * 4
+        for start in range(0, total, batch_size):
+            ChatMessage.objects.bulk_create(
+                [
+                    ChatMessage(
+                        session=sessions[i % session_count],
+                        role="user" if i % 2 == 0 else "assistant",
+                        content=content,
+                        token_count=60,
+                    )
+                    for i in range(start, min(start + batch_size, total))
+                ]
+            )
+
+        elapsed = time.perf_counter() - started_at
+        self.stdout.write(f"{total:,} messages in {session_count:,} sessions created ({elapsed:.1f}s)")
+        return sessions[session_count // 2]
+
+    def run(self, session: ChatSession, repeat: int, page_size: int) -> None:
+        store = DjangoChatHistoryStore(session=session)
+        middle_id = session.message_set.order_by("id").values_list("id", flat=True)[session.message_set.count() // 2]
+
+        def legacy_page():
+            # 변경 전: 모델 인스턴스 전체를 만든 뒤 Message로 변환
+            chat_messages = reversed(session.message_set.order_by("-id")[:page_size])
+            return [(m.pk, m.role, m.content, m.created_at) for m in chat_messages]
+
+        def legacy_previous_page():
+            chat_messages = reversed(session.message_set.filter(id__lt=middle_id).order_by("-id")[:page_size])
+            return [(m.pk, m.role, m.content, m.created_at) for m in chat_messages]
+
+        cases = {
+            "newest page (model instances)": legacy_page,
+            "newest page (projection)": lambda: store.get_messages(limit=page_size),
+            "previous page (model instances)": legacy_previous_page,
+            "previous page (projection)": lambda: store.get_messages(limit=page_size, before_id=middle_id),
+            "context window (projection)": lambda: store.get_recent_messages(token_budget=4000),
+        }
+
+        # SQLite는 트랜잭션 안에서 schema_editor를 쓸 수 없으므로 인덱스 DDL을 직접 실행 (SQLite/PostgreSQL)
+        index = next(index for index in ChatMessage._meta.indexes if index.fields == ["session", "id"])
+        quote_name = connection.ops.quote_name
+        drop_sql = f"DROP INDEX {quote_name(index.name)}"
+        create_sql = (
+            f"CREATE INDEX {quote_name(index.name)} ON {quote_name(ChatMessage._meta.db_table)} "
+            f"({quote_name('session_id')}, {quote_name('id')})"
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(drop_sql)
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\nWithout index {index.name}"))
+        self.measure(cases, repeat)
+
+        with connection.cursor() as cursor:
+            cursor.execute(create_sql)
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\nWith index {index.name}"))
+        self.measure(cases, repeat)
+
+    def measure(self, cases: dict, repeat: int) -> None:
+        for name, func in cases.items():
+            func()  # 캐시 워밍업
+            timings = []
+            for _ in range(repeat):
+                started_at = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - started_at) * 1000)
+
+            self.stdout.write(
+                f"{name:<34} median {statistics.median(timings):8.3f}ms"
+                f"  p95 {statistics.quantiles(timings, n=20)[-1]:8.3f}ms"
+            )
+            for line in self.explain(func):
+                self.stdout.write(f"    {line}")
+
+    @staticmethod
+    def explain(func) -> list[str]:
+        """func가 실제로 실행한 쿼리들의 실행 계획 (저장소가 보내는 쿼리를 그대로 EXPLAIN)"""
+        with CaptureQueriesContext(connection) as context:
+            func()
+
+        lines = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                cursor.execute(f"{connection.ops.explain_query_prefix()} {query['sql']}")
+                # SQLite는 (id, parent, notused, detail), PostgreSQL은 (QUERY PLAN,) 행
+                lines.extend(str(row[-1]) for row in cursor.fetchall())
+        return lines
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from roleplay.fake_llm import FakeLLMApp, FakeLLMBackend, FakeLLMConfig
+
+
+class Command(BaseCommand):
+    help = "OpenAI chat completions 프로토콜을 흉내내는 로컬 가짜 LLM 서버 실행 (부하 테스트용)"
+
+    def add_arguments(self, parser):
+        defaults = FakeLLMConfig()
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument("--ttft", type=float, default=defaults.ttft, help="첫 토큰까지의 시간 (초)")
+        parser.add_argument(
+            "--tokens-per-second", type=float, default=defaults.tokens_per_second, help="첫 토큰 이후 생성 속도"
+        )
+        parser.add_argument(
+            "--error-rate", type=float, default=defaults.error_rate, help="500 오류로 응답할 요청의 비율"
+        )
+        parser.add_argument("--seed", type=int, default=None, help="오류 발생 난수 시드")
+
+    def handle(self, *args, **options):
+        try:
+            import uvicorn
+        except ImportError:
+            raise CommandError("uvicorn is required to run the fake LLM server.")
+
+        config = FakeLLMConfig(
+            ttft=options["ttft"],
+            tokens_per_second=options["tokens_per_second"],
+            error_rate=options["error_rate"],
+            seed=options["seed"],
+        )
+        self.stdout.write(
+            f"Fake LLM server on http://{options['host']}:{options['port']}/v1 "
+            f"(ttft={config.ttft}s, {config.tokens_per_second} tokens/s, error_rate={config.error_rate})"
+        )
+        uvicorn.run(FakeLLMApp(FakeLLMBackend(config)), host=options["host"], port=options["port"], log_level="warning")
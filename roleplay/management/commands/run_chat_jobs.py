@@ -0,0 +1,336 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Iterator, Optional
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from openai.lib._parsing import type_to_response_format_param
+from pydantic import ValidationError
+
+from roleplay.clients import get_openai_client
+from roleplay.core import (
+    AsyncChatService,
+    ChatResponse,
+    ChatService,
+    InMemoryStore,
+    Message,
+    SimpleChatConfig,
+    UsageInfo,
+)
+
+# Batch API 입력 파일 하나에 넣을 수 있는 최대 요청 수
+BATCH_MAX_REQUESTS = 50_000
+
+
+@dataclass
+class ChatJob:
+    """입력 JSONL의 요청 하나 (line: 1부터 시작하는 입력 파일의 줄 번호)"""
+
+    line: int
+    instruction: str
+    messages: list[dict]
+    model: str
+    temperature: float
+    max_tokens: int
+    id: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, line: int, data: dict, defaults: dict) -> "ChatJob":
+        messages = data.get("messages")
+        if "message" in data and not messages:
+            messages = [{"role": "user", "content": data["message"]}]
+        if not messages or not isinstance(messages, list):
+            raise ValueError("messages is required.")
+        if any(m.get("role") not in ("user", "assistant") or not isinstance(m.get("content"), str) for m in messages):
+            raise ValueError("Each message needs a user/assistant role and string content.")
+        if messages[-1]["role"] != "user":
+            raise ValueError("The last message must be a user message.")
+
+        return cls(
+            line=line,
+            instruction=data.get("instruction", ""),
+            messages=messages,
+            model=data.get("model") or defaults["model"],
+            temperature=data.get("temperature", defaults["temperature"]),
+            max_tokens=data.get("max_tokens", defaults["max_tokens"]),
+            id=data.get("id"),
+        )
+
+    @property
+    def message(self) -> str:
+        """응답을 받을 마지막 사용자 메시지"""
+        return self.messages[-1]["content"]
+
+    def make_service(self, service_class=AsyncChatService, **kwargs) -> ChatService:
+        """이전 메시지들을 대화 기록으로 가진 채팅 서비스"""
+        store = InMemoryStore()
+        store.add_messages([Message(role=m["role"], content=m["content"]) for m in self.messages[:-1]])
+        return service_class(
+            config=SimpleChatConfig(instruction=self.instruction),
+            chat_history_store=store,
+            model=self.model,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            **kwargs,
+        )
+
+
+def result_record(line: int, job_id: Optional[str], response: ChatResponse, latency_ms: Optional[int]) -> dict:
+    usage: Optional[UsageInfo] = response.usage
+    return {
+        "line": line,
+        "id": job_id,
+        "model": usage.model if usage else None,
+        "text": response.text,
+        "suggested_phrases": response.suggested_phrases,
+        "usage": asdict(usage) if usage else None,
+        "latency_ms": latency_ms,
+    }
+
+
+def error_record(line: int, job_id: Optional[str], error: str) -> dict:
+    return {"line": line, "id": job_id, "error": error}
+
+
+def batch_custom_id(job: ChatJob) -> str:
+    """Batch 요청의 custom_id (입력 줄 번호, id가 있으면 JSON으로 인코딩하여 뒤에 붙임)"""
+    if job.id is None:
+        return f"line-{job.line}"
+    return f"line-{job.line}:{json.dumps(job.id, ensure_ascii=False)}"
+
+
+def parse_custom_id(custom_id: str) -> tuple[int, Optional[str]]:
+    """batch_custom_id()로 만든 custom_id에서 (입력 줄 번호, id) 복원"""
+    line, _, job_id = custom_id.removeprefix("line-").partition(":")
+    return int(line), json.loads(job_id) if job_id else None
+
+
+def load_completed(path: str, retry_failed: bool = False) -> set[int]:
+    """출력 파일에서 이미 처리한 입력 줄 번호 조회 (retry_failed이면 마지막 기록이 오류인 줄은 제외)
+
+    작업 중 중단되어 마지막 줄이 쓰다 만 상태이면 그 부분을 잘라내어 이어 쓸 수 있게 합니다.
+    """
+    completed: set[int] = set()
+    if not os.path.exists(path):
+        return completed
+
+    with open(path, "rb+") as f:
+        valid_size = 0
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            valid_size += len(raw)
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                continue
+            if "error" in record and retry_failed:
+                completed.discard(record["line"])
+            else:
+                completed.add(record["line"])
+        f.truncate(valid_size)
+    return completed
+
+
+class ResultWriter:
+    """결과를 한 줄씩 출력 파일에 이어 쓰기 (줄마다 flush하여 중단되어도 완료된 결과는 남음)"""
+
+    def __init__(self, path: str):
+        self.file = open(path, "a", encoding="utf-8")
+        self.succeeded = 0
+        self.failed = 0
+
+    def write(self, record: dict) -> None:
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        if "error" in record:
+            self.failed += 1
+        else:
+            self.succeeded += 1
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "JSONL 파일의 채팅 요청(instruction, messages, model, temperature)을 ChatService로 일괄 처리. "
+        "입력을 한 줄씩 읽어 동시 요청 수를 제한하여 실행하고, 결과를 출력 JSONL에 완료되는 대로 기록합니다. "
+        "같은 출력 파일로 다시 실행하면 이미 처리한 줄은 건너뜁니다. "
+        "--backend batch는 OpenAI Batch API 입력 파일을 만들어 제출하고, --batch-id로 완료된 결과를 가져옵니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", nargs="?", help="요청 JSONL 파일 (--batch-id로 결과를 가져올 때는 생략)")
+        parser.add_argument("--output", required=True, help="결과 JSONL 파일 (이미 있으면 이어서 기록)")
+        parser.add_argument("--concurrency", type=int, default=8, help="동시에 보낼 요청 수")
+        parser.add_argument("--backend", choices=["direct", "batch"], default="direct", help="실행 방식")
+        parser.add_argument("--batch-id", help="완료된 Batch의 결과를 출력 파일에 기록")
+        parser.add_argument("--retry-failed", action="store_true", help="이전 실행에서 오류가 난 줄도 다시 실행")
+        parser.add_argument("--model", default="gpt-4o", help="model이 없는 요청에 사용할 모델")
+        parser.add_argument("--temperature", type=float, default=1.0, help="temperature가 없는 요청의 기본값")
+        parser.add_argument("--max-tokens", type=int, default=1000, help="max_tokens가 없는 요청의 기본값")
+
+    def handle(self, *args, **options):
+        completed = load_completed(options["output"], options["retry_failed"])
+        if completed:
+            self.stderr.write(f"Resuming: {len(completed)} lines already in {options['output']}")
+
+        if options["batch_id"]:
+            writer = ResultWriter(options["output"])
+            try:
+                self.fetch_batch(options["batch_id"], writer, completed)
+            finally:
+                writer.close()
+            self.stderr.write(f"{writer.succeeded} succeeded, {writer.failed} failed")
+            return
+
+        if not options["input"]:
+            raise CommandError("An input file is required.")
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+
+        defaults = {key: options[key] for key in ("model", "temperature", "max_tokens")}
+        jobs = self.read_jobs(options["input"], completed, defaults)
+
+        if options["backend"] == "batch":
+            self.submit_batch(jobs, options["output"])
+            return
+
+        writer = ResultWriter(options["output"])
+        try:
+            async_to_sync(self.run_direct)(jobs, writer, options["concurrency"])
+        finally:
+            writer.close()
+        self.stderr.write(f"{writer.succeeded} succeeded, {writer.failed} failed")
+
+    @staticmethod
+    def read_jobs(path: str, completed: set[int], defaults: dict) -> Iterator[ChatJob | dict]:
+        """입력 파일을 한 줄씩 읽어 처리할 요청 반환 (형식이 잘못된 줄은 오류 기록)"""
+        with open(path, encoding="utf-8") as f:
+            for line, raw in enumerate(f, start=1):
+                if line in completed or not raw.strip():
+                    continue
+                try:
+                    data = json.loads(raw)
+                    yield ChatJob.from_dict(line, data, defaults)
+                except (ValueError, AttributeError, TypeError) as e:
+                    yield error_record(line, None, f"Invalid request: {e}")
+
+    async def run_direct(self, jobs: Iterator[ChatJob | dict], writer: ResultWriter, concurrency: int) -> None:
+        """작업자 concurrency개가 큐에서 요청을 가져가 실행 (큐 크기를 제한하여 입력을 미리 다 읽지 않음)"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+        async def worker() -> None:
+            while (job := await queue.get()) is not None:
+                writer.write(await self.run_job(job) if isinstance(job, ChatJob) else job)
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for job in jobs:
+                await queue.put(job)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+    @staticmethod
+    async def run_job(job: ChatJob) -> dict:
+        started_at = time.perf_counter()
+        try:
+            response = await job.make_service().send(job.message)
+        except Exception as e:
+            return error_record(job.line, job.id, f"{type(e).__name__}: {e}")
+        return result_record(job.line, job.id, response, round((time.perf_counter() - started_at) * 1000))
+
+    def submit_batch(self, jobs: Iterator[ChatJob | dict], output: str) -> None:
+        """Batch API 입력 파일(custom_id: 입력 줄 번호와 id)을 만들어 제출 (형식 오류는 바로 출력 파일에 기록)"""
+        client = get_openai_client()
+        writer = ResultWriter(output)
+        count = 0
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", encoding="utf-8", delete=False) as f:
+            batch_input = f.name
+            try:
+                for job in jobs:
+                    if not isinstance(job, ChatJob):
+                        writer.write(job)
+                        continue
+                    request = job.make_service(ChatService, client=client).prepare_request(job.message)
+                    request["response_format"] = type_to_response_format_param(request["response_format"])
+                    body = {"custom_id": batch_custom_id(job), "method": "POST", "url": "/v1/chat/completions"}
+                    f.write(json.dumps({**body, "body": request}, ensure_ascii=False) + "\n")
+                    count += 1
+            finally:
+                writer.close()
+
+        try:
+            if count == 0:
+                self.stderr.write("Nothing to submit.")
+                return
+            if count > BATCH_MAX_REQUESTS:
+                raise CommandError(f"A batch can hold at most {BATCH_MAX_REQUESTS} requests; split the input file.")
+
+            with open(batch_input, "rb") as f:
+                batch_file = client.files.create(file=f, purpose="batch")
+            batch = client.batches.create(
+                input_file_id=batch_file.id, endpoint="/v1/chat/completions", completion_window="24h"
+            )
+        finally:
+            os.remove(batch_input)
+
+        self.stdout.write(batch.id)
+        self.stderr.write(
+            f"Submitted {count} requests as batch {batch.id}. When it completes, run: "
+            f"manage.py run_chat_jobs --batch-id {batch.id} --output {output}"
+        )
+
+    def fetch_batch(self, batch_id: str, writer: ResultWriter, completed: set[int]) -> None:
+        """완료된 Batch의 결과 파일과 오류 파일을 스트리밍으로 읽어 출력 형식으로 기록"""
+        client = get_openai_client()
+        batch = client.batches.retrieve(batch_id)
+        if batch.status != "completed":
+            raise CommandError(f"Batch {batch_id} is {batch.status}.")
+
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            with client.files.with_streaming_response.content(file_id) as response:
+                for raw in response.iter_lines():
+                    if not raw.strip():
+                        continue
+                    record = self.batch_result_record(json.loads(raw))
+                    if record["line"] not in completed:
+                        writer.write(record)
+
+    @staticmethod
+    def batch_result_record(result: dict) -> dict:
+        """Batch 결과 파일의 한 줄을 직접 실행 결과와 같은 형식으로 변환
+
+        응답이 ChatResponse 형식이 아니면 (max_tokens에서 잘린 경우 등) 그 줄만 오류로 기록합니다.
+        """
+        line, job_id = parse_custom_id(result["custom_id"])
+        response = result.get("response") or {}
+        if result.get("error") or response.get("status_code") != 200:
+            error = result.get("error") or response.get("body", {}).get("error") or {}
+            return error_record(line, job_id, error.get("message") or f"HTTP {response.get('status_code')}")
+
+        body = response["body"]
+        choice = body["choices"][0]
+        try:
+            chat_response = ChatResponse.model_validate_json(choice["message"].get("content") or "")
+        except ValidationError as e:
+            return error_record(line, job_id, f"{type(e).__name__} (finish_reason={choice.get('finish_reason')}): {e}")
+        usage = body.get("usage") or {}
+        chat_response.usage = UsageInfo(
+            input_tokens=usage.get("prompt_tokens", 0),
+            output_tokens=usage.get("completion_tokens", 0),
+            cached_input_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0,
+            model=body.get("model"),
+        )
+        return result_record(line, job_id, chat_response, None)
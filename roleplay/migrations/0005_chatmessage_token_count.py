@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("roleplay", "0004_alter_chatsession_model_alter_chatsession_title"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatmessage",
+            name="token_count",
+            field=models.PositiveIntegerField(
+                blank=True, help_text="컨텍스트에서 차지하는 토큰 수 (저장 시 계산)", null=True
+            ),
+        ),
+    ]
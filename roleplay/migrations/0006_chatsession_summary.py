@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("roleplay", "0005_chatmessage_token_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatsession",
+            name="summary",
+            field=models.TextField(blank=True, default="", help_text="이전 대화 요약"),
+        ),
+        migrations.AddField(
+            model_name="chatsession",
+            name="summary_until_id",
+            field=models.BigIntegerField(blank=True, help_text="요약에 포함된 마지막 메시지 ID", null=True),
+        ),
+    ]
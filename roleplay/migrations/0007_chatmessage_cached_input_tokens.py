@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("roleplay", "0006_chatsession_summary"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatmessage",
+            name="cached_input_tokens",
+            field=models.PositiveIntegerField(
+                blank=True, help_text="입력 토큰 중 프롬프트 캐시에서 처리된 토큰 수 (assistant 메시지)", null=True
+            ),
+        ),
+    ]
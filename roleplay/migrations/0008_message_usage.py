@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("roleplay", "0007_chatmessage_cached_input_tokens"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatmessage",
+            name="input_tokens",
+            field=models.PositiveIntegerField(blank=True, help_text="입력 토큰 수", null=True),
+        ),
+        migrations.AddField(
+            model_name="chatmessage",
+            name="latency_ms",
+            field=models.PositiveIntegerField(blank=True, help_text="응답 생성에 걸린 시간 (밀리초)", null=True),
+        ),
+        migrations.AddField(
+            model_name="chatmessage",
+            name="output_tokens",
+            field=models.PositiveIntegerField(blank=True, help_text="출력 토큰 수", null=True),
+        ),
+        migrations.AddField(
+            model_name="chatsession",
+            name="cached_input_tokens",
+            field=models.PositiveBigIntegerField(default=0, help_text="누적 캐시된 입력 토큰 수"),
+        ),
+        migrations.AddField(
+            model_name="chatsession",
+            name="input_tokens",
+            field=models.PositiveBigIntegerField(default=0, help_text="누적 입력 토큰 수"),
+        ),
+        migrations.AddField(
+            model_name="chatsession",
+            name="output_tokens",
+            field=models.PositiveBigIntegerField(default=0, help_text="누적 출력 토큰 수"),
+        ),
+    ]
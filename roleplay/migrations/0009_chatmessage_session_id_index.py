@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("roleplay", "0008_message_usage"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(fields=["session", "id"], name="roleplay_message_session_id"),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("roleplay", "0009_chatmessage_session_id_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatmessage",
+            name="model",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="응답을 생성한 모델 (assistant 메시지, 대체 모델로 라우팅된 경우 세션 모델과 다를 수 있음)",
+                max_length=50,
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("roleplay", "0010_chatmessage_model"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatmessage",
+            name="truncated",
+            field=models.BooleanField(
+                default=False,
+                help_text="클라이언트 연결이 끊겨 생성을 중단한 응답 (받은 데까지만 저장된 assistant 메시지)",
+            ),
+        ),
+    ]
@@ -38,6 +38,15 @@ class ChatSession(models.Model):
         help_text="최대 응답 토큰 수 (1~4096)",
     )
 
+    # 컨텍스트 윈도우 밖으로 밀려난 대화의 누적 요약
+    summary = models.TextField(blank=True, default="", help_text="이전 대화 요약")
+    summary_until_id = models.BigIntegerField(null=True, blank=True, help_text="요약에 포함된 마지막 메시지 ID")
+
+    # 누적 토큰 사용량 (메시지 저장 시 F() 표현식으로 원자적으로 증가)
+    input_tokens = models.PositiveBigIntegerField(default=0, help_text="누적 입력 토큰 수")
+    output_tokens = models.PositiveBigIntegerField(default=0, help_text="누적 출력 토큰 수")
+    cached_input_tokens = models.PositiveBigIntegerField(default=0, help_text="누적 캐시된 입력 토큰 수")
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -67,12 +76,41 @@ class ChatMessage(models.Model):
     # 메시지 정보
     role = models.CharField(max_length=20, choices=RoleChoices.choices)
     content = models.TextField()
+    token_count = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="컨텍스트에서 차지하는 토큰 수 (저장 시 계산)",
+    )
+
+    # API 사용량 (API를 호출해 받은 assistant 메시지에만 기록)
+    input_tokens = models.PositiveIntegerField(null=True, blank=True, help_text="입력 토큰 수")
+    output_tokens = models.PositiveIntegerField(null=True, blank=True, help_text="출력 토큰 수")
+    cached_input_tokens = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="입력 토큰 중 프롬프트 캐시에서 처리된 토큰 수 (assistant 메시지)",
+    )
+    latency_ms = models.PositiveIntegerField(null=True, blank=True, help_text="응답 생성에 걸린 시간 (밀리초)")
+    model = models.CharField(
+        max_length=50,
+        blank=True,
+        default="",
+        help_text="응답을 생성한 모델 (assistant 메시지, 대체 모델로 라우팅된 경우 세션 모델과 다를 수 있음)",
+    )
+    truncated = models.BooleanField(
+        default=False,
+        help_text="클라이언트 연결이 끊겨 생성을 중단한 응답 (받은 데까지만 저장된 assistant 메시지)",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name = "채팅 메시지"
         verbose_name_plural = "채팅 메시지들"
         ordering = ["pk"]
+        indexes = [
+            # 세션별 최근 메시지/커서 조회 (session_id = ? AND id < ? ORDER BY id DESC)
+            models.Index(fields=["session", "id"], name="roleplay_message_session_id"),
+        ]
 
     def __str__(self):
         content_preview = self.content[:50] + "..." if len(self.content) > 50 else self.content
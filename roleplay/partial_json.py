@@ -0,0 +1,180 @@
+"""
+Incremental parser for streamed structured (JSON) chat responses.
+
+구조화된 응답(response_format=ChatResponse)은 JSON 객체로 스트리밍되므로, 닫는 중괄호까지 받아야
+전체를 파싱할 수 있습니다. 이 모듈의 파서는 받은 조각을 한 번씩만 훑으면서
+
+- 최상위 text 문자열은 생성되는 대로 증가분을 돌려주고,
+- 최상위 suggested_phrases 배열의 문자열은 항목 하나가 완성될 때마다 돌려줍니다.
+
+매 조각마다 지금까지의 스냅샷 전체를 다시 파싱하지 않으므로 응답 길이에 비례하는 비용만 듭니다.
+"""
+
+import re
+from typing import Optional
+
+# 문자열 안에서 따옴표나 escape가 나오기 전까지의 일반 문자들
+_STRING_RUN = re.compile(r'[^"\\]+')
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class ChatResponseStreamParser:
+    """스트리밍되는 ChatResponse JSON을 조각 단위로 파싱
+
+    사용 예::
+
+        parser = ChatResponseStreamParser()
+        for chunk in json_chunks:
+            text_delta, phrases = parser.feed(chunk)
+    """
+
+    def __init__(self, text_field: str = "text", list_field: str = "suggested_phrases"):
+        self.text_field = text_field
+        self.list_field = list_field
+        self.text = ""  # 지금까지 파싱한 text
+        self.phrases: list[str] = []  # 지금까지 완성된 suggested_phrases 항목
+        self.received = 0  # 지금까지 받은 조각들의 전체 길이
+        self._pending = ""  # 조각 경계에서 잘린 escape (다음 조각과 이어서 해석)
+        self._stack: list[str] = []  # 열려 있는 "{" / "["
+        self._expect_key = False
+        self._key: Optional[str] = None  # 최상위 객체에서 현재 값의 key
+        self._in_string = False
+        self._string_role: Optional[str] = None  # "key", "text", "item" 또는 None(관심 없는 값)
+        self._chars: list[str] = []
+        self._delta: list[str] = []
+
+    def feed(self, chunk: str) -> tuple[str, list[str]]:
+        """JSON 조각 하나를 파싱
+
+        Returns:
+            (text 증가분, 이번 조각에서 완성된 suggested_phrases 항목들) 튜플
+        """
+        self.received += len(chunk)
+        data = self._pending + chunk if self._pending else chunk
+        self._pending = ""
+        self._delta = []
+        phrase_count = len(self.phrases)
+
+        index, length = 0, len(data)
+        while index < length:
+            if self._in_string:
+                index = self._scan_string(data, index)
+                continue
+
+            char = data[index]
+            index += 1
+            if char == '"':
+                self._start_string()
+            elif char == "{":
+                self._stack.append("{")
+                self._expect_key = True
+            elif char == "[":
+                self._stack.append("[")
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                self._expect_key = False
+            elif char == ",":
+                self._expect_key = bool(self._stack) and self._stack[-1] == "{"
+            elif char == ":":
+                self._expect_key = False
+            # 숫자, true/false/null, 공백은 관심 없는 값이므로 건너뜀
+
+        delta = "".join(self._delta)
+        self.text += delta
+        return delta, self.phrases[phrase_count:]
+
+    def _start_string(self) -> None:
+        self._in_string = True
+        self._chars = []
+        depth = len(self._stack)
+        if depth and self._stack[-1] == "{" and self._expect_key:
+            self._string_role = "key"
+        elif depth == 1 and self._key == self.text_field:
+            self._string_role = "text"
+        elif depth == 2 and self._stack[-1] == "[" and self._key == self.list_field:
+            self._string_role = "item"
+        else:
+            self._string_role = None
+
+    def _end_string(self) -> None:
+        value = "".join(self._chars)
+        role = self._string_role
+        if role == "key":
+            if len(self._stack) == 1:
+                self._key = value
+        elif role == "item":
+            self.phrases.append(value)
+        self._in_string = False
+        self._string_role = None
+        self._chars = []
+
+    def _scan_string(self, data: str, index: int) -> int:
+        """문자열 안쪽을 읽고 다음 위치 반환 (문자열이 끝나면 _end_string 호출)
+
+        text 문자열의 문자는 이번 feed()의 증가분에 바로 모으고, 그 외 문자열은 끝날 때까지 모음
+        """
+        chars = self._delta if self._string_role == "text" else self._chars
+        match = _STRING_RUN.match(data, index)
+        if match:
+            chars.append(match.group())
+            index = match.end()
+            if index >= len(data):
+                return index
+
+        char = data[index]
+        if char == '"':
+            self._end_string()
+            return index + 1
+
+        # escape: 조각 끝에서 잘렸으면 다음 조각과 이어서 해석
+        escaped = self._decode_escape(data, index)
+        if escaped is None:
+            self._pending = data[index:]
+            return len(data)
+        value, index = escaped
+        chars.append(value)
+        return index
+
+    @staticmethod
+    def _decode_escape(data: str, index: int) -> Optional[tuple[str, int]]:
+        """data[index]의 escape를 해석하여 (문자, 다음 위치) 반환 (아직 다 받지 못했으면 None)"""
+        if index + 1 >= len(data):
+            return None
+        kind = data[index + 1]
+        if kind != "u":
+            return _ESCAPES.get(kind, kind), index + 2
+
+        if index + 6 > len(data):
+            return None
+        code = int(data[index + 2 : index + 6], 16)
+        if 0xD800 <= code < 0xDC00:
+            # 서로게이트 쌍은 뒤의 \uXXXX와 합쳐야 한 문자가 됨
+            low = data[index + 6 : index + 12]
+            if len(low) < 6 and "\\u".startswith(low[:2]):
+                return None
+            low_code = int(low[2:], 16) if low.startswith("\\u") else 0
+            if 0xDC00 <= low_code < 0xE000:
+                return chr(0x10000 + ((code - 0xD800) << 10) + (low_code - 0xDC00)), index + 12
+            return "�", index + 6
+        if 0xDC00 <= code < 0xE000:
+            return "�", index + 6
+        return chr(code), index + 6
+
+
+class PlainTextStreamParser:
+    """구조화하지 않은(일반 텍스트) 응답용 파서 (ChatResponseStreamParser와 같은 인터페이스)
+
+    받은 조각이 그대로 text 증가분이고 suggested_phrases는 없습니다.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.phrases: list[str] = []
+        self.received = 0
+
+    def feed(self, chunk: str) -> tuple[str, list[str]]:
+        self.received += len(chunk)
+        self.text += chunk
+        return chunk, []
@@ -0,0 +1,256 @@
+"""
+Per-user rate limiting for LLM endpoints.
+
+사용자(비로그인 사용자는 IP)별로 다음 세 가지를 제한합니다.
+
+- 요청 수: 토큰 버킷 (분당 REQUESTS_PER_MINUTE개씩 채워지고 REQUEST_BURST개까지 모아둠)
+- 토큰 사용량: 토큰 버킷. 요청 전에는 잔량이 남아 있는지만 확인하고, 응답을 받은 뒤
+  실제 사용량(입력 + 출력 토큰)을 차감하므로 잔량이 음수가 될 수 있습니다.
+- 동시 스트림 수: MAX_CONCURRENT_STREAMS개까지
+
+상태는 Django 캐시(CACHE_ALIAS)에 저장되므로, 여러 워커 프로세스에서 제한이 유지되려면
+Redis, Memcached 같은 공유 캐시 백엔드를 사용해야 합니다 (settings의 REDIS_URL).
+프로세스별 캐시를 쓰면 배포 점검(check --deploy)에서 roleplay.W002로 경고합니다.
+"""
+
+import logging
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """제한을 넘은 요청 (retry_after: 다시 시도할 수 있을 때까지의 시간(초))"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class RateLimitConfig:
+    """사용자별 제한 설정"""
+
+    requests_per_minute: float = 20
+    request_burst: int = 10
+    tokens_per_minute: float = 40_000
+    token_burst: int = 40_000
+    max_concurrent_streams: int = 2
+    cache_alias: str = "default"
+
+    @classmethod
+    def from_settings(cls) -> Optional["RateLimitConfig"]:
+        """settings.ROLEPLAY_RATE_LIMIT 에서 설정 로드 (설정이 없거나 ENABLED가 꺼져 있으면 None)"""
+        options = getattr(settings, "ROLEPLAY_RATE_LIMIT", None)
+        if not options:
+            return None
+        options = dict(options)
+        if not options.pop("ENABLED", True):
+            return None
+        return cls(**{key.lower(): value for key, value in options.items()})
+
+
+class RateLimiter:
+    """캐시에 상태를 두는 사용자별 요청 수/토큰 사용량/동시 스트림 제한"""
+
+    KEY_PREFIX = "roleplay:ratelimit:"
+
+    # 버킷 갱신(읽기-계산-쓰기)을 직렬화하는 캐시 락의 유지/대기 시간 (초)
+    LOCK_TIMEOUT = 1
+    LOCK_WAIT = 0.2
+
+    # 동시 스트림 카운터 만료 시간 (워커가 강제 종료되어 반납하지 못한 슬롯이 영구히 남지 않도록)
+    STREAM_TIMEOUT = 5 * 60
+
+    def __init__(self, config: RateLimitConfig):
+        self.config = config
+
+    @classmethod
+    def from_settings(cls) -> Optional["RateLimiter"]:
+        config = RateLimitConfig.from_settings()
+        return cls(config) if config else None
+
+    @property
+    def cache(self):
+        return caches[self.config.cache_alias]
+
+    @staticmethod
+    def client_key(request, user=None) -> str:
+        """제한 단위 키: 로그인 사용자는 user id, 아니면 접속 IP"""
+        if user is None:
+            user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.pk}"
+        return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+    def acquire(self, client_key: str) -> None:
+        """요청 하나를 시작할 수 있는지 확인하고 요청 수와 동시 스트림 슬롯을 차지
+
+        Raises:
+            RateLimitExceeded: 토큰 사용량, 동시 스트림 수, 요청 수 중 하나라도 한도를 넘은 경우
+        """
+        tokens_key = self._key("tokens", client_key)
+        remaining = self._update_bucket(tokens_key, self.config.token_burst, self.config.tokens_per_minute, cost=0)
+        if remaining <= 0:
+            retry_after = self._retry_after(-remaining + 1, self.config.tokens_per_minute)
+            raise RateLimitExceeded(f"Token usage limit exceeded. Please retry in {retry_after} seconds.", retry_after)
+
+        streams_key = self._key("streams", client_key)
+        self.cache.add(streams_key, 0, timeout=self.STREAM_TIMEOUT)
+        try:
+            streams = self.cache.incr(streams_key)
+        except ValueError:
+            # add() 직후에 만료된 경우
+            self.cache.set(streams_key, 1, timeout=self.STREAM_TIMEOUT)
+            streams = 1
+        if streams > self.config.max_concurrent_streams:
+            self._decr(streams_key)
+            raise RateLimitExceeded("Too many concurrent requests. Please wait for the current response to finish.", 1)
+
+        requests_key = self._key("requests", client_key)
+        try:
+            remaining = self._update_bucket(requests_key, self.config.request_burst, self.config.requests_per_minute, 1)
+        except RateLimitExceeded:
+            self._decr(streams_key)
+            raise
+        if remaining < 0:
+            self._decr(streams_key)
+            retry_after = self._retry_after(-remaining, self.config.requests_per_minute)
+            raise RateLimitExceeded(f"Too many requests. Please retry in {retry_after} seconds.", retry_after)
+
+    def release(self, client_key: str) -> None:
+        """acquire()로 차지한 동시 스트림 슬롯 반납"""
+        self._decr(self._key("streams", client_key))
+
+    def charge(self, client_key: str, tokens: int) -> None:
+        """응답의 실제 토큰 사용량을 토큰 버킷에서 차감
+
+        응답을 보낸 뒤에 호출되므로 거절하는 대신 다른 워커의 락이 만료될 때까지 기다립니다.
+        그래도 락을 잡지 못하면 차감하지 않고 경고만 남깁니다.
+        """
+        if tokens > 0:
+            key = self._key("tokens", client_key)
+            try:
+                self._update_bucket(
+                    key,
+                    self.config.token_burst,
+                    self.config.tokens_per_minute,
+                    tokens,
+                    allow_debt=True,
+                    lock_wait=self.LOCK_TIMEOUT * 2,
+                )
+            except RateLimitExceeded:
+                logger.warning("Skipped charging %d tokens to %s: rate limit bucket is locked", tokens, client_key)
+
+    @contextmanager
+    def limit(self, client_key: str) -> Iterator[None]:
+        """with 블록 동안 동시 스트림 슬롯을 차지 (제한을 넘으면 RateLimitExceeded)"""
+        self.acquire(client_key)
+        try:
+            yield
+        finally:
+            self.release(client_key)
+
+    # 캐시만 다루고 버킷 락을 기다리는 동안 잠들 수 있으므로, DB 작업이 공유하는 스레드가 아닌 별도 스레드에서 실행
+    async def aacquire(self, client_key: str) -> None:
+        await sync_to_async(self.acquire, thread_sensitive=False)(client_key)
+
+    async def arelease(self, client_key: str) -> None:
+        await sync_to_async(self.release, thread_sensitive=False)(client_key)
+
+    async def acharge(self, client_key: str, tokens: int) -> None:
+        await sync_to_async(self.charge, thread_sensitive=False)(client_key, tokens)
+
+    @asynccontextmanager
+    async def alimit(self, client_key: str) -> AsyncIterator[None]:
+        await self.aacquire(client_key)
+        try:
+            yield
+        finally:
+            await self.arelease(client_key)
+
+    def _key(self, kind: str, client_key: str) -> str:
+        return f"{self.KEY_PREFIX}{kind}:{client_key}"
+
+    def _update_bucket(
+        self,
+        key: str,
+        capacity: float,
+        per_minute: float,
+        cost: float,
+        allow_debt: bool = False,
+        lock_wait: Optional[float] = None,
+    ) -> float:
+        """버킷을 현재 시각까지 채운 뒤 cost만큼 차감하고 남은 양을 반환
+
+        잔량이 모자라면 차감하지 않고 (음수인) 부족분을 반환합니다. allow_debt이면 부족해도 차감합니다.
+
+        Raises:
+            RateLimitExceeded: lock_wait (기본 LOCK_WAIT) 안에 버킷 락을 잡지 못한 경우
+        """
+        rate = per_minute / 60
+        with self._lock(key, self.LOCK_WAIT if lock_wait is None else lock_wait):
+            now = time.time()
+            state = self.cache.get(key)
+            if state is None:
+                tokens = float(capacity)
+            else:
+                tokens, updated_at = state
+                tokens = min(float(capacity), tokens + max(now - updated_at, 0) * rate)
+
+            if tokens >= cost or allow_debt:
+                tokens -= cost
+                remaining = tokens
+            else:
+                remaining = tokens - cost
+            self.cache.set(key, (tokens, now), timeout=self._bucket_timeout(capacity, tokens, rate))
+            return remaining
+
+    @staticmethod
+    def _bucket_timeout(capacity: float, tokens: float, rate: float) -> Optional[int]:
+        """버킷이 가득 찰 때까지만 보관 (그 뒤에는 없는 버킷과 같음)"""
+        if rate <= 0:
+            return None
+        return max(math.ceil((capacity - tokens) / rate), 1)
+
+    @staticmethod
+    def _retry_after(shortage: float, per_minute: float) -> int:
+        if per_minute <= 0:
+            return 60
+        return max(math.ceil(shortage / (per_minute / 60)), 1)
+
+    def _decr(self, key: str) -> None:
+        try:
+            if self.cache.decr(key) < 0:
+                self.cache.set(key, 0, timeout=self.STREAM_TIMEOUT)
+        except ValueError:
+            # 만료된 카운터
+            pass
+
+    @contextmanager
+    def _lock(self, key: str, wait: float) -> Iterator[None]:
+        """여러 워커의 버킷 갱신이 서로 덮어쓰지 않도록 cache.add로 잡는 짧은 락
+
+        Raises:
+            RateLimitExceeded: wait 안에 락을 잡지 못한 경우 (다른 갱신과 겹친 것이므로 잠시 뒤 재시도)
+        """
+        lock_key = f"{key}:lock"
+        deadline = time.monotonic() + wait
+        acquired = self.cache.add(lock_key, 1, timeout=self.LOCK_TIMEOUT)
+        while not acquired and time.monotonic() < deadline:
+            time.sleep(0.005)
+            acquired = self.cache.add(lock_key, 1, timeout=self.LOCK_TIMEOUT)
+        if not acquired:
+            raise RateLimitExceeded("Rate limiter is busy. Please retry in 1 second.", 1)
+        try:
+            yield
+        finally:
+            self.cache.delete(lock_key)
@@ -0,0 +1,257 @@
+"""
+Retry, timeout and circuit-breaker policies for LLM API calls.
+
+- 시도별 제한 시간: OpenAI 클라이언트의 요청 타임아웃으로 적용합니다. 스트리밍이 아닌 응답은
+  생성이 끝나야 첫 바이트가 오므로 사실상 시도 전체의 제한 시간이고, 스트리밍에서는
+  첫 토큰까지와 청크 사이의 최대 대기 시간입니다.
+- 재시도: 일시적인 오류(타임아웃, 연결 오류, 429, 5xx)만 지수 백오프 + full jitter로 재시도합니다.
+  스트리밍은 사용자에게 텍스트를 보내기 전까지만 재시도합니다.
+- 서킷 브레이커: 최근 호출의 실패율이 임계값을 넘으면 일정 시간 호출하지 않고 바로 실패(CircuitOpenError)하여,
+  장애 중인 업스트림을 기다리느라 워커가 묶이지 않도록 합니다.
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import httpx
+import openai
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """서킷이 열려 있어 호출하지 않고 실패한 요청 (retry_after: 다시 시도해 볼 수 있을 때까지의 시간(초))"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(
+            f"The AI service ({name}) is temporarily unavailable. Please retry in {max(round(retry_after), 1)} seconds."
+        )
+        self.name = name
+        self.retry_after = retry_after
+
+
+# 재시도하면 성공할 수 있는 (그리고 업스트림 장애로 집계할) 오류.
+# 스트리밍 응답을 읽는 도중의 타임아웃/연결 끊김은 SDK가 감싸지 않고 httpx 예외 그대로 전달됩니다.
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    httpx.TransportError,
+)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    return isinstance(exc, RETRYABLE_ERRORS)
+
+
+@dataclass(frozen=True)
+class ResilienceConfig:
+    """재시도/타임아웃/서킷 브레이커 설정"""
+
+    max_attempts: int = 3  # 첫 시도를 포함한 최대 시도 횟수
+    base_delay: float = 0.5  # 재시도 대기 시간의 기준값 (초, 시도마다 2배)
+    max_delay: float = 4.0  # 재시도 대기 시간 상한 (초)
+    attempt_timeout: float = 30.0  # 시도별 제한 시간 (초)
+    connect_timeout: float = 5.0  # 연결 수립 제한 시간 (초)
+    failure_rate_threshold: float = 0.5  # 서킷을 여는 최근 호출 실패율
+    window_size: int = 20  # 실패율을 계산할 최근 호출 수
+    minimum_calls: int = 10  # 실패율을 판단하기 위한 최소 호출 수
+    open_seconds: float = 30.0  # 서킷을 연 뒤 다시 시험해 보기까지의 시간 (초)
+
+    @classmethod
+    def from_settings(cls) -> "ResilienceConfig":
+        """settings.ROLEPLAY_RESILIENCE 에서 설정 로드"""
+        options = getattr(settings, "ROLEPLAY_RESILIENCE", {})
+        return cls(**{key.lower(): value for key, value in options.items()})
+
+
+class CircuitBreaker:
+    """최근 호출의 실패율로 여닫는 서킷 브레이커
+
+    - closed: 정상. 최근 window_size번 중 실패율이 임계값을 넘으면 open
+    - open: open_seconds 동안 호출하지 않고 바로 CircuitOpenError
+    - half_open: 시험 호출 하나만 허용. 성공하면 closed, 실패하면 다시 open
+      (시험 호출이 결과 없이 끝나면(클라이언트 연결 끊김 등) open_seconds 뒤에 다른 호출로 다시 시험)
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, config: Optional[ResilienceConfig] = None):
+        self.name = name
+        self.config = config or ResilienceConfig()
+        self._state = self.CLOSED
+        self._outcomes: deque[bool] = deque(maxlen=self.config.window_size)  # True: 실패
+        self._opened_at = 0.0
+        self._probe_started_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.metrics = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "short_circuited": 0,
+            "transitions": {},
+        }
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def allow(self) -> None:
+        """호출해도 되는지 확인 (서킷이 열려 있으면 CircuitOpenError)"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state()
+            if state == self.HALF_OPEN and self._probe_started_at is not None:
+                started_at = self._probe_started_at
+                if now - started_at < self.config.open_seconds:
+                    self.metrics["short_circuited"] += 1
+                    raise CircuitOpenError(self.name, started_at + self.config.open_seconds - now)
+            if state == self.OPEN:
+                self.metrics["short_circuited"] += 1
+                raise CircuitOpenError(self.name, max(self._opened_at + self.config.open_seconds - now, 0))
+            if state == self.HALF_OPEN:
+                self._probe_started_at = now
+            self.metrics["calls"] += 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.metrics["successes"] += 1
+            self._outcomes.append(False)
+            if self._current_state() == self.HALF_OPEN:
+                self._outcomes.clear()
+                self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.metrics["failures"] += 1
+            self._outcomes.append(True)
+            state = self._current_state()
+            if state == self.HALF_OPEN:
+                self._open()
+            elif state == self.CLOSED and len(self._outcomes) >= self.config.minimum_calls:
+                if sum(self._outcomes) / len(self._outcomes) >= self.config.failure_rate_threshold:
+                    self._open()
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.metrics["retries"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            failures = sum(self._outcomes)
+            return {
+                "state": self._current_state(),
+                "recent_failure_rate": round(failures / len(self._outcomes), 4) if self._outcomes else 0.0,
+                **self.metrics,
+                "transitions": dict(self.metrics["transitions"]),
+            }
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.config.open_seconds:
+            self._transition(self.HALF_OPEN)
+        return self._state
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self._transition(self.OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state == self._state:
+            return
+        key = f"{self._state}->{state}"
+        self.metrics["transitions"][key] = self.metrics["transitions"].get(key, 0) + 1
+        self._probe_started_at = None
+        log = logger.warning if state == self.OPEN else logger.info
+        log("Circuit breaker %s: %s", self.name, key)
+        self._state = state
+
+
+class Resilience:
+    """한 업스트림(모델)에 대한 재시도 정책과 서킷 브레이커
+
+    호출하는 쪽의 재시도 루프 예::
+
+        for attempt in resilience.attempts():
+            try:
+                result = call()
+            except Exception as e:
+                delay = resilience.failure_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            resilience.record_success()
+            break
+    """
+
+    def __init__(self, breaker: CircuitBreaker, config: Optional[ResilienceConfig] = None):
+        self.breaker = breaker
+        self.config = config or breaker.config
+        self._random = random.Random()
+
+    @property
+    def client_options(self) -> dict:
+        """OpenAI 클라이언트 with_options() 인자 (SDK 자체 재시도는 끄고 시도별 제한 시간 적용)"""
+        return {
+            "max_retries": 0,
+            "timeout": httpx.Timeout(self.config.attempt_timeout, connect=self.config.connect_timeout),
+        }
+
+    def attempts(self) -> Iterator[int]:
+        """시도 번호(1부터)를 차례로 반환. 매 시도 전에 서킷 상태를 확인"""
+        for attempt in range(1, self.config.max_attempts + 1):
+            self.breaker.allow()
+            yield attempt
+
+    def failure_delay(self, exc: BaseException, attempt: int, retry: bool = True) -> Optional[float]:
+        """실패를 기록하고 재시도 전 대기 시간을 반환 (재시도하지 않을 실패면 None)
+
+        Args:
+            retry: False이면 재시도할 수 있는 오류여도 재시도하지 않음 (예: 이미 텍스트를 보낸 스트림)
+        """
+        if not is_retryable(exc):
+            # 요청 자체의 문제(400, 인증 오류 등)는 업스트림 장애로 집계하지 않음
+            return None
+
+        self.breaker.record_failure()
+        if not retry or attempt >= self.config.max_attempts:
+            return None
+
+        self.breaker.record_retry()
+        logger.info("Retrying %s after %s (attempt %d)", self.breaker.name, type(exc).__name__, attempt)
+        # full jitter: 0 ~ min(max_delay, base_delay * 2^(attempt-1))
+        return self._random.uniform(0, min(self.config.max_delay, self.config.base_delay * 2 ** (attempt - 1)))
+
+    def record_success(self) -> None:
+        self.breaker.record_success()
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_resilience(name: str) -> Resilience:
+    """settings.ROLEPLAY_RESILIENCE 설정과 이름(모델)별 프로세스 공유 서킷 브레이커"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, ResilienceConfig.from_settings())
+    return Resilience(breaker)
+
+
+def circuit_breaker_stats() -> dict[str, dict]:
+    """이름별 서킷 브레이커 상태와 지표 (현재 워커 프로세스 기준)"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
@@ -0,0 +1,189 @@
+"""
+Latency-aware model routing with fallback.
+
+모델별로 최근 응답의 첫 토큰까지의 시간(TTFT)과 생성 속도(초당 출력 토큰 수)를 기록하여,
+
+- 세션의 모델(primary)이 지연 목표를 넘고 있으면 대체 모델(FALLBACKS)로 먼저 요청하고,
+- primary 요청이 (재시도 후에도) 일시적인 오류로 실패하거나 서킷이 열려 있으면 같은 턴에서 대체 모델로 다시 요청합니다.
+
+통계는 최근 WINDOW_SECONDS 동안의 기록만 사용하므로, 대체 모델로 우회하는 동안 primary의 기록이
+만료되면 다시 primary로 요청하여 회복 여부를 확인합니다. 상태는 워커 프로세스 메모리에 있습니다.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RoutingConfig:
+    """모델 라우팅 설정"""
+
+    fallbacks: dict[str, str] = field(default_factory=dict)  # 모델별 대체 모델
+    ttft_target: float = 3.0  # 첫 토큰까지의 시간 목표 (초, PERCENTILE 백분위수 기준)
+    min_tokens_per_second: float = 10.0  # 생성 속도 하한 (중앙값 기준)
+    percentile: float = 90  # TTFT 목표를 비교할 백분위수
+    window_seconds: float = 120.0  # 통계에 사용할 최근 기록의 기간 (초)
+    minimum_samples: int = 5  # 지연 여부를 판단하기 위한 최소 기록 수
+
+    @classmethod
+    def from_settings(cls) -> Optional["RoutingConfig"]:
+        """settings.ROLEPLAY_MODEL_ROUTING 에서 설정 로드 (설정이 없거나 ENABLED가 꺼져 있으면 None)"""
+        options = getattr(settings, "ROLEPLAY_MODEL_ROUTING", None)
+        if not options:
+            return None
+        options = dict(options)
+        if not options.pop("ENABLED", True):
+            return None
+        return cls(**{key.lower(): value for key, value in options.items()})
+
+
+def _percentile(values: list[float], p: float) -> Optional[float]:
+    """nearest-rank 백분위수 (값이 없으면 None)"""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(int(round(p / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+class _ModelStats:
+    """한 모델의 최근 응답 기록 (기록 시각, TTFT, 초당 토큰 수)"""
+
+    MAX_SAMPLES = 200
+
+    def __init__(self):
+        self.samples: deque[tuple[float, Optional[float], Optional[float]]] = deque(maxlen=self.MAX_SAMPLES)
+        self.errors: deque[float] = deque(maxlen=self.MAX_SAMPLES)
+        self.served = 0  # 이 모델이 응답한 턴 수
+        self.fallback_served = 0  # 그중 다른 모델의 대체로 응답한 턴 수
+
+    def recent(self, window_seconds: float, now: float) -> tuple[list[float], list[float], int]:
+        """최근 window_seconds 동안의 TTFT 목록, 초당 토큰 수 목록, 오류 수"""
+        since = now - window_seconds
+        ttfts, speeds = [], []
+        for recorded_at, ttft, tokens_per_second in self.samples:
+            if recorded_at < since:
+                continue
+            if ttft is not None:
+                ttfts.append(ttft)
+            if tokens_per_second is not None:
+                speeds.append(tokens_per_second)
+        errors = sum(1 for recorded_at in self.errors if recorded_at >= since)
+        return ttfts, speeds, errors
+
+
+class ModelRouter:
+    """모델별 지연 통계를 기준으로 요청할 모델 순서를 정하는 라우터"""
+
+    def __init__(self, config: RoutingConfig):
+        self.config = config
+        self._stats: dict[str, _ModelStats] = {}
+        self._lock = threading.Lock()
+
+    def route(self, model: str) -> list[str]:
+        """요청할 모델 순서 (앞의 모델이 실패하면 다음 모델로 요청)
+
+        대체 모델이 없으면 [model], primary가 지연 목표를 넘고 대체 모델은 정상이면
+        [대체 모델, model], 그 외에는 [model, 대체 모델]
+        """
+        fallback = self.config.fallbacks.get(model)
+        if not fallback or fallback == model:
+            return [model]
+        if self.is_degraded(model) and not self.is_degraded(fallback):
+            logger.info("Routing %s requests to %s (latency target exceeded)", model, fallback)
+            return [fallback, model]
+        return [model, fallback]
+
+    def is_degraded(self, model: str) -> bool:
+        """최근 TTFT 백분위수가 목표를 넘었거나 생성 속도 중앙값이 하한보다 낮은지 여부"""
+        with self._lock:
+            stats = self._stats.get(model)
+            if stats is None:
+                return False
+            ttfts, speeds, _ = stats.recent(self.config.window_seconds, time.monotonic())
+
+        if len(ttfts) >= self.config.minimum_samples:
+            if _percentile(ttfts, self.config.percentile) > self.config.ttft_target:
+                return True
+        if len(speeds) >= self.config.minimum_samples:
+            if _percentile(speeds, 50) < self.config.min_tokens_per_second:
+                return True
+        return False
+
+    def record(
+        self,
+        model: str,
+        ttft: Optional[float] = None,
+        tokens_per_second: Optional[float] = None,
+        fallback: bool = False,
+    ) -> None:
+        """응답 하나의 지연 기록 (fallback: 다른 모델 대신 응답한 경우)"""
+        with self._lock:
+            stats = self._get_stats(model)
+            stats.samples.append((time.monotonic(), ttft, tokens_per_second))
+            stats.served += 1
+            if fallback:
+                stats.fallback_served += 1
+
+    def record_error(self, model: str, exc: Exception, fallback: str) -> None:
+        """model 요청이 실패하여 fallback 모델로 넘어간 기록"""
+        logger.warning("Falling back from %s to %s after %s", model, fallback, type(exc).__name__)
+        with self._lock:
+            self._get_stats(model).errors.append(time.monotonic())
+
+    def stats(self) -> dict[str, dict]:
+        """모델별 최근 지연 통계 (현재 워커 프로세스 기준)"""
+        now = time.monotonic()
+        with self._lock:
+            snapshot = {
+                model: (*stats.recent(self.config.window_seconds, now), stats.served, stats.fallback_served)
+                for model, stats in self._stats.items()
+            }
+
+        result = {}
+        for model, (ttfts, speeds, errors, served, fallback_served) in snapshot.items():
+            ttft_p = _percentile(ttfts, self.config.percentile)
+            speed_p50 = _percentile(speeds, 50)
+            result[model] = {
+                "samples": max(len(ttfts), len(speeds)),
+                "ttft_p50_ms": round(_percentile(ttfts, 50) * 1000) if ttfts else None,
+                f"ttft_p{self.config.percentile:g}_ms": round(ttft_p * 1000) if ttft_p is not None else None,
+                "tokens_per_second_p50": round(speed_p50, 1) if speed_p50 is not None else None,
+                "recent_errors": errors,
+                "degraded": self.is_degraded(model),
+                "served": served,
+                "fallback_served": fallback_served,
+            }
+        return result
+
+    def _get_stats(self, model: str) -> _ModelStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = _ModelStats()
+        return stats
+
+
+_model_router: Optional[ModelRouter] = None
+_model_router_lock = threading.Lock()
+
+
+def get_model_router() -> Optional[ModelRouter]:
+    """settings.ROLEPLAY_MODEL_ROUTING 설정으로 만든 프로세스 공유 라우터 (설정이 없으면 None)"""
+    global _model_router
+
+    config = RoutingConfig.from_settings()
+    if config is None:
+        return None
+
+    with _model_router_lock:
+        if _model_router is None:
+            _model_router = ModelRouter(config)
+    return _model_router
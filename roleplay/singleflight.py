@@ -0,0 +1,309 @@
+"""
+Per-session single-flight for chat turns.
+
+같은 세션의 채팅 요청이 동시에 들어오면 (중복 전송, 여러 탭) 각각 LLM을 호출하고
+메시지를 뒤섞어 저장하게 됩니다. 이 모듈은 워커 프로세스 안에서
+
+- 같은 idempotency key의 요청은 한 번만 생성하고, 중복 요청은 진행 중인(또는 방금 끝난)
+  스트림에 붙어 처음부터 (재연결이면 마지막으로 받은 청크 다음부터) 같은 내용을 받도록 하고,
+- 같은 세션의 서로 다른 턴은 세션 락으로 도착 순서대로 하나씩 처리하고,
+- 구독하는 요청이 모두 연결을 끊은 뒤 abandon_grace 동안 다시 연결하지 않으면 생성 태스크를 취소하여
+  아무도 받지 않는 응답의 생성(토큰 비용)을 멈춥니다.
+
+상태는 프로세스 메모리에 있으므로, 워커가 여러 개라면 같은 세션의 요청이
+같은 워커로 가도록 (sticky) 라우팅해야 워커 간에도 보장됩니다.
+
+ASGI 서버에서는 모든 요청이 한 이벤트 루프에서 실행되지만, WSGI(runserver 등)에서는 비동기 뷰와
+응답 전송이 요청마다 새로 만든 이벤트 루프(스레드)에서 실행됩니다. 그래서 락과 스트림 전달은
+asyncio.Lock/Condition 대신 루프에 묶이지 않는 구현을 사용합니다.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import aclosing, asynccontextmanager
+from functools import partial
+from typing import AsyncGenerator, AsyncIterator, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _call_in_loop(loop: asyncio.AbstractEventLoop, callback: Callable[[], None]) -> bool:
+    """loop의 스레드에서 callback 실행 (현재 루프이면 바로 실행). 루프가 이미 닫혔으면 False"""
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        callback()
+        return True
+    try:
+        loop.call_soon_threadsafe(callback)
+    except RuntimeError:
+        return False
+    return True
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class StreamBroadcast:
+    """한 번 생성되는 스트림을 여러 구독자에게 처음부터 전달
+
+    구독자는 서로 다른 이벤트 루프에 있을 수 있으므로, 상태는 threading.Lock으로 보호하고
+    기다리는 구독자는 각자의 루프에서 깨웁니다.
+    """
+
+    def __init__(self, make_stream: Optional[Callable[[], AsyncIterator[str]]] = None):
+        self.chunks: list[str] = []
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.subscribers = 0  # 스트림을 받고 있는 요청 수
+        self.make_stream = make_stream  # 아직 시작하지 않은 생성 함수
+        self.task: Optional[asyncio.Task] = None  # 생성 태스크
+        self.loop: Optional[asyncio.AbstractEventLoop] = None  # 생성 태스크를 실행하는 이벤트 루프
+        self.abandon_handle: Optional[asyncio.TimerHandle] = None  # 구독자가 없을 때 예약한 취소
+        self._lock = threading.Lock()
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def start(self) -> Optional[asyncio.Task]:
+        """make_stream()을 현재 이벤트 루프의 태스크로 실행하며 청크를 전달 (이미 시작했으면 None)"""
+        with self._lock:
+            if self.make_stream is None:
+                return None
+            make_stream, self.make_stream = self.make_stream, None
+            self.loop = asyncio.get_running_loop()
+            self.task = self.loop.create_task(self._produce(make_stream))
+            return self.task
+
+    async def _produce(self, make_stream: Callable[[], AsyncIterator[str]]) -> None:
+        try:
+            # 취소되면 make_stream()도 바로 닫아 진행 중인 생성을 정리하도록 함
+            async with aclosing(make_stream()) as chunks:
+                async for chunk in chunks:
+                    await self.publish(chunk)
+        finally:
+            await self.close()
+
+    async def publish(self, chunk: str) -> None:
+        with self._lock:
+            self.chunks.append(chunk)
+            self._wake_waiters()
+
+    async def close(self) -> None:
+        with self._lock:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            _call_in_loop(loop, partial(_wake, future))
+
+    async def subscribe(self, start: int = 0) -> AsyncGenerator[str, None]:
+        """지금까지 생성된 청크를 먼저 보내고, 이후 청크를 생성되는 대로 전달
+
+        Args:
+            start: 건너뛸 앞쪽 청크 수 (재연결한 클라이언트가 이미 받은 청크)
+        """
+        loop = asyncio.get_running_loop()
+        index = start
+        while True:
+            with self._lock:
+                chunks = self.chunks[index:]
+                done = self.done
+                waiter = None if chunks or done else loop.create_future()
+                if waiter is not None:
+                    self._waiters.append((loop, waiter))
+            if waiter is not None:
+                await waiter
+                continue
+            index += len(chunks)
+            for chunk in chunks:
+                yield chunk
+            if done and index >= len(self.chunks):
+                return
+
+
+class _SessionLock:
+    """기다린 순서대로 넘겨주는 락 (기다리는 요청마다 자기 루프의 future를 두어 루프가 달라도 동작)"""
+
+    def __init__(self):
+        self.users = 0  # 락을 잡고 있거나 기다리는 요청 수 (0이 되면 정리)
+        self._locked = False
+        self._waiters: deque[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self._mutex = threading.Lock()
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._mutex:
+            if not self._locked:
+                self._locked = True
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._mutex:
+                handed_over = waiter not in self._waiters
+                if not handed_over:
+                    self._waiters.remove(waiter)
+            # 취소되기 직전에 락을 넘겨받았으면 다음 요청에 넘김
+            if handed_over:
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """다음으로 기다리는 요청에 락을 넘김 (기다리는 요청이 없으면 해제)"""
+        with self._mutex:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                if _call_in_loop(loop, partial(_wake, future)):
+                    return
+            self._locked = False
+
+
+class ChatTurnCoordinator:
+    """세션별 채팅 턴 직렬화와 idempotency key 기반 중복 요청 병합"""
+
+    def __init__(self, completed_ttl: float = 60.0, abandon_grace: float = 10.0):
+        """
+        Args:
+            completed_ttl: 생성이 끝난 스트림을 재전송용으로 보관할 시간 (초).
+                응답 직후의 재시도도 다시 생성하지 않고 같은 응답을 받습니다.
+            abandon_grace: 구독자가 모두 연결을 끊은 뒤 생성을 취소하기까지 기다리는 시간 (초).
+                그 사이에 Last-Event-ID로 다시 연결하면 생성을 계속합니다.
+        """
+        self.completed_ttl = completed_ttl
+        self.abandon_grace = abandon_grace
+        self._session_locks: dict[int, _SessionLock] = {}
+        self._flights: dict[tuple[int, str], StreamBroadcast] = {}
+        self._tasks: set[asyncio.Task] = set()
+        # 여러 스레드(WSGI)에서 위의 상태와 구독자 수를 함께 갱신하므로 보호
+        self._mutex = threading.Lock()
+
+    @asynccontextmanager
+    async def session_lock(self, session_id: int) -> AsyncIterator[None]:
+        """같은 세션의 턴을 도착 순서대로 하나씩 실행 (먼저 기다린 순서로 획득)"""
+        with self._mutex:
+            entry = self._session_locks.get(session_id)
+            if entry is None:
+                entry = self._session_locks[session_id] = _SessionLock()
+            entry.users += 1
+        try:
+            await entry.acquire()
+            try:
+                yield
+            finally:
+                entry.release()
+        finally:
+            with self._mutex:
+                entry.users -= 1
+                if entry.users == 0 and self._session_locks.get(session_id) is entry:
+                    del self._session_locks[session_id]
+
+    def stream(
+        self,
+        session_id: int,
+        idempotency_key: Optional[str],
+        make_stream: Callable[[], AsyncIterator[str]],
+        resume_from: int = 0,
+        detach: bool = True,
+    ) -> AsyncGenerator[str, None]:
+        """idempotency key가 같은 요청이 진행 중이거나 방금 끝났으면 그 스트림을 (resume_from번째 청크부터)
+        구독하고, 아니면 make_stream()을 태스크로 실행하여 처음부터 구독
+
+        생성은 요청과 분리된 태스크에서 실행되므로, 먼저 보낸 요청의 연결이 끊겨도
+        (클라이언트가 재전송하며 이전 요청을 취소하는 경우) 생성과 저장은 끝까지 진행됩니다.
+
+        Args:
+            detach: True이면 생성 태스크를 지금 현재 이벤트 루프에서 시작합니다 (ASGI).
+                False이면 처음 스트림을 읽는 구독자의 루프에서 시작합니다. WSGI에서는 뷰를 실행한 루프가
+                뷰가 끝나면 닫히므로, 응답을 전송하는 루프에서 생성해야 끝까지 진행됩니다.
+        """
+        with self._mutex:
+            self._expire_flights()
+
+            key = (session_id, idempotency_key) if idempotency_key else None
+            broadcast = self._flights.get(key) if key else None
+            if broadcast is not None:
+                return self._subscribe(broadcast, resume_from)
+
+            broadcast = StreamBroadcast(make_stream)
+            if key:
+                self._flights[key] = broadcast
+
+        if detach:
+            self._start(broadcast)
+        return self._subscribe(broadcast)
+
+    def _start(self, broadcast: StreamBroadcast) -> None:
+        """아직 시작하지 않은 생성을 현재 이벤트 루프에서 시작"""
+        task = broadcast.start()
+        if task is not None:
+            # 완료 전에 태스크가 GC 되지 않도록 참조 유지
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _subscribe(self, broadcast: StreamBroadcast, start: int = 0) -> AsyncGenerator[str, None]:
+        """구독자 수를 세면서 스트림을 전달하고, 마지막 구독자가 떠나면 생성 취소를 예약
+
+        생성이 아직 시작되지 않았으면 (detach=False) 이 구독자의 루프에서 시작합니다.
+        """
+        self._start(broadcast)
+        with self._mutex:
+            broadcast.subscribers += 1
+            handle, broadcast.abandon_handle = broadcast.abandon_handle, None
+        if handle is not None:
+            _call_in_loop(broadcast.loop, handle.cancel)
+        try:
+            async for chunk in broadcast.subscribe(start):
+                yield chunk
+        finally:
+            with self._mutex:
+                broadcast.subscribers -= 1
+                abandoned = broadcast.subscribers == 0 and not broadcast.done
+            if abandoned:
+                # 취소 타이머는 생성 태스크의 루프에 예약 (구독자의 루프는 먼저 닫힐 수 있음)
+                _call_in_loop(broadcast.loop, partial(self._schedule_abandon, broadcast))
+
+    def _schedule_abandon(self, broadcast: StreamBroadcast) -> None:
+        with self._mutex:
+            if broadcast.subscribers == 0 and not broadcast.done and broadcast.abandon_handle is None:
+                broadcast.abandon_handle = broadcast.loop.call_later(self.abandon_grace, self._abandon, broadcast)
+
+    def _abandon(self, broadcast: StreamBroadcast) -> None:
+        """아무도 받지 않는 생성 태스크 취소"""
+        with self._mutex:
+            broadcast.abandon_handle = None
+            abandoned = broadcast.subscribers == 0 and not broadcast.done
+        if abandoned:
+            logger.info("Cancelling chat generation abandoned by all clients")
+            broadcast.task.cancel()
+
+    def has_flight(self, session_id: int, idempotency_key: Optional[str]) -> bool:
+        """같은 key의 요청이 진행 중이거나 방금 끝나서, stream()이 새로 생성하지 않고 구독할지 여부"""
+        with self._mutex:
+            self._expire_flights()
+            return bool(idempotency_key) and (session_id, idempotency_key) in self._flights
+
+    def _expire_flights(self) -> None:
+        """보관 시간이 지난 완료 스트림 정리 (self._mutex를 잡은 상태에서 호출)"""
+        deadline = time.monotonic() - self.completed_ttl
+        expired = [
+            key
+            for key, broadcast in self._flights.items()
+            if broadcast.finished_at is not None and broadcast.finished_at < deadline
+        ]
+        for key in expired:
+            del self._flights[key]
+
+
+turn_coordinator = ChatTurnCoordinator()
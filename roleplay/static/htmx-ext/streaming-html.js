@@ -11,6 +11,9 @@
   const DEFAULT_HEADERS = {
     'HX-Request': 'true'
   };
+  // 연결이 끊겼을 때 Last-Event-ID로 이어 받기를 시도할 최대 횟수와 대기 시간 (시도마다 증가)
+  const MAX_RESUME_ATTEMPTS = 5;
+  const RESUME_DELAY_MS = 1000;
   
   // HTMX API 참조
   let api;
@@ -45,14 +48,18 @@
    * @param {string} method - HTTP 메서드
    * @param {FormData} formData - 폼 데이터
    * @param {AbortSignal} signal - 취소 시그널
+   * @param {string|null} lastEventId - 이어 받을 때 마지막으로 받은 이벤트 id
    * @returns {object} Fetch 옵션
    */
-  function buildFetchOptions(method, formData, signal) {
+  function buildFetchOptions(method, formData, signal, lastEventId) {
     const options = {
       method: method,
       headers: { ...DEFAULT_HEADERS },
       signal: signal
     };
+    if (lastEventId) {
+      options.headers['Last-Event-ID'] = lastEventId;
+    }
     
     // GET이 아닌 경우 body 추가
     if (method !== 'get') {
@@ -74,6 +81,48 @@
     return url + separator + params.toString();
   }
   
+  /**
+   * 수신한 텍스트에서 완성된 SSE 이벤트들을 분리
+   * @param {string} buffer - 아직 처리하지 않은 텍스트
+   * @returns {{events: Array<{id: string|null, event: string, data: string}>, rest: string}}
+   *   완성된 이벤트들과, 다음 청크와 이어 붙일 나머지 텍스트
+   */
+  function parseSseEvents(buffer) {
+    const blocks = buffer.split('\n\n');
+    const rest = blocks.pop();
+    const events = [];
+
+    for (const block of blocks) {
+      const event = { id: null, event: 'message', data: [] };
+      for (const line of block.split('\n')) {
+        const colon = line.indexOf(':');
+        const field = colon === -1 ? line : line.slice(0, colon);
+        let value = colon === -1 ? '' : line.slice(colon + 1);
+        if (value.startsWith(' ')) {
+          value = value.slice(1);
+        }
+        if (field === 'id') {
+          event.id = value;
+        } else if (field === 'event') {
+          event.event = value;
+        } else if (field === 'data') {
+          event.data.push(value);
+        }
+      }
+      events.push({ id: event.id, event: event.event, data: event.data.join('\n') });
+    }
+
+    return { events, rest };
+  }
+
+  /**
+   * 지정한 시간만큼 대기
+   * @param {number} ms - 대기 시간 (밀리초)
+   */
+  function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+  }
+
   /**
    * 청크 처리 및 DOM 업데이트
    * @param {HTMLElement} element - 소스 요소
@@ -152,54 +201,100 @@
         ? buildGetUrl(baseUrl, formData)
         : baseUrl;
       
-      // Fetch 옵션 생성
-      const fetchOptions = buildFetchOptions(
-        method, 
-        formData, 
-        abortController.signal
-      );
-      
       // 스트리밍 시작 이벤트 (선택적)
       if (element.hasAttribute('hx-streaming-start-event')) {
         htmx.trigger(element, 'streaming-start');
       }
       
-      // 요청 시작
-      const response = await fetch(url, fetchOptions);
-      
-      // 응답 검증
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-      
-      // 스트림 리더 생성
-      const reader = response.body.getReader();
-      const textDecoder = new TextDecoder();
-      let chunkCount = 0;
-      
       // 스왑 사양 가져오기
       const swapSpec = api.getSwapSpecification(element);
+      let chunkCount = 0;
+      let lastEventId = null;
+      let resumeAttempts = 0;
+      let completed = false;
       
-      // 스트림 처리
-      while (true) {
-        const { done, value } = await reader.read();
+      // done 이벤트를 받을 때까지, 연결이 끊기면 같은 폼 데이터(같은 idempotency key)와
+      // Last-Event-ID로 다시 요청하여 놓친 이벤트부터 이어 받음 (서버는 다시 생성하지 않음)
+      while (!completed) {
+        let response;
+        try {
+          response = await fetch(
+            url,
+            buildFetchOptions(method, formData, abortController.signal, lastEventId)
+          );
+        } catch (error) {
+          if (error.name === 'AbortError' || resumeAttempts >= MAX_RESUME_ATTEMPTS) {
+            throw error;
+          }
+          await sleep(RESUME_DELAY_MS * ++resumeAttempts);
+          continue;
+        }
         
-        if (done) {
-          // 스트리밍 완료 이벤트 (선택적)
-          if (element.hasAttribute('hx-streaming-complete-event')) {
-            htmx.trigger(element, 'streaming-complete', { 
-              totalChunks: chunkCount 
-            });
+        // 응답 검증
+        if (!response.ok) {
+          // 사용량 제한(429) 등 HTML 본문이 있는 오류 응답은 오류 메시지를 표시
+          // (chunk 이벤트는 발생시키지 않아 입력한 메시지가 지워지지 않음)
+          const contentType = response.headers.get('content-type') || '';
+          if (contentType.startsWith('text/html')) {
+            processChunk(element, targetElement, await response.text(), swapSpec);
+            return;
           }
-          break;
+          throw new Error(`HTTP error! status: ${response.status}`);
         }
         
-        // 청크 디코딩 및 처리
-        const responseHtml = textDecoder.decode(value);
-        processChunk(element, targetElement, responseHtml, swapSpec);
+        // 스트림 리더 생성
+        const reader = response.body.getReader();
+        const textDecoder = new TextDecoder();
+        let buffer = '';
         
-        // 청크 이벤트 발생 (기존 동작 유지)
-        htmx.trigger(element, 'chunk', { count: chunkCount++ });
+        try {
+          // 스트림 처리
+          while (!completed) {
+            const { done, value } = await reader.read();
+            if (done) {
+              break;
+            }
+            
+            // 청크 디코딩 (멀티바이트 문자가 청크 경계에서 잘리지 않도록 stream 모드 사용)
+            buffer += textDecoder.decode(value, { stream: true });
+            const parsed = parseSseEvents(buffer);
+            buffer = parsed.rest;
+            
+            for (const event of parsed.events) {
+              if (event.id !== null) {
+                lastEventId = event.id;
+                resumeAttempts = 0;
+              }
+              if (event.event === 'done') {
+                completed = true;
+                break;
+              }
+              processChunk(element, targetElement, event.data, swapSpec);
+              
+              // 청크 이벤트 발생 (기존 동작 유지)
+              htmx.trigger(element, 'chunk', { count: chunkCount++ });
+            }
+          }
+        } catch (error) {
+          if (error.name === 'AbortError') {
+            throw error;
+          }
+        }
+        
+        if (!completed) {
+          // done 이벤트 전에 연결이 끊김
+          if (resumeAttempts >= MAX_RESUME_ATTEMPTS) {
+            throw new Error('Stream closed before completion');
+          }
+          await sleep(RESUME_DELAY_MS * ++resumeAttempts);
+        }
+      }
+      
+      // 스트리밍 완료 이벤트 (선택적)
+      if (element.hasAttribute('hx-streaming-complete-event')) {
+        htmx.trigger(element, 'streaming-complete', { 
+          totalChunks: chunkCount 
+        });
       }
       
     } catch (error) {
@@ -0,0 +1,54 @@
+"""
+Lightweight serializers for streamed chat output.
+
+채팅 응답을 스트리밍할 때 메시지 틀(_chat_response.html)은 한 번만 템플릿으로 렌더링하고,
+text 증가분은 템플릿 엔진(context processor, include) 없이 미리 만들어 둔 앞뒤 문자열과
+HTML escape만으로 조각을 만들어 토큰마다의 서버 부담을 줄입니다.
+
+조각들은 Server-Sent Events 형식(id, event, data 필드)으로 전송합니다. 이벤트 id는 턴 안에서 1부터
+증가하므로, 연결이 끊긴 클라이언트는 같은 idempotency key와 Last-Event-ID 헤더로 다시 요청하여
+놓친 이벤트부터 이어 받습니다 (roleplay.singleflight가 생성 중인 턴의 조각을 보관).
+"""
+
+from html import escape
+from typing import Optional
+
+
+class HtmlDeltaSerializer:
+    """ai_message 본문 영역에 text 증가분을 이어 붙이는 htmx out-of-band 조각 생성기
+
+    첫 조각은 본문("Loading ...")을 교체하고(innerHTML), 이후 조각은 뒤에 이어 붙입니다(beforeend).
+    """
+
+    def __init__(self, dom_id: str):
+        target = escape(f"{dom_id}-content")
+        self._first_prefix = f'<span hx-swap-oob="innerHTML:#{target}">'
+        self._prefix = f'<span hx-swap-oob="beforeend:#{target}">'
+        self._is_first = True
+
+    def delta(self, text: str) -> str:
+        """text 증가분 하나의 HTML 조각"""
+        prefix = self._first_prefix if self._is_first else self._prefix
+        self._is_first = False
+        return f"{prefix}{escape(text, quote=False)}</span>"
+
+
+def sse_event(data: str, event_id: Optional[int] = None, event: Optional[str] = None) -> str:
+    """Server-Sent Events 이벤트 하나 (여러 줄의 data는 줄마다 data 필드로 나눔)"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+def parse_last_event_id(value: Optional[str]) -> int:
+    """Last-Event-ID 헤더 값 (클라이언트가 마지막으로 받은 이벤트 id, 없으면 0)"""
+    if not value:
+        return 0
+    event_id = int(value)
+    if event_id < 0:
+        raise ValueError("Last-Event-ID must not be negative.")
+    return event_id
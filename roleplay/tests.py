@@ -1,14 +1,131 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import warnings
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+from uuid import uuid4
+
+import httpx
+from asgiref.sync import sync_to_async
+from openai import AsyncOpenAI, InternalServerError, OpenAI
+
+from django.apps import apps
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
+from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
 
-from .models import RolePlaySession, ChatMessage
-from .core import UsageInfo
+from .models import ChatMessage, ChatSession
+from .cache import DjangoResponseCache, LRUResponseCache
+from .checks import check_history_cache, check_rate_limit_cache
+from .clients import ClientPoolConfig, OpenAIClientRegistry, _ConnectionTracker
+from .fake_llm import (
+    DEFAULT_REPLY,
+    AsyncFakeLLMTransport,
+    FakeLLMApp,
+    FakeLLMBackend,
+    FakeLLMConfig,
+    FakeLLMTransport,
+)
+from .core import (
+    AsyncChatService,
+    ChatResponse,
+    ChatService,
+    ConversationSummarizer,
+    ConversationSummary,
+    InMemoryStore,
+    Message,
+    PhraseSuggester,
+    SimpleChatConfig,
+    SuggestedPhrase,
+    SuggestedPhrases,
+    UsageInfo,
+    pack_messages,
+)
+from .django_stores import CachedChatHistoryStore, DjangoChatHistoryStore, flush_pending_history
+from .ratelimit import RateLimitConfig, RateLimiter, RateLimitExceeded
+from .resilience import CircuitBreaker, CircuitOpenError, Resilience, ResilienceConfig
+from .routing import ModelRouter, RoutingConfig
+from .partial_json import ChatResponseStreamParser
+from .singleflight import ChatTurnCoordinator
+from .streaming import HtmlDeltaSerializer
+from .tokens import count_message_tokens, estimate_tokens
+from .tracing import NULL_TRACER, BaseSpanSink, RingBufferSpanSink, Tracer
+
+
+def make_completion(text, suggested_phrases=(), prompt_tokens=10, completion_tokens=5, cached_tokens=0):
+    """parse/stream 결과를 흉내내는 완료 응답 객체 생성"""
+    parsed = ChatResponse(text=text, suggested_phrases=list(suggested_phrases))
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(parsed=parsed))],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens),
+        ),
+    )
+
+
+class FakeChatStream:
+    """client.beta.chat.completions.stream()이 반환하는 스트림 매니저 대역"""
+
+    def __init__(self, text, suggested_phrases=(), chunk_size=4, structured=True):
+        self.completion = make_completion(text, suggested_phrases)
+        if structured:
+            content = self.completion.choices[0].message.parsed.model_dump_json(exclude={"usage"})
+        else:
+            # response_format 없이 요청한 일반 텍스트 응답
+            content = text
+            self.completion.choices[0].message = SimpleNamespace(parsed=None, content=text)
+        self.events = []
+        for end in range(chunk_size, len(content) + chunk_size, chunk_size):
+            self.events.append(SimpleNamespace(type="content.delta", snapshot=content[:end]))
+        self.events.append(SimpleNamespace(type="content.done"))
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.closed = True
+        return False
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def get_final_completion(self):
+        return self.completion
+
+
+class FakeAsyncChatStream(FakeChatStream):
+    """AsyncOpenAI 클라이언트의 스트림 매니저 대역"""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+        return False
 
+    async def __aiter__(self):
+        for event in self.events:
+            yield event
 
-class RolePlaySessionModelTest(TestCase):
-    """RolePlaySession 모델 테스트"""
+    async def get_final_completion(self):
+        return self.completion
+
+
+class ChatSessionModelTest(TestCase):
+    """ChatSession 모델 테스트"""
 
     def setUp(self):
         """테스트 데이터 설정"""
@@ -16,57 +133,35 @@ class RolePlaySessionModelTest(TestCase):
 
     def test_create_session(self):
         """세션 생성 테스트"""
-        session = RolePlaySession.objects.create(
+        session = ChatSession.objects.create(
             user=self.user,
-            prompt_name="restaurant",
-            language="한국어",
-            user_role="손님",
-            gpt_role="웨이터",
-            difficulty=RolePlaySession.DifficultyChoices.BEGINNER,
+            title="레스토랑",
+            instruction="You are a waiter at a restaurant.",
         )
 
-        self.assertEqual(session.prompt_name, "restaurant")
-        self.assertEqual(session.language, "한국어")
-        self.assertEqual(session.difficulty, "beginner")
+        self.assertEqual(session.title, "레스토랑")
+        self.assertEqual(session.model, ChatSession.LLMModels.GPT_4O_MINI)
         self.assertEqual(session.input_tokens, 0)
         self.assertEqual(session.output_tokens, 0)
+        self.assertEqual(session.cached_input_tokens, 0)
 
     def test_session_without_user(self):
         """로그인하지 않은 사용자의 세션 생성 테스트"""
-        session = RolePlaySession.objects.create(
-            prompt_name="starbucks",
-            language="English",
-            user_role="customer",
-            gpt_role="barista",
-            difficulty=RolePlaySession.DifficultyChoices.INTERMEDIATE,
-        )
+        session = ChatSession.objects.create(title="Starbucks", instruction="You are a barista.")
 
         self.assertIsNone(session.user)
-        self.assertEqual(session.difficulty, "intermediate")
-
-    def test_difficulty_choices(self):
-        """난이도 선택지 테스트"""
-        choices = RolePlaySession.DifficultyChoices
-
-        self.assertEqual(choices.BEGINNER.value, "beginner")
-        self.assertEqual(choices.BEGINNER.label, "Beginner")
-        self.assertEqual(choices.INTERMEDIATE.value, "intermediate")
-        self.assertEqual(choices.ADVANCED.value, "advanced")
 
     def test_session_str_method(self):
         """__str__ 메서드 테스트"""
-        session = RolePlaySession.objects.create(
-            prompt_name="cafe", language="한국어", user_role="손님", gpt_role="직원"
-        )
+        session = ChatSession.objects.create(title="cafe", instruction="You are a barista.")
+        self.assertEqual(str(session), "cafe")
 
-        expected = f"cafe - 한국어 (ID: {session.id})"
-        self.assertEqual(str(session), expected)
+        untitled = ChatSession.objects.create(instruction="You are a barista.")
+        self.assertEqual(str(untitled), f"Session #{untitled.id}")
 
     def test_token_usage_tracking(self):
         """토큰 사용량 추적 테스트"""
-        session = RolePlaySession.objects.create(
-            prompt_name="restaurant", language="한국어", user_role="손님", gpt_role="웨이터"
-        )
+        session = ChatSession.objects.create(title="restaurant", instruction="You are a waiter.")
 
         # 토큰 사용량 업데이트
         session.input_tokens = 100
@@ -74,7 +169,7 @@ class RolePlaySessionModelTest(TestCase):
         session.save()
 
         # 데이터베이스에서 다시 조회
-        updated_session = RolePlaySession.objects.get(pk=session.pk)
+        updated_session = ChatSession.objects.get(pk=session.pk)
         self.assertEqual(updated_session.input_tokens, 100)
         self.assertEqual(updated_session.output_tokens, 150)
 
@@ -84,9 +179,7 @@ class ChatMessageModelTest(TestCase):
 
     def setUp(self):
         """테스트 데이터 설정"""
-        self.session = RolePlaySession.objects.create(
-            prompt_name="restaurant", language="한국어", user_role="손님", gpt_role="웨이터"
-        )
+        self.session = ChatSession.objects.create(title="restaurant", instruction="You are a waiter.")
 
     def test_create_user_message(self):
         """사용자 메시지 생성 테스트"""
@@ -177,13 +270,7 @@ class ModelIntegrationTest(TestCase):
     def test_full_conversation_flow(self):
         """전체 대화 흐름 테스트"""
         # 세션 생성
-        session = RolePlaySession.objects.create(
-            prompt_name="restaurant",
-            language="한국어",
-            user_role="손님",
-            gpt_role="웨이터",
-            difficulty=RolePlaySession.DifficultyChoices.INTERMEDIATE,
-        )
+        session = ChatSession.objects.create(title="restaurant", instruction="You are a waiter.")
 
         # 대화 진행
         user_msg = ChatMessage.objects.create(
@@ -224,14 +311,1758 @@ class ModelIntegrationTest(TestCase):
     def test_session_ordering(self):
         """세션 정렬 테스트"""
         # 여러 세션 생성
-        session1 = RolePlaySession.objects.create(
-            prompt_name="cafe", language="한국어", user_role="손님", gpt_role="직원"
-        )
-        session2 = RolePlaySession.objects.create(
-            prompt_name="restaurant", language="한국어", user_role="손님", gpt_role="웨이터"
-        )
+        session1 = ChatSession.objects.create(title="cafe", instruction="You are a barista.")
+        session2 = ChatSession.objects.create(title="restaurant", instruction="You are a waiter.")
 
-        # 가장 최근에 업데이트된 순서로 정렬되는지 확인
-        sessions = list(RolePlaySession.objects.all())
+        # 가장 최근에 생성된 순서로 정렬되는지 확인
+        sessions = list(ChatSession.objects.all())
         self.assertEqual(sessions[0].id, session2.id)  # 가장 최근에 생성된 것이 먼저
         self.assertEqual(sessions[1].id, session1.id)
+
+
+class ChatServiceStreamTest(TestCase):
+    """ChatService 스트리밍 모드 테스트"""
+
+    def setUp(self):
+        self.store = InMemoryStore()
+        self.service = ChatService(
+            config=SimpleChatConfig(instruction="You are a barista."),
+            chat_history_store=self.store,
+            api_key="test-key",
+        )
+        self.service.client = mock.Mock()
+        self.service.client.beta.chat.completions.stream.return_value = FakeChatStream(
+            "Hello! What can I get for you?", ["One latte, please."]
+        )
+
+    def test_send_stream_yields_text_deltas_then_response(self):
+        """text 증가분을 순서대로 yield 하고 마지막에 ChatResponse를 yield"""
+        chunks = list(self.service.send_stream("Hi"))
+
+        deltas, final = chunks[:-1], chunks[-1]
+        self.assertGreater(len(deltas), 1)
+        self.assertTrue(all(isinstance(delta, str) for delta in deltas))
+        self.assertEqual("".join(deltas), "Hello! What can I get for you?")
+        self.assertIsInstance(final, ChatResponse)
+        self.assertEqual(final.suggested_phrases, ["One latte, please."])
+        self.assertEqual(final.usage.input_tokens, 10)
+        self.assertEqual(final.usage.output_tokens, 5)
+
+    def test_send_stream_yields_phrases_as_they_complete(self):
+        """include_phrases이면 추천 표현 항목이 완성될 때마다 최종 응답보다 먼저 yield"""
+        self.service.client.beta.chat.completions.stream.return_value = FakeChatStream(
+            "Hello!", ["One latte, please.", "A mocha, please."]
+        )
+
+        chunks = list(self.service.send_stream("Hi", include_phrases=True))
+
+        phrases = [chunk for chunk in chunks if isinstance(chunk, SuggestedPhrase)]
+        self.assertEqual(phrases, [SuggestedPhrase(0, "One latte, please."), SuggestedPhrase(1, "A mocha, please.")])
+        self.assertIsInstance(chunks[-1], ChatResponse)
+        self.assertEqual("".join(chunk for chunk in chunks if isinstance(chunk, str)), "Hello!")
+
+    def test_send_stream_saves_messages(self):
+        """스트리밍이 끝나면 사용자/assistant 메시지가 모두 저장됨"""
+        list(self.service.send_stream("Hi"))
+
+        messages = self.store.get_messages()
+        self.assertEqual([message.role for message in messages], ["user", "assistant"])
+        self.assertEqual(messages[1].content, "Hello! What can I get for you?")
+        self.assertEqual(messages[1].usage.output_tokens, 5)
+
+
+class AsyncChatServiceTest(TestCase):
+    """AsyncChatService 테스트"""
+
+    def setUp(self):
+        self.store = InMemoryStore()
+        patcher = mock.patch("roleplay.core.get_async_openai_client", return_value=mock.Mock())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = AsyncChatService(
+            config=SimpleChatConfig(instruction="You are a barista."),
+            chat_history_store=self.store,
+            api_key="test-key",
+        )
+
+    async def test_send(self):
+        """비동기 호출 결과와 대화 기록 저장"""
+        self.service.client.beta.chat.completions.parse = mock.AsyncMock(
+            return_value=make_completion("Hello!", ["Hi there."])
+        )
+
+        chat_response = await self.service.send("Hi")
+
+        self.assertEqual(chat_response.text, "Hello!")
+        self.assertEqual(chat_response.usage.input_tokens, 10)
+        self.assertEqual([message.role for message in await self.store.aget_messages()], ["user", "assistant"])
+
+    async def test_send_stream(self):
+        """비동기 스트리밍도 text 증가분 후 ChatResponse를 yield"""
+        self.service.client.beta.chat.completions.stream.return_value = FakeAsyncChatStream("Hello there!")
+
+        chunks = [chunk async for chunk in self.service.send_stream("Hi")]
+
+        self.assertEqual("".join(chunks[:-1]), "Hello there!")
+        self.assertIsInstance(chunks[-1], ChatResponse)
+
+
+class ChatViewStreamTest(TestCase):
+    """채팅 뷰 스트리밍 응답 테스트"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.session = ChatSession.objects.create(user=self.user, title="카페", instruction="You are a barista.")
+        self.async_client.force_login(self.user)
+        # 테스트마다 세션 id가 재사용되므로 캐시된 대화 기록 창을 비움
+        cache.clear()
+
+    @mock.patch("roleplay.core.get_async_openai_client")
+    async def test_chat_streams_deltas_into_message_slot(self, get_client):
+        """생성 중인 텍스트가 ai_message 본문 영역으로 조각조각 전송됨"""
+        get_client.return_value.with_options.return_value.beta.chat.completions.stream.return_value = (
+            FakeAsyncChatStream("Welcome to our cafe!", ["A latte, please."])
+        )
+
+        response = await self.async_client.post(reverse("roleplay:chat", args=(self.session.pk,)), {"message": "Hi"})
+        chunks = [chunk.decode() async for chunk in response.streaming_content]
+
+        delta_chunks = [chunk for chunk in chunks if "-content" in chunk and "hx-swap-oob" in chunk]
+        self.assertGreater(len(delta_chunks), 1)
+        self.assertIn('hx-swap-oob="innerHTML:#', delta_chunks[0])
+        self.assertIn('hx-swap-oob="beforeend:#', delta_chunks[1])
+        self.assertIn("A latte, please.", chunks[-2])
+        self.assertEqual(chunks[-1], "event: done\ndata: \n\n")
+        # 추천 표현은 최종 응답 전에 advice 패널로 먼저 전송됨
+        phrase_chunks = [chunk for chunk in chunks[:-2] if "advice-phrases" in chunk]
+        self.assertEqual(len(phrase_chunks), 1)
+        self.assertIn("A latte, please.", phrase_chunks[0])
+        self.assertEqual(await self.session.message_set.acount(), 2)
+
+    @mock.patch("roleplay.core.get_async_openai_client")
+    async def test_chunks_are_framed_as_sse_events(self, get_client):
+        """응답 조각은 1부터 증가하는 id가 붙은 SSE 이벤트로 전송되고, 여러 줄은 data 필드로 나뉨"""
+        get_client.return_value.with_options.return_value.beta.chat.completions.stream.return_value = (
+            FakeAsyncChatStream("Welcome to our cafe!")
+        )
+
+        response = await self.async_client.post(reverse("roleplay:chat", args=(self.session.pk,)), {"message": "Hi"})
+        chunks = [chunk.decode() async for chunk in response.streaming_content]
+
+        ids = [int(chunk.split("\n", 1)[0].removeprefix("id: ")) for chunk in chunks[:-1]]
+        self.assertEqual(ids, list(range(1, len(chunks))))
+        self.assertTrue(all(chunk.endswith("\n\n") for chunk in chunks))
+        self.assertNotIn("\n<", chunks[0])
+
+    @mock.patch("roleplay.core.get_async_openai_client")
+    async def test_reconnect_resumes_after_last_event_id(self, get_client):
+        """같은 idempotency key와 Last-Event-ID로 다시 요청하면 다시 생성하지 않고 놓친 이벤트부터 받음"""
+        stream = get_client.return_value.with_options.return_value.beta.chat.completions.stream
+        stream.side_effect = lambda **kwargs: FakeAsyncChatStream("Welcome to our cafe!")
+        url = reverse("roleplay:chat", args=(self.session.pk,))
+        data = {"message": "Hi", "idempotency_key": uuid4().hex}
+
+        response = await self.async_client.post(url, data)
+        chunks = [chunk.decode() async for chunk in response.streaming_content]
+        resumed = await self.async_client.post(url, data, headers={"Last-Event-ID": "2"})
+        resumed_chunks = [chunk.decode() async for chunk in resumed.streaming_content]
+
+        self.assertEqual(resumed_chunks, chunks[2:])
+        self.assertEqual(stream.call_count, 1)
+        self.assertEqual(await self.session.message_set.acount(), 2)
+
+    async def test_reconnect_after_buffer_expired_does_not_regenerate(self):
+        """이어 받을 스트림이 없으면 새로 생성하지 않고 새로고침 안내를 보냄"""
+        url = reverse("roleplay:chat", args=(self.session.pk,))
+        data = {"message": "Hi", "idempotency_key": uuid4().hex}
+
+        response = await self.async_client.post(url, data, headers={"Last-Event-ID": "3"})
+        chunks = [chunk.decode() async for chunk in response.streaming_content]
+
+        self.assertIn("Reload the page", chunks[0])
+        self.assertEqual(chunks[-1], "event: done\ndata: \n\n")
+        self.assertEqual(await self.session.message_set.acount(), 0)
+
+    async def test_chat_page_renders_history(self):
+        """GET 요청 시 저장된 대화 기록을 렌더링"""
+        await self.session.message_set.acreate(role="user", content="안녕하세요")
+
+        response = await self.async_client.get(reverse("roleplay:chat", args=(self.session.pk,)))
+
+        self.assertContains(response, "안녕하세요")
+
+
+class ChatResponseStreamParserTest(TestCase):
+    """구조화된 응답 JSON 증분 파싱 테스트"""
+
+    response = {
+        "text": 'Say "hi"\nto the café ☕ \\ 😀',
+        "suggested_phrases": ["A latte, please.", "Ça va? 😀"],
+        "usage": None,
+        "extra": {"text": "ignored", "suggested_phrases": ["ignored"]},
+    }
+
+    def feed_in_chunks(self, content, size):
+        parser = ChatResponseStreamParser()
+        text, phrases = "", []
+        for start in range(0, len(content), size):
+            delta, completed = parser.feed(content[start : start + size])
+            text += delta
+            phrases += completed
+        return parser, text, phrases
+
+    def test_text_and_phrases_from_any_chunking(self):
+        """escape나 서로게이트 쌍이 조각 경계에서 잘려도 text와 추천 표현을 정확히 복원"""
+        for ensure_ascii in (True, False):
+            content = json.dumps(self.response, ensure_ascii=ensure_ascii)
+            for size in (1, 2, 3, 5, 7, len(content)):
+                parser, text, phrases = self.feed_in_chunks(content, size)
+                self.assertEqual(text, self.response["text"])
+                self.assertEqual(phrases, self.response["suggested_phrases"])
+                self.assertEqual(parser.received, len(content))
+
+    def test_text_grows_before_object_closes(self):
+        """닫히지 않은 text도 받은 만큼 증가분으로 돌려주고, 항목은 닫힐 때 한 번만 돌려줌"""
+        parser = ChatResponseStreamParser()
+
+        self.assertEqual(parser.feed('{"text": "Hel'), ("Hel", []))
+        self.assertEqual(parser.feed('lo", "suggested_phrases": ["A lat'), ("lo", []))
+        self.assertEqual(parser.feed('te", "B'), ("", ["A latte"]))
+        self.assertEqual(parser.text, "Hello")
+
+
+class HtmlDeltaSerializerTest(TestCase):
+    """스트리밍 text 증가분 직렬화 테스트"""
+
+    def test_first_delta_replaces_then_appends(self):
+        """첫 조각은 본문을 교체하고 이후 조각은 이어 붙이며, text는 escape됨"""
+        serializer = HtmlDeltaSerializer("id_abc")
+
+        self.assertEqual(serializer.delta("Hi "), '<span hx-swap-oob="innerHTML:#id_abc-content">Hi </span>')
+        self.assertEqual(
+            serializer.delta("<b>&</b>"),
+            '<span hx-swap-oob="beforeend:#id_abc-content">&lt;b&gt;&amp;&lt;/b&gt;</span>',
+        )
+
+
+class OpenAIClientRegistryTest(TestCase):
+    """공유 OpenAI 클라이언트 레지스트리 테스트"""
+
+    def setUp(self):
+        self.registry = OpenAIClientRegistry(ClientPoolConfig(max_connections=10, timeout=30.0))
+
+    def tearDown(self):
+        self.registry.close()
+
+    def test_client_is_shared_per_api_key_and_base_url(self):
+        """같은 (api_key, base_url)에는 같은 클라이언트를 반환"""
+        client = self.registry.get_client("key-1")
+
+        self.assertIs(self.registry.get_client("key-1"), client)
+        self.assertIsNot(self.registry.get_client("key-2"), client)
+        self.assertIsNot(self.registry.get_client("key-1", "http://localhost:8001/v1"), client)
+        self.assertEqual(client.timeout.read, 30.0)
+
+    async def test_async_client_is_shared_within_event_loop(self):
+        """같은 이벤트 루프 안에서는 비동기 클라이언트도 공유"""
+        client = self.registry.get_async_client("key-1")
+
+        self.assertIs(self.registry.get_async_client("key-1"), client)
+
+    def test_async_clients_are_closed_with_their_event_loop(self):
+        """이벤트 루프가 끝나면 (WSGI의 요청별 루프 등) 그 루프의 비동기 클라이언트를 닫고 레지스트리에서 제거"""
+
+        async def get_client():
+            return self.registry.get_async_client("key-1")
+
+        client = asyncio.run(get_client())
+
+        self.assertTrue(client.is_closed())
+        self.assertEqual(self.registry.stats(), {})
+
+    def test_app_startup_does_not_warm_up(self):
+        """관리 명령에서도 실행되는 AppConfig.ready()는 연결을 미리 맺지 않음 (서버 진입점에서만 준비)"""
+        with mock.patch("roleplay.clients.client_registry.warmup") as warmup:
+            apps.get_app_config("roleplay").ready()
+
+        warmup.assert_not_called()
+
+    def test_stats_reuse_ratio(self):
+        """연결별 network_stream으로 새 연결과 재사용을 구분"""
+        tracker = _ConnectionTracker()
+        first_connection, second_connection = mock.Mock(), mock.Mock()
+        for network_stream in [first_connection, first_connection, first_connection, second_connection]:
+            tracker.record(SimpleNamespace(extensions={"network_stream": network_stream}))
+
+        self.assertEqual(tracker.requests, 4)
+        self.assertEqual(tracker.new_connections, 2)
+
+        self.registry.get_client("key-1")
+        stats = self.registry.stats()
+        self.assertEqual(list(stats.values())[0]["requests"], 0)
+
+
+class TokenBudgetTest(TestCase):
+    """토큰 예산 기반 컨텍스트 구성 테스트"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.session = ChatSession.objects.create(user=self.user, title="카페", instruction="You are a barista.")
+
+    def test_estimate_tokens(self):
+        """영문은 약 4글자당 1토큰, 한글은 글자당 1토큰으로 추정"""
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+        self.assertEqual(estimate_tokens("안녕하세요"), 5)
+
+    def test_pack_messages_fills_newest_first(self):
+        """최신 메시지부터 예산 안에 들어가는 만큼만 시간순으로 반환"""
+        messages = [Message(role="user", content=f"message {i}", token_count=10) for i in range(5)]
+
+        packed = pack_messages(reversed(messages), token_budget=35)
+
+        self.assertEqual([message.content for message in packed], ["message 2", "message 3", "message 4"])
+
+    def test_pack_messages_always_keeps_latest(self):
+        """가장 최근 메시지는 예산을 넘어도 포함"""
+        packed = pack_messages([Message(role="user", content="long", token_count=500)], token_budget=100)
+
+        self.assertEqual(len(packed), 1)
+
+    def test_django_store_persists_token_count(self):
+        """저장 시 토큰 수를 함께 기록하고 읽을 때 다시 계산하지 않음"""
+        store = DjangoChatHistoryStore(session=self.session)
+        store.add_message(Message(role="user", content="Hello there"))
+
+        chat_message = self.session.message_set.get()
+        self.assertEqual(chat_message.token_count, count_message_tokens("Hello there"))
+
+        ChatMessage.objects.filter(pk=chat_message.pk).update(token_count=999)
+        self.assertEqual(store.get_recent_messages(token_budget=10)[0].token_count, 999)
+
+    def test_django_store_recent_messages_within_budget(self):
+        """DB 저장소도 예산 안의 최근 메시지만 반환"""
+        for i in range(30):
+            self.session.message_set.create(role="user", content=f"message {i}", token_count=10)
+        store = DjangoChatHistoryStore(session=self.session)
+
+        packed = store.get_recent_messages(token_budget=50)
+
+        self.assertEqual([message.content for message in packed], [f"message {i}" for i in range(25, 30)])
+
+    async def test_django_store_recent_messages_within_budget_async(self):
+        """비동기 조회도 동일한 결과"""
+        for i in range(30):
+            await self.session.message_set.acreate(role="user", content=f"message {i}", token_count=10)
+        store = DjangoChatHistoryStore(session=self.session)
+
+        packed = await store.aget_recent_messages(token_budget=50)
+
+        self.assertEqual([message.content for message in packed], [f"message {i}" for i in range(25, 30)])
+
+    def test_chat_service_history_budget(self):
+        """대화 기록 예산은 max_tokens와 모델 컨텍스트 크기에서 계산"""
+        config = SimpleChatConfig(instruction="You are a barista.")
+        system_tokens = count_message_tokens("You are a barista.", "gpt-4o-mini")
+
+        service = ChatService(config=config, api_key="test-key", model="gpt-4o-mini", max_tokens=500)
+        self.assertEqual(service.history_token_budget, 500 * ChatService.HISTORY_BUDGET_RATIO - system_tokens)
+
+        service = ChatService(
+            config=config, api_key="test-key", model="gpt-4o-mini", max_tokens=4000, max_input_tokens=10**6
+        )
+        self.assertEqual(service.history_token_budget, 128_000 - 4000 - system_tokens)
+
+
+class ConversationSummaryTest(TestCase):
+    """이전 대화 점진 요약 테스트"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.session = ChatSession.objects.create(user=self.user, title="카페", instruction="You are a barista.")
+        self.store = DjangoChatHistoryStore(session=self.session)
+        self.summarizer = ConversationSummarizer(threshold_tokens=30)
+        self.summarizer.summarize = mock.Mock(side_effect=lambda summary, messages: f"{len(messages)} messages")
+        self.service = ChatService(
+            config=SimpleChatConfig(instruction="You are a barista."),
+            chat_history_store=self.store,
+            api_key="test-key",
+            summarizer=self.summarizer,
+        )
+        self.service.history_token_budget = 50
+        self.service.client = mock.Mock()
+        self.service.client.beta.chat.completions.parse.return_value = make_completion("Sure.")
+
+    def add_messages(self, count):
+        for i in range(count):
+            self.session.message_set.create(role="user", content=f"message {i}", token_count=10)
+
+    def test_evicted_messages_are_folded_into_summary(self):
+        """윈도우 밖으로 밀려난 메시지가 임계값을 넘으면 요약에 합쳐 저장"""
+        self.add_messages(8)
+
+        self.service.send("Hello")
+
+        evicted = self.summarizer.summarize.call_args.args[1]
+        # 예산 50토큰을 넘었으므로 절반(25토큰)만 남기고 한 번에 밀어냄:
+        # "Sure."(6토큰) + "Hello"(6토큰) + "message 7"(10토큰)만 다음 컨텍스트에 남음
+        self.assertEqual([message.content for message in evicted], [f"message {i}" for i in range(7)])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.summary, "7 messages")
+        self.assertEqual(self.session.summary_until_id, evicted[-1].id)
+
+    def test_within_budget_is_not_summarized(self):
+        """대화 기록이 예산 안에 들어가면 요약하지 않음"""
+        self.add_messages(4)
+
+        self.service.send("Hello")
+
+        self.summarizer.summarize.assert_not_called()
+
+    def test_below_threshold_is_not_summarized(self):
+        """밀려난 메시지가 임계값보다 적으면 요약하지 않음"""
+        self.summarizer.threshold_tokens = 1000
+        self.add_messages(8)
+
+        self.service.send("Hello")
+
+        self.summarizer.summarize.assert_not_called()
+
+    def test_summary_is_injected_after_system_prompt(self):
+        """저장된 요약은 시스템 프롬프트 바로 다음에 들어가고, 요약된 메시지는 다시 보내지 않음"""
+        self.add_messages(3)
+        last_summarized = self.session.message_set.order_by("id").last()
+        self.store.save_summary(ConversationSummary(text="The user ordered a latte.", until_id=last_summarized.pk))
+
+        self.service.send("Hello")
+
+        messages = self.service.client.beta.chat.completions.parse.call_args.kwargs["messages"]
+        self.assertEqual(messages[0]["content"], "You are a barista.")
+        self.assertIn("The user ordered a latte.", messages[1]["content"])
+        self.assertEqual([message["content"] for message in messages[2:]], ["Hello"])
+
+    def test_summarizer_folds_only_new_messages(self):
+        """요약 요청에는 기존 요약과 새로 밀려난 메시지만 포함"""
+        request = self.summarizer._build_request("Earlier summary.", [Message(role="user", content="New one")])
+
+        prompt = request["messages"][0]["content"]
+        self.assertIn("Earlier summary.", prompt)
+        self.assertIn("user: New one", prompt)
+
+
+class ResponseCacheTest(TestCase):
+    """결정적 응답 캐시 테스트"""
+
+    def setUp(self):
+        self.cache = LRUResponseCache(max_entries=2)
+        self.service = ChatService(
+            config=SimpleChatConfig(instruction="You are a barista."),
+            api_key="test-key",
+            temperature=0.0,
+            response_cache=self.cache,
+        )
+        self.service.client = mock.Mock()
+        self.service.client.beta.chat.completions.parse.return_value = make_completion("Hello!", ["Hi there."])
+
+    def test_identical_request_is_served_from_cache(self):
+        """같은 요청은 API를 다시 호출하지 않고 cached로 표시된 응답 반환"""
+        first = self.service.send("Hi")
+        second = self.service.send("Hi")
+
+        self.service.client.beta.chat.completions.parse.assert_called_once()
+        self.assertFalse(first.usage.cached)
+        self.assertTrue(second.usage.cached)
+        self.assertEqual(second.text, "Hello!")
+        self.assertEqual(second.suggested_phrases, ["Hi there."])
+        self.assertEqual(second.usage.input_tokens, 10)
+        self.assertEqual(self.cache.stats()["hit_rate"], 0.5)
+
+    def test_key_depends_on_request_options(self):
+        """메시지나 설정이 다르면 다른 키"""
+        request = self.service._build_request("Hi", None)
+        key = self.cache.make_key(request)
+
+        self.assertEqual(key, self.cache.make_key(self.service._build_request("Hi", None)))
+        self.assertNotEqual(key, self.cache.make_key(self.service._build_request("Hello", None)))
+        self.assertNotEqual(key, self.cache.make_key({**request, "max_tokens": 10}))
+
+    def test_high_temperature_is_not_cached(self):
+        """온도가 높은 요청은 캐시하지 않음"""
+        self.service.temperature = 1.0
+
+        self.service.send("Hi")
+        self.service.send("Hi")
+
+        self.assertEqual(self.service.client.beta.chat.completions.parse.call_count, 2)
+        self.assertEqual(self.cache.stats()["hits"] + self.cache.stats()["misses"], 0)
+
+    def test_send_stream_cache_hit_yields_whole_text(self):
+        """스트리밍 캐시 적중 시 전체 텍스트를 한 번에 yield"""
+        self.service.send("Hi")
+
+        chunks = list(self.service.send_stream("Hi"))
+
+        self.assertEqual(chunks[0], "Hello!")
+        self.assertTrue(chunks[-1].usage.cached)
+        self.service.client.beta.chat.completions.stream.assert_not_called()
+
+    def test_lru_eviction_and_ttl(self):
+        """최대 항목 수를 넘으면 가장 오래 쓰지 않은 항목부터, TTL이 지나면 만료"""
+        self.cache.set("a", {"n": 1})
+        self.cache.set("b", {"n": 2})
+        self.cache.get("a")
+        self.cache.set("c", {"n": 3})
+
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), {"n": 1})
+
+        with mock.patch("roleplay.cache.time.monotonic", return_value=10**9):
+            self.assertIsNone(self.cache.get("a"))
+
+    async def test_django_cache_backend(self):
+        """Django 캐시 백엔드 사용 (비동기)"""
+        cache = DjangoResponseCache(ttl=60)
+
+        self.assertIsNone(await cache.alookup("key"))
+        await cache.aset("key", {"text": "Hello!"})
+
+        self.assertEqual(await cache.alookup("key"), {"text": "Hello!"})
+        self.assertEqual(cache.stats()["hit_rate"], 0.5)
+
+
+class PromptCachePrefixTest(TestCase):
+    """프롬프트 캐시를 위한 요청 prefix 안정성 테스트"""
+
+    def setUp(self):
+        self.store = InMemoryStore()
+        self.service = ChatService(
+            config=SimpleChatConfig(instruction="You are a barista."),
+            chat_history_store=self.store,
+            api_key="test-key",
+            prompt_cache_key="session-1",
+        )
+        self.service.history_token_budget = 100
+        self.service.client = mock.Mock()
+        self.service.client.beta.chat.completions.parse.return_value = make_completion(
+            "Sure.", prompt_tokens=100, cached_tokens=64
+        )
+
+    def sent_messages(self):
+        return [
+            [message["content"] for message in call.kwargs["messages"]]
+            for call in self.service.client.beta.chat.completions.parse.call_args_list
+        ]
+
+    def test_prefix_is_stable_until_budget_overflows(self):
+        """예산 안에서는 이전 요청이 다음 요청의 prefix이고, 넘치면 시작점을 한 번에 크게 옮김"""
+        for i in range(12):
+            self.service.send(f"order {i}")
+
+        requests = self.sent_messages()
+        prefix_breaks = [i for i in range(1, len(requests)) if requests[i][: len(requests[i - 1])] != requests[i - 1]]
+        # 턴마다 약 12토큰: 예산 100토큰이 넘칠 때만 prefix가 바뀜
+        self.assertLessEqual(len(prefix_breaks), 3)
+        self.assertTrue(all(request[0] == "You are a barista." for request in requests))
+        self.assertIsNotNone(self.store.get_summary().until_id)
+
+    def test_request_includes_prompt_cache_key(self):
+        """prompt_cache_key를 지정하면 요청에 포함"""
+        self.service.send("Hi")
+
+        self.assertEqual(
+            self.service.client.beta.chat.completions.parse.call_args.kwargs["prompt_cache_key"], "session-1"
+        )
+
+    def test_cached_input_tokens_are_recorded(self):
+        """프롬프트 캐시에서 처리된 입력 토큰 수를 사용량과 메시지에 기록"""
+        chat_response = self.service.send("Hi")
+
+        self.assertEqual(chat_response.usage.cached_input_tokens, 64)
+        self.assertEqual(self.store.get_messages()[-1].usage.cached_input_tokens, 64)
+
+    def test_django_store_persists_cached_input_tokens(self):
+        """Django 저장소는 assistant 메시지의 캐시된 입력 토큰 수를 저장"""
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        session = ChatSession.objects.create(user=user, title="카페", instruction="You are a barista.")
+        self.service.chat_history_store = DjangoChatHistoryStore(session=session)
+
+        self.service.send("Hi")
+
+        self.assertEqual(
+            list(session.message_set.values_list("role", "cached_input_tokens")), [("user", None), ("assistant", 64)]
+        )
+
+
+class UsageTrackingTest(TestCase):
+    """메시지별 사용량 저장과 세션 누적 사용량 테스트"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.session = ChatSession.objects.create(user=self.user, title="카페", instruction="You are a barista.")
+        self.store = DjangoChatHistoryStore(session=self.session)
+
+    def test_usage_and_latency_are_persisted(self):
+        """assistant 메시지의 사용량과 응답 시간을 저장하고 다시 읽어옴"""
+        usage = UsageInfo(input_tokens=120, output_tokens=30, cached_input_tokens=64)
+        self.store.add_message(Message(role="user", content="Hi"))
+        self.store.add_message(Message(role="assistant", content="Hello!", usage=usage, latency_ms=850))
+
+        user_message, assistant_message = self.store.get_messages()
+        self.assertIsNone(user_message.usage)
+        self.assertEqual(assistant_message.usage, usage)
+        self.assertEqual(assistant_message.latency_ms, 850)
+
+    def test_session_totals_are_incremented(self):
+        """세션 누적 사용량은 메시지를 다시 합산하지 않고 저장 시마다 증가"""
+        self.store.add_message(Message(role="assistant", content="A", usage=UsageInfo(100, 10, 0)))
+        self.store.add_message(Message(role="assistant", content="B", usage=UsageInfo(200, 20, 128)))
+
+        self.session.refresh_from_db()
+        self.assertEqual(
+            (self.session.input_tokens, self.session.output_tokens, self.session.cached_input_tokens), (300, 30, 128)
+        )
+
+    def test_response_cache_hit_is_not_billed(self):
+        """응답 캐시에서 가져온 응답은 사용량에 포함하지 않음"""
+        self.store.add_message(Message(role="assistant", content="A", usage=UsageInfo(100, 10, cached=True)))
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.input_tokens, 0)
+        self.assertIsNone(self.store.get_messages()[0].usage)
+
+    async def test_chat_service_records_usage(self):
+        """AsyncChatService 응답의 사용량과 응답 시간이 저장됨"""
+        with mock.patch("roleplay.core.get_async_openai_client", return_value=mock.Mock()):
+            service = AsyncChatService(
+                config=SimpleChatConfig(instruction="You are a barista."),
+                chat_history_store=self.store,
+                api_key="test-key",
+            )
+        service.client.beta.chat.completions.parse = mock.AsyncMock(return_value=make_completion("Hello!"))
+
+        await service.send("Hi")
+
+        assistant_message = await self.session.message_set.alast()
+        self.assertEqual((assistant_message.input_tokens, assistant_message.output_tokens), (10, 5))
+        self.assertIsNotNone(assistant_message.latency_ms)
+        await self.session.arefresh_from_db()
+        self.assertEqual(self.session.input_tokens, 10)
+
+
+class BatchedPersistenceTest(TestCase):
+    """한 턴의 메시지를 한 번에 저장하는 테스트"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.session = ChatSession.objects.create(user=self.user, title="카페", instruction="You are a barista.")
+        self.store = DjangoChatHistoryStore(session=self.session)
+        self.service = ChatService(
+            config=SimpleChatConfig(instruction="You are a barista."),
+            chat_history_store=self.store,
+            api_key="test-key",
+        )
+        self.service.client = mock.Mock()
+        self.service.client.beta.chat.completions.parse.return_value = make_completion("Hello!")
+
+    def test_turn_is_saved_with_single_bulk_insert(self):
+        """사용자 메시지와 응답을 한 번의 bulk_create로 저장하고 id를 채움"""
+        with mock.patch.object(ChatMessage.objects, "bulk_create", wraps=ChatMessage.objects.bulk_create) as bulk:
+            self.service.send("Hi")
+
+        bulk.assert_called_once()
+        self.assertEqual(list(self.session.message_set.values_list("role", flat=True)), ["user", "assistant"])
+        self.assertTrue(all(message.id for message in self.store.get_messages()))
+
+    def test_context_uses_unsaved_user_message(self):
+        """현재 사용자 메시지는 저장 전에도 컨텍스트의 마지막에 포함"""
+        self.session.message_set.create(role="user", content="Earlier", token_count=10)
+
+        self.service.send("Hi")
+
+        messages = self.service.client.beta.chat.completions.parse.call_args.kwargs["messages"]
+        self.assertEqual([message["content"] for message in messages[1:]], ["Earlier", "Hi"])
+
+    def test_nothing_is_saved_when_request_fails(self):
+        """API 호출이 실패하면 사용자 메시지도 저장하지 않음"""
+        self.service.client.beta.chat.completions.parse.side_effect = RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            self.service.send("Hi")
+
+        self.assertEqual(self.session.message_set.count(), 0)
+
+    def test_add_messages_updates_session_totals_once(self):
+        """여러 메시지의 사용량을 합쳐 세션 누적 사용량을 한 번에 갱신"""
+        self.store.add_messages(
+            [
+                Message(role="assistant", content="A", usage=UsageInfo(100, 10)),
+                Message(role="assistant", content="B", usage=UsageInfo(50, 5)),
+            ]
+        )
+
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.input_tokens, self.session.output_tokens), (150, 15))
+
+
+class ChatHistoryPaginationTest(TestCase):
+    """채팅 기록 keyset 페이지네이션 테스트"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.session = ChatSession.objects.create(user=self.user, title="카페", instruction="You are a barista.")
+        self.store = DjangoChatHistoryStore(session=self.session)
+        ChatMessage.objects.bulk_create(
+            [ChatMessage(session=self.session, role="user", content=f"message {i}") for i in range(5)]
+        )
+        cache.clear()
+        self.ids = list(self.session.message_set.values_list("id", flat=True))
+
+    def test_get_messages_before_id(self):
+        """before_id 이전의 최근 메시지를 limit개까지 시간순으로 반환"""
+        messages = self.store.get_messages(limit=2, before_id=self.ids[3])
+
+        self.assertEqual([message.content for message in messages], ["message 1", "message 2"])
+
+    def test_in_memory_store_before_id(self):
+        """메모리 저장소도 같은 커서 규칙을 따름"""
+        store = InMemoryStore()
+        store.add_messages([Message(role="user", content=f"message {i}") for i in range(5)])
+
+        messages = store.get_messages(limit=2, before_id=4)
+
+        self.assertEqual([message.content for message in messages], ["message 1", "message 2"])
+
+    @mock.patch("roleplay.views.MESSAGE_PAGE_SIZE", 2)
+    def test_chat_page_renders_newest_page(self):
+        """채팅 화면은 최근 페이지만 렌더링하고 이전 페이지 요청 링크를 포함"""
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse("roleplay:chat", args=(self.session.pk,)))
+
+        self.assertNotContains(response, "message 2")
+        self.assertContains(response, "message 3")
+        self.assertContains(response, f"?before_id={self.ids[3]}")
+
+    @mock.patch("roleplay.views.MESSAGE_PAGE_SIZE", 2)
+    def test_chat_messages_returns_previous_page(self):
+        """이전 페이지 요청은 커서 이전 메시지를 반환하고, 더 없으면 링크를 생략"""
+        self.client.force_login(self.user)
+        url = reverse("roleplay:chat_messages", args=(self.session.pk,))
+
+        response = self.client.get(url, {"before_id": self.ids[3]})
+        self.assertContains(response, "message 1")
+        self.assertContains(response, "message 2")
+        self.assertContains(response, f"?before_id={self.ids[1]}")
+
+        response = self.client.get(url, {"before_id": self.ids[1]})
+        self.assertContains(response, "message 0")
+        self.assertNotContains(response, "before_id=")
+
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+
+class HistoryQueryTest(TestCase):
+    """대화 기록 조회 쿼리 테스트"""
+
+    def setUp(self):
+        self.session = ChatSession.objects.create(title="카페", instruction="You are a barista.")
+        self.store = DjangoChatHistoryStore(session=self.session)
+        self.store.add_messages([Message(role="user", content="Hi"), Message(role="assistant", content="Hello!")])
+
+    def test_reads_only_message_columns(self):
+        """모델 인스턴스 없이 필요한 컬럼만 조회"""
+        with self.assertNumQueries(1) as context:
+            messages = self.store.get_messages(limit=10)
+
+        self.assertEqual([message.content for message in messages], ["Hi", "Hello!"])
+        self.assertNotIn('"session_id",', context.captured_queries[0]["sql"].split("FROM")[0])
+
+    def test_benchmark_command(self):
+        """벤치마크 명령이 인덱스 유무별 측정 결과와 실행 계획을 출력"""
+        out = StringIO()
+
+        call_command("benchmark_history_queries", messages=40, sessions=2, repeat=2, page_size=5, stdout=out)
+
+        self.assertIn("Without index roleplay_message_session_id", out.getvalue())
+        self.assertIn("With index roleplay_message_session_id", out.getvalue())
+        self.assertIn("roleplay_message_session_id", out.getvalue().split("With index")[1])
+        self.assertEqual(ChatMessage.objects.count(), 2)
+        with self.assertRaises(CommandError):
+            call_command("benchmark_history_queries", messages=4, sessions=1, repeat=1, stdout=StringIO())
+
+    def test_endpoint_benchmark_command(self):
+        """엔드포인트 벤치마크가 시나리오별 지연 시간/TTFB/쿼리 수를 JSON으로 출력하고 시드 데이터를 롤백"""
+        out = StringIO()
+
+        call_command(
+            "benchmark_endpoints",
+            requests=4,
+            concurrency=2,
+            sessions=2,
+            history=2,
+            ttft=0,
+            tokens_per_second=0,
+            scenario=["roleplay.chat", "todo.list"],
+            stdout=out,
+        )
+
+        results = json.loads(out.getvalue())["results"]
+        self.assertEqual(set(results), {"roleplay.chat", "todo.list"})
+        self.assertEqual(results["roleplay.chat"]["errors"], 0)
+        self.assertIn("p99", results["roleplay.chat"]["ttfb_ms"])
+        self.assertGreater(results["todo.list"]["queries_per_request"], 0)
+        self.assertEqual(ChatSession.objects.count(), 1)
+
+
+class CachedChatHistoryStoreTest(TestCase):
+    """캐시 기반 지연 쓰기(write-behind) 대화 기록 저장소 테스트"""
+
+    def setUp(self):
+        cache.clear()
+        self.session = ChatSession.objects.create(title="카페", instruction="You are a barista.")
+        self.store = CachedChatHistoryStore(session=self.session)
+
+    def test_add_messages_is_deferred_until_flush(self):
+        """add_messages는 DB에 쓰지 않고, flush()에서 id를 부여하며 저장"""
+        with self.assertNumQueries(0):
+            self.store.add_messages([Message(role="user", content="Hi"), Message(role="assistant", content="Hello!")])
+        self.assertEqual(self.session.message_set.count(), 0)
+        self.assertEqual(self.store.get_message_count(), 2)
+
+        self.store.flush()
+
+        self.assertEqual(self.session.message_set.count(), 2)
+        self.assertTrue(all(message.id for message in self.store.get_messages(limit=10)))
+
+    def test_warm_window_serves_context_without_queries(self):
+        """캐시 창이 채워진 뒤에는 컨텍스트 구성과 최근 페이지 조회에 DB를 쓰지 않음"""
+        self.store.get_recent_messages(token_budget=1000)
+        self.store.add_messages([Message(role="user", content="Hi"), Message(role="assistant", content="Hello!")])
+        self.store.flush()
+
+        with self.assertNumQueries(0):
+            recent = self.store.get_recent_messages(token_budget=1000)
+            page = CachedChatHistoryStore(session=self.session).get_messages(limit=10)
+
+        self.assertEqual([message.content for message in recent], ["Hi", "Hello!"])
+        self.assertEqual([message.id for message in page], [message.id for message in recent])
+
+    def test_falls_back_to_db_before_window(self):
+        """after_id가 캐시 창보다 앞이면 DB에서 조회"""
+        ChatMessage.objects.bulk_create(
+            [ChatMessage(session=self.session, role="user", content=f"message {i}", token_count=5) for i in range(5)]
+        )
+        ids = list(self.session.message_set.values_list("id", flat=True))
+
+        with mock.patch.object(CachedChatHistoryStore, "WINDOW_SIZE", 2):
+            self.assertEqual(self.store._get_window()["floor_id"], ids[2])
+            messages = self.store.get_recent_messages(token_budget=1000, after_id=ids[0])
+
+        self.assertEqual([message.content for message in messages], [f"message {i}" for i in range(1, 5)])
+
+    def test_concurrent_flushes_keep_every_turn(self):
+        """두 워커의 flush가 캐시 창 갱신 중에 겹쳐도 다음 조회에 두 턴의 메시지가 모두 보임"""
+        first = CachedChatHistoryStore(session=self.session)
+        second = CachedChatHistoryStore(session=self.session)
+        first.get_recent_messages(token_budget=1000)
+        first.add_message(Message(role="user", content="first"))
+        second.add_message(Message(role="user", content="second"))
+
+        default_cache = caches["default"]
+        original_get = default_cache.get
+
+        def get_while_other_worker_flushes(key, *args, **kwargs):
+            # 첫 번째 워커가 창을 읽은 직후, 다시 쓰기 전에 두 번째 워커가 저장을 마침
+            value = original_get(key, *args, **kwargs)
+            if key == first.cache_key and second._pending:
+                second.flush()
+            return value
+
+        with mock.patch.object(default_cache, "get", side_effect=get_while_other_worker_flushes):
+            first.flush()
+
+        messages = CachedChatHistoryStore(session=self.session).get_recent_messages(token_budget=1000)
+        self.assertEqual([message.content for message in messages], ["first", "second"])
+
+    def test_stale_window_written_late_is_rebuilt(self):
+        """다른 워커가 저장하기 전에 만든 창이 늦게 캐시에 쓰여도 버전이 달라 DB에서 다시 읽음"""
+        stale = self.store._get_window()
+        writer = CachedChatHistoryStore(session=self.session)
+        writer.add_message(Message(role="user", content="Hi"))
+        writer.flush()
+        cache.set(self.store.cache_key, stale)
+
+        messages = self.store.get_recent_messages(token_budget=1000)
+
+        self.assertEqual([message.content for message in messages], ["Hi"])
+
+    def test_window_built_between_save_and_version_bump_has_no_duplicates(self):
+        """다른 워커가 저장한 뒤 버전을 올리기 전에 만든 창에는, 그 워커가 같은 메시지를 다시 붙이지 않음"""
+        messages = [Message(role="user", content="Hi"), Message(role="assistant", content="Hello!")]
+        writer = CachedChatHistoryStore(session=self.session)
+        # writer.flush()의 DB 저장까지만 진행
+        DjangoChatHistoryStore.add_messages(writer, messages)
+        # 그 사이에 다른 워커가 (이미 저장된 메시지를 포함해) 현재 버전으로 창을 만듦
+        self.store._get_window()
+        # writer가 버전을 올리고 창에 반영
+        writer._append_to_window(messages)
+
+        recent = CachedChatHistoryStore(session=self.session).get_recent_messages(token_budget=1000)
+
+        self.assertEqual([message.content for message in recent], ["Hi", "Hello!"])
+
+    def test_flush_pending_history(self):
+        """워커 종료 훅은 아직 저장되지 않은 메시지를 모두 저장"""
+        self.store.add_message(Message(role="user", content="Hi"))
+
+        flush_pending_history()
+
+        self.assertEqual(self.session.message_set.count(), 1)
+
+    def test_send_stream_flushes_when_client_disconnects(self):
+        """최종 응답을 받은 뒤 스트림이 닫혀도 (클라이언트 연결 끊김) 대화가 저장됨"""
+        service = ChatService(
+            config=SimpleChatConfig(instruction="You are a barista."),
+            chat_history_store=self.store,
+            api_key="test-key",
+        )
+        service.client = mock.Mock()
+        service.client.beta.chat.completions.stream.return_value = FakeChatStream("Welcome!")
+
+        stream = service.send_stream("Hi")
+        for chunk in stream:
+            if isinstance(chunk, ChatResponse):
+                break
+        stream.close()
+
+        self.assertEqual(list(self.session.message_set.values_list("content", flat=True)), ["Hi", "Welcome!"])
+
+    def test_deploy_check_warns_on_process_local_cache(self):
+        """프로세스별 캐시를 쓰면 배포 점검에서 경고하고, 공유 캐시를 쓰면 경고하지 않음"""
+        locmem = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://"}}
+
+        with override_settings(CACHES=locmem):
+            self.assertIn("roleplay.W001", [message.id for message in check_history_cache(None)])
+        with override_settings(CACHES=redis):
+            self.assertEqual(check_history_cache(None), [])
+
+
+class FakeLLMBackendTest(TestCase):
+    """오프라인 부하 테스트용 가짜 LLM 백엔드 테스트"""
+
+    config = FakeLLMConfig(ttft=0, tokens_per_second=0)
+
+    def make_service(self, service_class=ChatService, transport=None, **kwargs):
+        if service_class is ChatService:
+            transport = transport or FakeLLMTransport(FakeLLMBackend(self.config))
+            client = OpenAI(
+                api_key="test-key", base_url="http://fake/v1", http_client=httpx.Client(transport=transport)
+            )
+        else:
+            transport = transport or AsyncFakeLLMTransport(FakeLLMBackend(self.config))
+            client = AsyncOpenAI(
+                api_key="test-key", base_url="http://fake/v1", http_client=httpx.AsyncClient(transport=transport)
+            )
+        return service_class(config=SimpleChatConfig(instruction="You are a barista."), client=client, **kwargs)
+
+    def test_injected_client_returns_structured_response(self):
+        """주입한 클라이언트로 구조화된 ChatResponse와 사용량을 받음"""
+        response = self.make_service().send("Hi")
+
+        self.assertEqual(response.text, DEFAULT_REPLY)
+        self.assertTrue(response.suggested_phrases)
+        self.assertGreater(response.usage.output_tokens, 0)
+
+    def test_stream_yields_deltas(self):
+        """스트리밍 요청은 토큰 단위 delta와 최종 ChatResponse를 반환"""
+        chunks = list(self.make_service().send_stream("Hi"))
+
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual("".join(chunks[:-1]), DEFAULT_REPLY)
+        self.assertGreater(chunks[-1].usage.input_tokens, 0)
+
+    async def test_async_stream_through_asgi_app(self):
+        """로컬 HTTP 서버용 ASGI 앱도 같은 프로토콜로 응답"""
+        transport = httpx.ASGITransport(app=FakeLLMApp(FakeLLMBackend(self.config)))
+        service = self.make_service(AsyncChatService, transport=transport)
+
+        chunks = [chunk async for chunk in service.send_stream("Hi")]
+
+        self.assertEqual(str(chunks[-1]), DEFAULT_REPLY)
+
+    def test_error_rate(self):
+        """error_rate 비율만큼 500 오류로 응답"""
+        backend = FakeLLMBackend(FakeLLMConfig(ttft=0, tokens_per_second=0, error_rate=1.0))
+        resilience = Resilience(CircuitBreaker("test", ResilienceConfig(max_attempts=1)))
+        service = self.make_service(transport=FakeLLMTransport(backend), resilience=resilience)
+
+        with self.assertRaises(InternalServerError):
+            service.send("Hi")
+
+    def test_ttft_and_tokens_per_second(self):
+        """첫 토큰 전 대기 시간과 토큰 간격을 설정대로 적용"""
+        backend = FakeLLMBackend(FakeLLMConfig(ttft=0.5, tokens_per_second=10))
+
+        response = backend.chat_completions({"messages": [], "stream": True})
+
+        self.assertEqual(response.chunks[0][0], 0.5)
+        self.assertEqual(response.chunks[1][0], 0.1)
+
+    @override_settings(ROLEPLAY_FAKE_LLM={"ENABLED": True, "TTFT": 0, "TOKENS_PER_SECOND": 0})
+    def test_registry_uses_fake_backend_when_enabled(self):
+        """설정이 켜져 있으면 공유 클라이언트가 네트워크 대신 가짜 백엔드를 사용"""
+        registry = OpenAIClientRegistry(ClientPoolConfig())
+        client = registry.get_client(api_key="test-key")
+
+        completion = client.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": "Hi"}])
+
+        self.assertEqual(completion.choices[0].message.content, DEFAULT_REPLY)
+        registry.close()
+
+
+class SingleFlightTest(TestCase):
+    """세션별 채팅 턴 직렬화와 중복 전송 병합 테스트"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.session = ChatSession.objects.create(user=self.user, title="카페", instruction="You are a barista.")
+        self.async_client.force_login(self.user)
+        cache.clear()
+
+    async def test_duplicate_key_attaches_to_existing_stream(self):
+        """같은 key의 요청은 한 번만 생성하고, 늦게 붙은 구독자도 처음부터 같은 청크를 받음"""
+        coordinator = ChatTurnCoordinator()
+        calls = []
+
+        async def make_stream():
+            calls.append(1)
+            for chunk in ["a", "b", "c"]:
+                await asyncio.sleep(0)
+                yield chunk
+
+        first = coordinator.stream(1, "key", make_stream)
+        first_chunks = [await anext(first)]
+        second = coordinator.stream(1, "key", make_stream)
+
+        first_chunks += [chunk async for chunk in first]
+        second_chunks = [chunk async for chunk in second]
+        third_chunks = [chunk async for chunk in coordinator.stream(1, "key", make_stream)]
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(first_chunks, ["a", "b", "c"])
+        self.assertEqual(second_chunks, first_chunks)
+        self.assertEqual(third_chunks, first_chunks)
+
+    async def test_session_turns_run_in_arrival_order(self):
+        """같은 세션의 턴은 먼저 도착한 순서대로 하나씩 실행"""
+        coordinator = ChatTurnCoordinator()
+        events = []
+
+        async def turn(name):
+            async with coordinator.session_lock(1):
+                events.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                events.append(f"{name} end")
+
+        await asyncio.gather(turn("first"), turn("second"), turn("third"))
+
+        self.assertEqual(events, ["first start", "first end", "second start", "second end", "third start", "third end"])
+        self.assertEqual(coordinator._session_locks, {})
+
+    def test_session_lock_across_event_loops(self):
+        """요청마다 이벤트 루프가 다른 WSGI에서도 같은 세션의 턴은 하나씩 실행"""
+        coordinator = ChatTurnCoordinator()
+        events = []
+        entered = threading.Event()
+
+        async def turn(name, hold):
+            async with coordinator.session_lock(1):
+                events.append(f"{name} start")
+                entered.set()
+                await asyncio.sleep(hold)
+                events.append(f"{name} end")
+
+        first = threading.Thread(target=asyncio.run, args=(turn("first", 0.05),))
+        first.start()
+        entered.wait(timeout=5)
+        second = threading.Thread(target=asyncio.run, args=(turn("second", 0),))
+        second.start()
+        first.join(timeout=5)
+        second.join(timeout=5)
+
+        self.assertFalse(second.is_alive())
+        self.assertEqual(events, ["first start", "first end", "second start", "second end"])
+        self.assertEqual(coordinator._session_locks, {})
+
+    def test_duplicate_key_attaches_from_another_event_loop(self):
+        """다른 이벤트 루프(스레드)의 중복 요청도 진행 중인 스트림을 처음부터 받음"""
+        coordinator = ChatTurnCoordinator()
+        started, release = threading.Event(), threading.Event()
+
+        async def make_stream():
+            yield "a"
+            started.set()
+            await asyncio.to_thread(release.wait, 5)
+            yield "b"
+
+        async def consume(stream):
+            return [chunk async for chunk in stream]
+
+        results = {}
+        first = threading.Thread(
+            target=lambda: results.update(
+                first=asyncio.run(consume(coordinator.stream(1, "key", make_stream, detach=False)))
+            )
+        )
+        first.start()
+        started.wait(timeout=5)
+        second = threading.Thread(
+            target=lambda: results.update(
+                second=asyncio.run(consume(coordinator.stream(1, "key", make_stream, detach=False)))
+            )
+        )
+        second.start()
+        release.set()
+        first.join(timeout=5)
+        second.join(timeout=5)
+
+        self.assertEqual(results, {"first": ["a", "b"], "second": ["a", "b"]})
+
+    @mock.patch("roleplay.core.get_async_openai_client")
+    def test_chat_under_wsgi(self, get_client):
+        """WSGI(동기 Client)에서는 응답을 전송하는 동안 생성하여, 응답을 받고 대화를 저장하며 제한 슬롯도 반납"""
+        get_client.return_value.with_options.return_value.beta.chat.completions.stream.side_effect = (
+            lambda **kwargs: FakeAsyncChatStream("Welcome to our cafe!")
+        )
+        self.client.force_login(self.user)
+
+        response = self.client.post(reverse("roleplay:chat", args=(self.session.pk,)), {"message": "Hi"})
+        with warnings.catch_warnings():
+            # 동기 서버는 비동기 스트림을 모아서 전송한다는 Django 경고
+            warnings.simplefilter("ignore")
+            content = b"".join(response).decode()
+
+        self.assertIn("Welcome to our cafe!", content)
+        self.assertEqual(
+            list(self.session.message_set.values_list("content", flat=True)), ["Hi", "Welcome to our cafe!"]
+        )
+        self.assertEqual(cache.get(f"{RateLimiter.KEY_PREFIX}streams:user:{self.user.pk}"), 0)
+
+    @mock.patch("roleplay.core.get_async_openai_client")
+    async def test_duplicate_submit_calls_llm_once(self, get_client):
+        """같은 idempotency key로 두 번 전송해도 LLM은 한 번만 호출하고 메시지도 한 번만 저장"""
+        get_client.return_value.with_options.return_value.beta.chat.completions.stream.side_effect = (
+            lambda **kwargs: FakeAsyncChatStream("Welcome to our cafe!")
+        )
+        url = reverse("roleplay:chat", args=(self.session.pk,))
+        data = {"message": "Hi", "idempotency_key": uuid4().hex}
+
+        async def post():
+            response = await self.async_client.post(url, data)
+            return "".join([chunk.decode() async for chunk in response.streaming_content])
+
+        first, second = await asyncio.gather(post(), post())
+
+        self.assertEqual(first, second)
+        self.assertEqual(get_client.return_value.with_options.return_value.beta.chat.completions.stream.call_count, 1)
+        self.assertEqual(await self.session.message_set.acount(), 2)
+
+    @mock.patch("roleplay.core.get_async_openai_client")
+    async def test_concurrent_turns_are_saved_in_order(self, get_client):
+        """다른 key의 동시 요청은 도착 순서대로 하나씩 처리되어, 다음 턴이 이전 턴을 컨텍스트로 사용"""
+        get_client.return_value.with_options.return_value.beta.chat.completions.stream.side_effect = (
+            lambda **kwargs: FakeAsyncChatStream("Welcome to our cafe!")
+        )
+        url = reverse("roleplay:chat", args=(self.session.pk,))
+
+        async def post(message):
+            response = await self.async_client.post(url, {"message": message, "idempotency_key": uuid4().hex})
+            return [chunk async for chunk in response.streaming_content]
+
+        await asyncio.gather(post("first"), post("second"))
+
+        contents = [content async for content in self.session.message_set.values_list("content", flat=True)]
+        self.assertEqual(contents, ["first", "Welcome to our cafe!", "second", "Welcome to our cafe!"])
+        # 두 번째 턴은 첫 번째 턴이 저장된 뒤에 컨텍스트를 구성
+        second_call = get_client.return_value.with_options.return_value.beta.chat.completions.stream.call_args_list[1]
+        self.assertEqual([message["content"] for message in second_call.kwargs["messages"][1:]], contents[:3])
+
+
+class RateLimitTest(TestCase):
+    """사용자별 요청 수/토큰 사용량/동시 스트림 제한 테스트"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.session = ChatSession.objects.create(user=self.user, title="카페", instruction="You are a barista.")
+
+    def test_request_burst(self):
+        """버스트만큼 요청한 뒤에는 다시 채워질 때까지 거절하고 Retry-After를 알려줌"""
+        limiter = RateLimiter(RateLimitConfig(requests_per_minute=6, request_burst=2))
+
+        for _ in range(2):
+            with limiter.limit("user:1"):
+                pass
+        with self.assertRaises(RateLimitExceeded) as context:
+            limiter.acquire("user:1")
+
+        self.assertEqual(context.exception.retry_after, 10)
+        limiter.acquire("user:2")  # 다른 사용자는 영향 없음
+
+    def test_token_usage(self):
+        """응답 사용량을 차감한 토큰 잔량이 없으면 거절"""
+        limiter = RateLimiter(RateLimitConfig(tokens_per_minute=600, token_burst=1000))
+        limiter.charge("user:1", 1200)
+
+        with self.assertRaises(RateLimitExceeded) as context:
+            limiter.acquire("user:1")
+
+        self.assertEqual(context.exception.retry_after, 21)
+
+    def test_concurrent_streams(self):
+        """동시 스트림 한도를 넘으면 거절하고, 반납하면 다시 허용"""
+        limiter = RateLimiter(RateLimitConfig(max_concurrent_streams=1))
+
+        limiter.acquire("user:1")
+        with self.assertRaises(RateLimitExceeded):
+            limiter.acquire("user:1")
+        limiter.release("user:1")
+        limiter.acquire("user:1")
+
+    def test_busy_bucket_lock_is_retryable(self):
+        """다른 워커가 버킷 락을 잡고 있으면 갱신하지 않고 재시도를 요청하며, 차지한 스트림 슬롯은 반납"""
+        limiter = RateLimiter(RateLimitConfig(max_concurrent_streams=1))
+        cache.add(limiter._key("requests", "user:1") + ":lock", 1)
+
+        with mock.patch.object(RateLimiter, "LOCK_WAIT", 0), self.assertRaises(RateLimitExceeded) as context:
+            limiter.acquire("user:1")
+
+        self.assertEqual(context.exception.retry_after, 1)
+        self.assertEqual(cache.get(limiter._key("streams", "user:1")), 0)
+        self.assertIsNone(cache.get(limiter._key("requests", "user:1")))
+
+    async def test_waiting_for_bucket_lock_does_not_block_sync_thread(self):
+        """버킷 락을 기다리는 동안에도 (DB 작업이 쓰는) thread-sensitive 스레드의 다른 작업은 바로 실행됨"""
+        limiter = RateLimiter(RateLimitConfig())
+        cache.add(limiter._key("requests", "user:1") + ":lock", 1)
+
+        async def sync_call_elapsed():
+            await asyncio.sleep(0.02)
+            started = time.monotonic()
+            await sync_to_async(time.monotonic)()
+            return time.monotonic() - started
+
+        with mock.patch.object(RateLimiter, "LOCK_WAIT", 0.3):
+            results = await asyncio.gather(limiter.aacquire("user:1"), sync_call_elapsed(), return_exceptions=True)
+
+        self.assertIsInstance(results[0], RateLimitExceeded)
+        self.assertLess(results[1], 0.2)
+
+    def test_deploy_check_warns_on_process_local_cache(self):
+        """사용량 제한 상태가 프로세스별 캐시에 있으면 배포 점검에서 경고하고, 제한을 끄면 경고하지 않음"""
+        locmem = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+        with override_settings(CACHES=locmem, ROLEPLAY_RATE_LIMIT={"CACHE_ALIAS": "default"}):
+            self.assertIn("roleplay.W002", [message.id for message in check_rate_limit_cache(None)])
+        with override_settings(CACHES=locmem, ROLEPLAY_RATE_LIMIT={"ENABLED": False}):
+            self.assertEqual(check_rate_limit_cache(None), [])
+
+    @override_settings(ROLEPLAY_RATE_LIMIT={"REQUESTS_PER_MINUTE": 1, "REQUEST_BURST": 1})
+    @mock.patch("roleplay.core.get_async_openai_client")
+    async def test_chat_returns_429_in_error_slot(self, get_client):
+        """제한을 넘은 채팅 요청은 LLM을 호출하지 않고 429와 오류 영역 HTML을 바로 반환"""
+        get_client.return_value.with_options.return_value.beta.chat.completions.stream.side_effect = (
+            lambda **kwargs: FakeAsyncChatStream("Hi!")
+        )
+        await self.async_client.aforce_login(self.user)
+        url = reverse("roleplay:chat", args=(self.session.pk,))
+
+        response = await self.async_client.post(url, {"message": "Hi"})
+        [chunk async for chunk in response.streaming_content]
+        response = await self.async_client.post(url, {"message": "Hi again"})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")
+        self.assertContains(response, 'id="advice"', status_code=429)
+        self.assertEqual(get_client.return_value.with_options.return_value.beta.chat.completions.stream.call_count, 1)
+
+    @override_settings(ROLEPLAY_RATE_LIMIT={"MAX_CONCURRENT_STREAMS": 0})
+    @mock.patch("prompts.views.get_openai_client")
+    def test_poem_returns_429(self, get_client):
+        """시 생성 엔드포인트도 같은 제한을 적용"""
+        response = self.client.post(reverse("prompts:poem"), {"message": "가을"})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        get_client.assert_not_called()
+
+
+class FailingChatStream(FakeChatStream):
+    """delta 몇 개를 보낸 뒤 읽기 타임아웃이 나는 스트림"""
+
+    def __iter__(self):
+        yield from self.events[:3]
+        raise httpx.ReadTimeout("stalled")
+
+
+class ResilienceTest(TestCase):
+    """API 호출 재시도와 서킷 브레이커 테스트"""
+
+    config = ResilienceConfig(base_delay=0, window_size=4, minimum_calls=4, open_seconds=30)
+
+    def make_service(self, config=None):
+        breaker = CircuitBreaker("test", config or self.config)
+        service = ChatService(config=SimpleChatConfig(instruction="You are a barista."), resilience=Resilience(breaker))
+        service.client = mock.Mock()
+        return service
+
+    def test_retries_transient_errors(self):
+        """일시적인 오류는 재시도하여 성공하고, 재시도 수를 지표로 남김"""
+        service = self.make_service()
+        service.client.beta.chat.completions.parse.side_effect = [
+            httpx.ConnectError("refused"),
+            httpx.ReadTimeout("slow"),
+            make_completion("Hello!"),
+        ]
+
+        response = service.send("Hi")
+
+        self.assertEqual(response.text, "Hello!")
+        stats = service.resilience.breaker.stats()
+        self.assertEqual((stats["calls"], stats["failures"], stats["retries"], stats["successes"]), (3, 2, 2, 1))
+
+    def test_does_not_retry_request_errors(self):
+        """재시도해도 소용없는 오류는 바로 전달하고 장애로 집계하지 않음"""
+        service = self.make_service()
+        service.client.beta.chat.completions.parse.side_effect = RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            service.send("Hi")
+
+        service.client.beta.chat.completions.parse.assert_called_once()
+        self.assertEqual(service.resilience.breaker.stats()["failures"], 0)
+
+    def test_circuit_opens_and_recovers(self):
+        """실패율이 임계값을 넘으면 호출 없이 바로 실패하고, open_seconds 뒤 시험 호출이 성공하면 닫힘"""
+        service = self.make_service(ResilienceConfig(max_attempts=1, window_size=4, minimum_calls=4))
+        parse = service.client.beta.chat.completions.parse
+        parse.side_effect = httpx.ConnectError("refused")
+        with self.assertLogs("roleplay.resilience", "WARNING"):
+            for _ in range(4):
+                with self.assertRaises(httpx.ConnectError):
+                    service.send("Hi")
+
+        with self.assertRaises(CircuitOpenError) as context:
+            service.send("Hi")
+        self.assertEqual(parse.call_count, 4)
+        self.assertGreater(context.exception.retry_after, 0)
+
+        parse.side_effect = None
+        parse.return_value = make_completion("Back!")
+        with mock.patch("roleplay.resilience.time.monotonic", return_value=time.monotonic() + 31):
+            self.assertEqual(service.send("Hi").text, "Back!")
+
+        stats = service.resilience.breaker.stats()
+        self.assertEqual(stats["state"], "closed")
+        self.assertEqual(stats["short_circuited"], 1)
+        self.assertEqual(stats["transitions"], {"closed->open": 1, "open->half_open": 1, "half_open->closed": 1})
+
+    def test_stream_retries_only_before_first_delta(self):
+        """스트리밍은 텍스트를 보내기 전의 오류만 재시도"""
+        service = self.make_service()
+        stream = service.client.beta.chat.completions.stream
+        stream.side_effect = [httpx.ConnectError("refused"), FakeChatStream("Welcome to our cafe!")]
+
+        chunks = list(service.send_stream("Hi"))
+        self.assertEqual("".join(chunks[:-1]), "Welcome to our cafe!")
+
+        stream.side_effect = [FailingChatStream("Welcome to our cafe!"), FakeChatStream("Welcome to our cafe!")]
+        with self.assertRaises(httpx.ReadTimeout):
+            list(service.send_stream("Hi"))
+        self.assertEqual(stream.call_count, 3)
+
+
+class ModelRoutingTest(TestCase):
+    """지연 시간 기반 모델 라우팅과 대체 모델 테스트"""
+
+    routing_config = RoutingConfig(fallbacks={"gpt-4o": "gpt-4o-mini"}, ttft_target=1.0, minimum_samples=3)
+
+    def setUp(self):
+        cache.clear()
+        self.router = ModelRouter(self.routing_config)
+        self.session = ChatSession.objects.create(title="카페", instruction="You are a barista.")
+        self.service = ChatService(
+            config=SimpleChatConfig(instruction="You are a barista."),
+            chat_history_store=DjangoChatHistoryStore(session=self.session),
+            resilience=Resilience(CircuitBreaker("test", ResilienceConfig(max_attempts=1))),
+            router=self.router,
+        )
+        self.service.client = mock.Mock()
+
+    def test_routes_to_fallback_when_latency_target_exceeded(self):
+        """최근 TTFT가 목표를 넘은 모델은 대체 모델을 먼저 요청하고, 기록이 만료되면 다시 원래 모델로 요청"""
+        self.assertEqual(self.router.route("gpt-4o"), ["gpt-4o", "gpt-4o-mini"])
+        for _ in range(3):
+            self.router.record("gpt-4o", ttft=2.5, tokens_per_second=50)
+
+        self.assertEqual(self.router.route("gpt-4o"), ["gpt-4o-mini", "gpt-4o"])
+        self.assertEqual(self.router.route("gpt-4o-mini"), ["gpt-4o-mini"])
+        self.assertEqual(self.router.stats()["gpt-4o"]["ttft_p90_ms"], 2500)
+
+        later = time.monotonic() + self.routing_config.window_seconds + 1
+        with mock.patch("roleplay.routing.time.monotonic", return_value=later):
+            self.assertEqual(self.router.route("gpt-4o"), ["gpt-4o", "gpt-4o-mini"])
+
+    def test_falls_back_on_error_and_records_serving_model(self):
+        """원래 모델 요청이 실패하면 대체 모델로 응답하고, 응답한 모델을 메시지에 저장"""
+        parse = self.service.client.beta.chat.completions.parse
+        parse.side_effect = [httpx.ConnectError("refused"), make_completion("Hello!")]
+
+        with self.assertLogs("roleplay.routing", "WARNING"):
+            response = self.service.send("Hi")
+
+        self.assertEqual([call.kwargs["model"] for call in parse.call_args_list], ["gpt-4o", "gpt-4o-mini"])
+        self.assertEqual(response.usage.model, "gpt-4o-mini")
+        self.assertEqual(self.session.message_set.get(role="assistant").model, "gpt-4o-mini")
+        self.assertEqual(self.router.stats()["gpt-4o-mini"]["fallback_served"], 1)
+
+    def test_stream_records_ttft(self):
+        """스트리밍 응답의 첫 토큰까지의 시간과 생성 속도를 기록"""
+        self.service.client.beta.chat.completions.stream.return_value = FakeChatStream("Welcome to our cafe!")
+
+        chunks = list(self.service.send_stream("Hi"))
+
+        self.assertEqual(chunks[-1].usage.model, "gpt-4o")
+        stats = self.router.stats()["gpt-4o"]
+        self.assertEqual((stats["samples"], stats["served"], stats["degraded"]), (1, 1, False))
+        self.assertIsNotNone(stats["ttft_p50_ms"])
+
+
+class ChatJobsCommandTest(TestCase):
+    """JSONL 일괄 채팅 작업 명령 테스트"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.tempdir.name, "input.jsonl")
+        self.output = os.path.join(self.tempdir.name, "output.jsonl")
+        requests = [
+            {"id": "a", "instruction": "You are a barista.", "messages": [{"role": "user", "content": "Hi"}]},
+            {
+                "id": "b",
+                "instruction": "You are a barista.",
+                "messages": [
+                    {"role": "user", "content": "Hi"},
+                    {"role": "assistant", "content": "Welcome!"},
+                    {"role": "user", "content": "A latte, please."},
+                ],
+                "model": "gpt-4o-mini",
+                "temperature": 0.2,
+            },
+            {"id": "c", "messages": [{"role": "assistant", "content": "Hello"}]},
+        ]
+        with open(self.input, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(request) + "\n" for request in requests)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def read_output(self) -> list[dict]:
+        with open(self.output, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    @override_settings(ROLEPLAY_FAKE_LLM={"ENABLED": True, "TTFT": 0, "TOKENS_PER_SECOND": 0})
+    def test_resumes_after_last_completed_line(self):
+        """이미 기록된 줄은 건너뛰고, 쓰다 만 마지막 줄은 잘라낸 뒤 나머지 결과를 이어서 기록"""
+        with open(self.output, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"line": 1, "id": "a", "text": "done"}) + "\n" + '{"line": 2, "te')
+
+        call_command("run_chat_jobs", self.input, output=self.output, concurrency=2, stderr=StringIO())
+
+        records = {record["line"]: record for record in self.read_output()}
+        self.assertEqual(len(self.read_output()), 3)
+        self.assertEqual(records[1]["text"], "done")
+        self.assertEqual((records[2]["id"], records[2]["text"]), ("b", DEFAULT_REPLY))
+        self.assertEqual(records[2]["model"], "gpt-4o-mini")
+        self.assertGreater(records[2]["usage"]["input_tokens"], 0)
+        self.assertIn("last message must be a user message", records[3]["error"])
+
+    @mock.patch("roleplay.management.commands.run_chat_jobs.get_openai_client")
+    def test_batch_backend(self, get_client):
+        """Batch API 입력 파일을 제출하고, 완료된 결과 파일을 직접 실행과 같은 형식으로 기록"""
+        client = get_client.return_value
+        submitted = []
+        client.files.create.side_effect = lambda file, purpose: submitted.extend(map(json.loads, file)) or mock.Mock(
+            id="file-1"
+        )
+        client.batches.create.return_value.id = "batch-1"
+
+        out = StringIO()
+        call_command("run_chat_jobs", self.input, output=self.output, backend="batch", stdout=out, stderr=StringIO())
+
+        self.assertEqual(out.getvalue().strip(), "batch-1")
+        self.assertEqual([request["custom_id"] for request in submitted], ['line-1:"a"', 'line-2:"b"'])
+        body = submitted[1]["body"]
+        self.assertEqual(body["model"], "gpt-4o-mini")
+        self.assertEqual(
+            [message["content"] for message in body["messages"][1:]], ["Hi", "Welcome!", "A latte, please."]
+        )
+        self.assertEqual(body["response_format"]["type"], "json_schema")
+
+        content = json.dumps({"text": "Here you go.", "suggested_phrases": [], "usage": None})
+        result = {
+            "custom_id": submitted[1]["custom_id"],
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "model": "gpt-4o-mini",
+                    "choices": [{"message": {"content": content}}],
+                    "usage": {"prompt_tokens": 30, "completion_tokens": 4},
+                },
+            },
+        }
+        # max_tokens에서 잘려 ChatResponse 형식이 아닌 응답
+        truncated = {
+            "custom_id": submitted[0]["custom_id"],
+            "response": {
+                "status_code": 200,
+                "body": {"choices": [{"message": {"content": '{"text": "Wel'}, "finish_reason": "length"}]},
+            },
+        }
+        client.batches.retrieve.return_value = SimpleNamespace(
+            status="completed", output_file_id="file-2", error_file_id=None
+        )
+        streaming = client.files.with_streaming_response.content.return_value.__enter__.return_value
+        streaming.iter_lines.return_value = [json.dumps(truncated), json.dumps(result)]
+
+        call_command("run_chat_jobs", output=self.output, batch_id="batch-1", stderr=StringIO())
+
+        records = {record["line"]: record for record in self.read_output()}
+        self.assertEqual(set(records), {1, 2, 3})
+        self.assertEqual((records[2]["id"], records[2]["text"]), ("b", "Here you go."))
+        self.assertEqual(records[2]["usage"]["input_tokens"], 30)
+        self.assertEqual(records[1]["id"], "a")
+        self.assertIn("finish_reason=length", records[1]["error"])
+
+
+class TracingTest(TestCase):
+    """채팅 턴 단계별 span 기록 테스트"""
+
+    def setUp(self):
+        self.sink = RingBufferSpanSink()
+        self.store = InMemoryStore()
+        self.service = ChatService(
+            config=SimpleChatConfig(instruction="You are a barista."),
+            chat_history_store=self.store,
+            api_key="test-key",
+            tracer=Tracer([self.sink]),
+        )
+        self.service.client = mock.Mock()
+
+    def test_send_stream_records_turn_phases(self):
+        """한 턴의 단계별 span이 같은 trace로 기록되고, 하위 단계는 chat.turn span 아래에 기록됨"""
+        self.service.client.beta.chat.completions.stream.return_value = FakeChatStream("Welcome to our cafe!")
+
+        list(self.service.send_stream("Hi"))
+
+        spans = {span.name: span for span in self.sink.spans()}
+        self.assertLessEqual(
+            {"chat.turn", "history.read", "prompt.build", "llm.call", "llm.ttft", "response.parse", "history.write"},
+            set(spans),
+        )
+        turn = spans["chat.turn"]
+        self.assertEqual({span.trace_id for span in spans.values()}, {turn.trace_id})
+        self.assertEqual(spans["llm.call"].parent_id, turn.span_id)
+        self.assertEqual(spans["llm.call"].attributes["model"], "gpt-4o")
+        self.assertEqual(spans["prompt.build"].attributes["messages"], 2)
+        self.assertIn("p95_ms", self.sink.stats()["llm.call"])
+
+    def test_error_is_recorded_on_span(self):
+        """실패한 턴은 오류 종류가 span 속성에 기록됨"""
+        self.service.client.beta.chat.completions.parse.side_effect = ValueError("bad request")
+
+        with self.assertRaises(ValueError):
+            self.service.send("Hi")
+
+        turn = next(span for span in self.sink.spans() if span.name == "chat.turn")
+        self.assertEqual(turn.attributes["error"], "ValueError")
+
+    def test_null_tracer_records_nothing(self):
+        """tracing이 꺼져 있으면 span을 만들지 않음"""
+        service = ChatService(config=SimpleChatConfig(instruction="You are a barista."), api_key="test-key")
+        self.assertIs(service.tracer, NULL_TRACER)
+        with NULL_TRACER.span("chat.turn") as attributes:
+            attributes["ignored"] = True
+        NULL_TRACER.record("llm.ttft", 0.1)
+
+    def test_sink_without_emit_cannot_be_created(self):
+        """emit()을 구현하지 않은 sink는 만들 때 바로 실패"""
+
+        class IncompleteSink(BaseSpanSink):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteSink()
+
+
+class StalledAsyncChatStream(FakeAsyncChatStream):
+    """앞의 일부 이벤트만 보내고 더 이상 응답하지 않는 스트림 (생성 도중 연결이 끊기는 상황)"""
+
+    def __init__(self, text, sent_events=3):
+        super().__init__(text)
+        self.sent_events = sent_events
+
+    async def __aiter__(self):
+        for event in self.events[: self.sent_events]:
+            yield event
+        await asyncio.Event().wait()
+
+
+class ClientDisconnectTest(TestCase):
+    """클라이언트 연결이 끊긴 턴의 생성 취소와 중단된 응답 저장 테스트"""
+
+    def make_service(self, service_class=ChatService):
+        self.store = InMemoryStore()
+        service = service_class(
+            config=SimpleChatConfig(instruction="You are a barista."),
+            chat_history_store=self.store,
+            api_key="test-key",
+        )
+        service.client = mock.Mock()
+        return service
+
+    def test_closing_stream_closes_upstream_and_saves_truncated_reply(self):
+        """소비하던 쪽이 스트림을 닫으면 API 응답을 닫고, 받은 데까지를 중단된 응답으로 저장"""
+        service = self.make_service()
+        upstream = FakeChatStream("Welcome to our cafe! What would you like?")
+        service.client.beta.chat.completions.stream.return_value = upstream
+
+        stream = service.send_stream("Hi")
+        received = next(stream) + next(stream)
+        stream.close()
+
+        self.assertTrue(upstream.closed)
+        user, assistant = self.store.get_messages()
+        self.assertEqual(user.content, "Hi")
+        self.assertEqual((assistant.content, assistant.truncated, assistant.usage), (received, True, None))
+
+    async def test_cancelled_generation_saves_truncated_reply(self):
+        """API 응답을 기다리는 중에 태스크가 취소되면 받은 데까지를 중단된 응답으로 저장"""
+        service = self.make_service(AsyncChatService)
+        upstream = StalledAsyncChatStream("Welcome to our cafe!")
+        service.client.beta.chat.completions.stream.return_value = upstream
+        received = []
+
+        async def consume():
+            async for chunk in service.send_stream("Hi"):
+                received.append(chunk)
+
+        task = asyncio.create_task(consume())
+        while not received:
+            await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertTrue(upstream.closed)
+        messages = await self.store.aget_messages()
+        self.assertEqual([m.truncated for m in messages], [False, True])
+        self.assertEqual(messages[1].content, "".join(received))
+
+    async def test_generation_is_cancelled_when_all_subscribers_leave(self):
+        """구독자가 모두 떠나고 유예 시간 안에 다시 연결하지 않으면 생성을 취소 (다시 연결하면 계속 진행)"""
+        coordinator = ChatTurnCoordinator(abandon_grace=0.01)
+        resume = asyncio.Event()
+        cancelled = []
+
+        async def make_stream():
+            try:
+                yield "a"
+                await resume.wait()
+                yield "b"
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        first = coordinator.stream(1, "key", make_stream)
+        self.assertEqual(await anext(first), "a")
+        await first.aclose()
+        # 유예 시간 안에 다시 연결하면 이어서 받음
+        second = coordinator.stream(1, "key", make_stream, resume_from=1)
+        resume.set()
+        self.assertEqual([chunk async for chunk in second], ["b"])
+        self.assertEqual(cancelled, [])
+
+        resume.clear()
+        third = coordinator.stream(1, "other", make_stream)
+        self.assertEqual(await anext(third), "a")
+        await third.aclose()
+        await asyncio.sleep(0.05)
+        self.assertEqual(cancelled, [True])
+        self.assertEqual([chunk async for chunk in coordinator.stream(1, "other", make_stream)], ["a"])
+
+
+class SeparatePhrasesTest(TestCase):
+    """추천 표현을 응답과 따로 생성하는 모드 테스트"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.session = ChatSession.objects.create(user=self.user, title="카페", instruction="You are a barista.")
+        self.async_client.force_login(self.user)
+        cache.clear()
+
+    def test_plain_reply_is_requested_without_response_format(self):
+        """inline_phrases=False이면 구조화된 출력 없이 요청하고 스트림을 그대로 text로 사용"""
+        service = ChatService(
+            config=SimpleChatConfig(instruction="You are a barista."), api_key="test-key", inline_phrases=False
+        )
+        service.client = mock.Mock()
+        service.client.beta.chat.completions.stream.return_value = FakeChatStream(
+            "Welcome to our cafe!", structured=False
+        )
+
+        chunks = list(service.send_stream("Hi", include_phrases=True))
+
+        self.assertNotIn("response_format", service.client.beta.chat.completions.stream.call_args.kwargs)
+        self.assertEqual("".join(chunks[:-1]), "Welcome to our cafe!")
+        self.assertEqual((chunks[-1].text, chunks[-1].suggested_phrases), ("Welcome to our cafe!", []))
+
+    def test_plain_and_structured_requests_use_different_cache_keys(self):
+        """추천 표현이 없는 일반 텍스트 응답이 구조화된 응답의 캐시를 대신하지 않음"""
+        request = {"model": "gpt-4o", "temperature": 0.0, "max_tokens": 100, "messages": []}
+
+        structured_key = LRUResponseCache.make_key({**request, "response_format": ChatResponse})
+
+        self.assertNotEqual(LRUResponseCache.make_key(request), structured_key)
+
+    @override_settings(ROLEPLAY_SUGGESTED_PHRASES={"SEPARATE": True})
+    @mock.patch("roleplay.core.get_async_openai_client")
+    async def test_advice_panel_loads_phrases_once_per_message(self, get_client):
+        """응답은 일반 텍스트로 받고, advice 패널이 요청한 추천 표현은 assistant 메시지별로 캐시"""
+        stream = get_client.return_value.with_options.return_value.beta.chat.completions.stream
+        stream.return_value = FakeAsyncChatStream("Welcome to our cafe!", structured=False)
+        parse = get_client.return_value.beta.chat.completions.parse = mock.AsyncMock(
+            return_value=SimpleNamespace(
+                choices=[
+                    SimpleNamespace(message=SimpleNamespace(parsed=SuggestedPhrases(suggested_phrases=["A latte."])))
+                ]
+            )
+        )
+
+        response = await self.async_client.post(reverse("roleplay:chat", args=(self.session.pk,)), {"message": "Hi"})
+        chunks = [chunk.decode() async for chunk in response.streaming_content]
+        phrases_url = reverse("roleplay:suggested_phrases", args=(self.session.pk,))
+        first = await self.async_client.get(phrases_url)
+        second = await self.async_client.get(phrases_url)
+
+        self.assertNotIn("response_format", stream.call_args.kwargs)
+        self.assertIn(f'hx-get="{phrases_url}"', chunks[-2])
+        self.assertContains(first, "A latte.")
+        self.assertContains(second, "A latte.")
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(parse.call_args.kwargs["model"], PhraseSuggester().model)
+
+    async def test_phrases_endpoint_requires_separate_mode(self):
+        """추천 표현을 응답과 함께 생성하는 설정에서는 따로 요청할 수 없음"""
+        response = await self.async_client.get(reverse("roleplay:suggested_phrases", args=(self.session.pk,)))
+
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,67 @@
+"""
+Token counting helpers for building the chat context window.
+
+tiktoken이 설치되어 있으면 모델의 토크나이저로 정확히 세고, 없으면
+문자 종류별 근사치로 추정합니다. 추정치는 실제보다 약간 크게 잡히도록
+계산하므로 예산을 넘기지 않는 쪽으로 오차가 납니다.
+"""
+
+import math
+from functools import lru_cache
+from typing import Optional
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - 선택 의존성
+    tiktoken = None
+
+
+# 모델별 컨텍스트 윈도우 크기 (입력 + 출력 토큰)
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4o": 128_000,
+    "gpt-4o-mini": 128_000,
+}
+DEFAULT_CONTEXT_WINDOW = 8_192
+
+# 메시지마다 role 등 포맷팅에 추가로 쓰이는 토큰 수
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def get_context_window(model: str) -> int:
+    """모델의 컨텍스트 윈도우 크기 반환"""
+    return MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # 인코딩 파일을 내려받을 수 없는 환경 등에서는 추정치 사용
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """토크나이저 없이 토큰 수 추정
+
+    영문/숫자/기호는 약 4글자당 1토큰, 한글 등 비 ASCII 문자는 글자당 1토큰으로 계산합니다.
+    """
+    ascii_chars = sum(1 for char in text if char.isascii())
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """텍스트의 토큰 수 계산"""
+    encoding = _get_encoding(model or "gpt-4o")
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(content: str, model: Optional[str] = None) -> int:
+    """메시지 하나가 요청에서 차지하는 토큰 수 (포맷팅 오버헤드 포함)"""
+    return count_tokens(content, model) + MESSAGE_OVERHEAD_TOKENS
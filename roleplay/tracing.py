@@ -0,0 +1,248 @@
+"""
+Structured timing spans for chat turns.
+
+채팅 한 턴을 단계별(대화 기록 조회, 프롬프트 구성, API 호출(TTFT/전체), 응답 파싱, 대화 기록 저장,
+뷰의 템플릿 렌더링)로 나누어 걸린 시간을 span으로 기록합니다. span은 설정한 sink로 전달됩니다.
+
+- logging: roleplay.tracing 로거로 한 줄씩 기록 (extra={"span": {...}}로 구조화된 값도 전달)
+- ring_buffer: 프로세스 메모리에 최근 span을 보관하고 단계별 지연 시간 통계 제공
+- EXPORTER: span을 받는 함수의 dotted path (예: OpenTelemetry, StatsD 등으로 내보내기)
+
+같은 턴(trace)의 span들은 contextvars로 trace_id를 공유하므로, 뷰에서 시작한 span 안에서
+ChatService가 만든 span은 같은 trace로 묶입니다. 비활성화하면 아무것도 하지 않는 tracer를 사용합니다.
+"""
+
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Iterator, Optional
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# 현재 실행 중인 span의 (trace_id, span_id)
+_current_span: ContextVar[Optional[tuple[str, str]]] = ContextVar("roleplay_tracing_span", default=None)
+
+
+@dataclass
+class Span:
+    """끝난 작업 구간 하나"""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    started_at: float  # time.time() 값
+    duration_ms: float
+    attributes: dict = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class BaseSpanSink(ABC):
+    """span을 받아 기록/전달하는 대상"""
+
+    @abstractmethod
+    def emit(self, span: Span) -> None:
+        pass
+
+
+class LoggingSpanSink(BaseSpanSink):
+    """span을 로그 한 줄로 기록"""
+
+    def __init__(self, level: int = logging.INFO):
+        self.level = level
+
+    def emit(self, span: Span) -> None:
+        if not logger.isEnabledFor(self.level):
+            return
+        attributes = " ".join(f"{key}={value}" for key, value in span.attributes.items())
+        logger.log(
+            self.level,
+            "span %s %.1fms trace=%s %s",
+            span.name,
+            span.duration_ms,
+            span.trace_id,
+            attributes,
+            extra={"span": span.to_dict()},
+        )
+
+
+class RingBufferSpanSink(BaseSpanSink):
+    """최근 span을 프로세스 메모리에 보관 (가장 오래된 span부터 버림)"""
+
+    def __init__(self, size: int = 1000):
+        self._spans: deque[Span] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def emit(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, trace_id: Optional[str] = None) -> list[Span]:
+        with self._lock:
+            spans = list(self._spans)
+        if trace_id is not None:
+            spans = [span for span in spans if span.trace_id == trace_id]
+        return spans
+
+    def stats(self) -> dict[str, dict]:
+        """span 이름(단계)별 횟수와 지연 시간 백분위수 (밀리초)"""
+        durations: dict[str, list[float]] = {}
+        for span in self.spans():
+            durations.setdefault(span.name, []).append(span.duration_ms)
+
+        result = {}
+        for name, values in sorted(durations.items()):
+            values.sort()
+            result[name] = {
+                "count": len(values),
+                "p50_ms": round(values[int(len(values) * 0.5)], 1),
+                "p95_ms": round(values[min(int(len(values) * 0.95), len(values) - 1)], 1),
+                "max_ms": round(values[-1], 1),
+            }
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class CallbackSpanSink(BaseSpanSink):
+    """span을 함수로 전달 (외부 시스템으로 내보내는 exporter hook)"""
+
+    def __init__(self, callback: Callable[[Span], None]):
+        self.callback = callback
+
+    def emit(self, span: Span) -> None:
+        self.callback(span)
+
+
+class _NullSpan:
+    """비활성화된 tracer의 span (아무것도 측정하지 않음)"""
+
+    def __enter__(self) -> dict:
+        return {}
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """span을 측정하여 sink들로 전달"""
+
+    enabled = True
+
+    def __init__(self, sinks: list[BaseSpanSink]):
+        self.sinks = sinks
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[dict]:
+        """with 블록의 실행 시간을 span으로 기록 (as로 받은 dict에 속성을 추가할 수 있음)"""
+        parent = _current_span.get()
+        trace_id = parent[0] if parent else os.urandom(8).hex()
+        span_id = os.urandom(4).hex()
+        token = _current_span.set((trace_id, span_id))
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException as e:
+            attributes["error"] = type(e).__name__
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # 제너레이터가 다른 컨텍스트에서 정리되는 경우
+                pass
+            self._emit(
+                Span(name, trace_id, span_id, parent[1] if parent else None, started_at, duration_ms, attributes)
+            )
+
+    def record(self, name: str, seconds: float, **attributes) -> None:
+        """따로 측정한 구간(예: 첫 토큰까지의 시간)을 현재 trace의 span으로 기록"""
+        parent = _current_span.get()
+        trace_id = parent[0] if parent else os.urandom(8).hex()
+        duration_ms = seconds * 1000
+        span = Span(
+            name,
+            trace_id,
+            os.urandom(4).hex(),
+            parent[1] if parent else None,
+            time.time() - seconds,
+            duration_ms,
+            attributes,
+        )
+        self._emit(span)
+
+    def _emit(self, span: Span) -> None:
+        for sink in self.sinks:
+            try:
+                sink.emit(span)
+            except Exception:
+                # 계측 실패가 요청 처리를 방해하지 않도록 함
+                logger.exception("Failed to emit span to %s", type(sink).__name__)
+
+
+class NullTracer(Tracer):
+    """비활성화된 tracer (호출 비용만 남도록 아무것도 하지 않음)"""
+
+    enabled = False
+
+    def __init__(self):
+        super().__init__([])
+
+    def span(self, name: str, **attributes) -> _NullSpan:
+        return _NULL_SPAN
+
+    def record(self, name: str, seconds: float, **attributes) -> None:
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """settings.ROLEPLAY_TRACING 설정으로 만든 프로세스 공유 tracer (설정이 없거나 꺼져 있으면 NULL_TRACER)"""
+    global _tracer
+
+    options = getattr(settings, "ROLEPLAY_TRACING", None)
+    if not options or not options.get("ENABLED", True):
+        return NULL_TRACER
+
+    with _tracer_lock:
+        if _tracer is None:
+            sinks: list[BaseSpanSink] = []
+            for name in options.get("SINKS", ["ring_buffer"]):
+                if name == "logging":
+                    sinks.append(LoggingSpanSink())
+                elif name == "ring_buffer":
+                    sinks.append(RingBufferSpanSink(options.get("RING_BUFFER_SIZE", 1000)))
+                else:
+                    raise ValueError(f"Unknown span sink: {name}")
+            if options.get("EXPORTER"):
+                sinks.append(CallbackSpanSink(import_string(options["EXPORTER"])))
+            _tracer = Tracer(sinks)
+    return _tracer
+
+
+def get_ring_buffer(tracer: Tracer) -> Optional[RingBufferSpanSink]:
+    """tracer의 ring buffer sink (없으면 None)"""
+    return next((sink for sink in tracer.sinks if isinstance(sink, RingBufferSpanSink)), None)
@@ -8,4 +8,11 @@ urlpatterns = [
     path("new/", views.ChatSessionCreateView.as_view(), name="chatsession_new"),
     path("<int:pk>/edit/", views.ChatSessionUpdateView.as_view(), name="chatsession_edit"),
     path("<int:pk>/chat/", views.chat, name="chat"),
+    path("<int:pk>/chat/messages/", views.chat_messages, name="chat_messages"),
+    path("<int:pk>/chat/suggested-phrases/", views.suggested_phrases, name="suggested_phrases"),
+    path("client-pool-stats/", views.client_pool_stats, name="client_pool_stats"),
+    path("response-cache-stats/", views.response_cache_stats, name="response_cache_stats"),
+    path("circuit-breaker-stats/", views.circuit_breaker_stats, name="circuit_breaker_stats"),
+    path("model-routing-stats/", views.model_routing_stats, name="model_routing_stats"),
+    path("tracing-stats/", views.tracing_stats, name="tracing_stats"),
 ]
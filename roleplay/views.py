@@ -1,18 +1,47 @@
-from typing import Generator
+import time
+from contextlib import aclosing
+from typing import AsyncGenerator, AsyncIterator
+from uuid import uuid4
 
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
-from django.shortcuts import render, get_object_or_404
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render, aget_object_or_404
 from django.template.loader import render_to_string
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView
 
-from .core import ChatResponse, SimpleChatConfig, ChatService, Message
-from .django_stores import DjangoChatHistoryStore
+from .cache import get_response_cache
+from .clients import client_registry
+from .core import (
+    AsyncChatService,
+    ChatResponse,
+    ConversationSummarizer,
+    Message,
+    PhraseSuggester,
+    SimpleChatConfig,
+    SuggestedPhrase,
+)
+from .django_stores import CachedChatHistoryStore, DjangoChatHistoryStore
 from .forms import ChatSessionForm
 
 from .models import ChatSession
+from .ratelimit import RateLimiter, RateLimitExceeded
+from .resilience import circuit_breaker_stats as get_circuit_breaker_stats
+from .routing import get_model_router
+from .singleflight import turn_coordinator
+from .streaming import HtmlDeltaSerializer, parse_last_event_id, sse_event
+from .tracing import get_ring_buffer, get_tracer
+
+# 채팅 화면에서 한 번에 렌더링할 메시지 수 (이전 메시지는 위로 스크롤할 때 불러옴)
+MESSAGE_PAGE_SIZE = 30
+
+# 따로 생성한 추천 표현의 캐시 키 (assistant 메시지별)와 보관 시간 (초)
+SUGGESTED_PHRASES_CACHE_KEY = "roleplay:phrases:{message_id}"
+SUGGESTED_PHRASES_CACHE_TIMEOUT = 60 * 60 * 24
 
 
 class ChatSessionListView(LoginRequiredMixin, ListView):
@@ -48,65 +77,302 @@ class ChatSessionUpdateView(LoginRequiredMixin, UpdateView):
 
 
 @login_required
-def chat(request, pk) -> HttpResponse | StreamingHttpResponse:
-    """통합된 채팅 뷰 - HTML 렌더링과 API 응답 모두 처리"""
+async def chat(request, pk) -> HttpResponse | StreamingHttpResponse:
+    """통합된 채팅 뷰 - HTML 렌더링과 API 응답 모두 처리
 
-    session = get_object_or_404(ChatSession, pk=pk, user=request.user)
-    store = DjangoChatHistoryStore(session=session)
+    ASGI 환경에서는 LLM 응답을 기다리는 동안 워커 스레드를 점유하지 않도록
+    비동기 뷰와 비동기 제너레이터로 스트리밍합니다.
+    """
+
+    user = await request.auser()
+    session = await aget_object_or_404(ChatSession, pk=pk, user=user)
+    # 최근 대화는 캐시에서 읽고, 메시지는 응답 전송이 끝난 뒤 DB에 저장
+    store = CachedChatHistoryStore(session=session)
 
     if request.method == "GET":
-        message_list = store.get_messages()
         context_data = {
             "session": session,
-            "message_list": message_list,
+            # 폼 전송마다 바뀌는 키 (중복 전송된 같은 메시지를 한 번만 처리)
+            "idempotency_key": uuid4().hex,
+            **await _message_page(store),
         }
         return render(request, "roleplay/chat.html", context_data)
 
     else:
 
-        def make_stream() -> Generator[str, None, None]:
+        # 같은 idempotency key로 다시 전송된 요청은 새로 생성하지 않고 진행 중인 스트림을 처음부터 받음
+        # (이미 시작된 생성에 붙는 요청은 사용량 제한에 다시 집계하지 않음)
+        idempotency_key = request.POST.get("idempotency_key", "").strip() or None
+        # 연결이 끊겨 다시 보낸 요청은 마지막으로 받은 이벤트 다음부터 이어서 받음
+        try:
+            last_event_id = parse_last_event_id(request.headers.get("Last-Event-ID"))
+        except ValueError:
+            return HttpResponseBadRequest("Invalid Last-Event-ID.")
+        if last_event_id and not turn_coordinator.has_flight(session.pk, idempotency_key):
+            # 보관 시간이 지나 이어 받을 수 없음 (응답은 대화 기록에 저장되어 있으므로 다시 생성하지 않음)
+            error_message = "The reply can no longer be resumed. Reload the page to see it."
+            return _sse_response(
+                _single_chunk(render_to_string("roleplay/_chat_response.html", {"error_message": error_message}))
+            )
+
+        rate_limiter = RateLimiter.from_settings()
+        client_key = RateLimiter.client_key(request, user)
+        if turn_coordinator.has_flight(session.pk, idempotency_key):
+            rate_limiter = None
+        elif rate_limiter:
             try:
-                # TODO: Django Form 등을 활용한 유효성 검사
-                message = request.POST.get("message", "").strip()
-                if not message:
-                    yield render_to_string(
+                await rate_limiter.aacquire(client_key)
+            except RateLimitExceeded as e:
+                return _rate_limited_response(request, e)
+            # 제한을 확인하는 사이에 같은 key의 요청이 먼저 생성을 시작했으면 차지한 슬롯을 반납
+            if turn_coordinator.has_flight(session.pk, idempotency_key):
+                await rate_limiter.arelease(client_key)
+                rate_limiter = None
+
+        tracer = get_tracer()
+        render_seconds, render_count = 0.0, 0
+
+        def render_chunk(**kwargs) -> str:
+            """응답 조각 렌더링 (tracer가 켜져 있으면 렌더링에 걸린 시간을 누적)"""
+            nonlocal render_seconds, render_count
+            if not tracer.enabled:
+                return render_to_string(**kwargs)
+            started_at = time.perf_counter()
+            html = render_to_string(**kwargs)
+            render_seconds += time.perf_counter() - started_at
+            render_count += 1
+            return html
+
+        async def make_stream() -> AsyncGenerator[str, None]:
+            with tracer.span("chat.request", session=session.pk):
+                try:
+                    # TODO: Django Form 등을 활용한 유효성 검사
+                    message = request.POST.get("message", "").strip()
+                    if not message:
+                        yield render_chunk(
+                            template_name="roleplay/_chat_response.html",
+                            context={"error_message": "Message is required."},
+                            request=request,
+                        )
+                        return
+
+                    human_message = Message(role="user", content=message)
+                    ai_message = Message(role="assistant", content="Loading ...")
+
+                    yield render_chunk(
+                        template_name="roleplay/_chat_response.html",
+                        context={"human_message": human_message, "ai_message": ai_message},
+                        request=request,
+                    )
+
+                    config = SimpleChatConfig(instruction=session.instruction)
+                    # 추천 표현을 따로 생성하면 대화 모델은 응답 text만 생성하고, advice 패널이 나중에 요청
+                    separate_phrases = PhraseSuggester.from_settings() is not None
+                    chat_service = AsyncChatService(
+                        config=config,
+                        model=session.model,
+                        temperature=session.temperature,
+                        max_tokens=session.max_tokens,
+                        chat_history_store=store,
+                        summarizer=ConversationSummarizer(),
+                        response_cache=get_response_cache(),
+                        router=get_model_router(),
+                        prompt_cache_key=f"roleplay-chatsession-{session.pk}",
+                        inline_phrases=not separate_phrases,
+                    )
+                    phrases_url = (
+                        reverse("roleplay:suggested_phrases", args=(session.pk,)) if separate_phrases else None
+                    )
+
+                    # 생성되는 텍스트를 ai_message 영역에 이어 붙이고, 마지막에 전체 응답으로 교체
+                    # (text 증가분은 템플릿을 거치지 않고 직렬화하여 토큰마다의 렌더링 비용을 없앰)
+                    # (추천 표현은 항목이 완성될 때마다 advice 패널에 추가)
+                    # (최종 응답 이후에도 이전 대화 요약이 끝날 때까지 스트림을 끝까지 소비)
+                    # 같은 세션의 다른 턴이 진행 중이면 끝날 때까지 기다렸다가 순서대로 처리
+                    serializer = HtmlDeltaSerializer(ai_message.dom_id)
+                    # 연결이 모두 끊겨 생성이 취소되면 send_stream()을 바로 닫아 업스트림 요청을 끊고
+                    # 받은 데까지의 응답을 중단됨으로 저장 (singleflight 참고)
+                    async with (
+                        turn_coordinator.session_lock(session.pk),
+                        aclosing(chat_service.send_stream(message, include_phrases=True)) as chunks,
+                    ):
+                        async for chunk in chunks:
+                            if isinstance(chunk, SuggestedPhrase):
+                                yield render_chunk(
+                                    template_name="roleplay/_chat_response.html",
+                                    context={"phrase": chunk},
+                                    request=request,
+                                )
+                                continue
+
+                            if isinstance(chunk, ChatResponse):
+                                ai_message.content = str(chunk)
+                                # 응답 캐시에서 가져온 응답은 API 사용량이 없으므로 차감하지 않음
+                                if rate_limiter and chunk.usage and not chunk.usage.cached:
+                                    await rate_limiter.acharge(
+                                        client_key, chunk.usage.input_tokens + chunk.usage.output_tokens
+                                    )
+                                yield render_chunk(
+                                    template_name="roleplay/_chat_response.html",
+                                    context={
+                                        "chat_response": chunk,
+                                        "ai_message": ai_message,
+                                        "phrases_url": phrases_url,
+                                    },
+                                    request=request,
+                                )
+                                continue
+
+                            yield serializer.delta(chunk)
+                except Exception as e:
+                    yield render_chunk(
                         template_name="roleplay/_chat_response.html",
-                        context={"error_message": "Message is required."},
+                        context={"error_message": str(e)},
                         request=request,
                     )
+                finally:
+                    if rate_limiter:
+                        await rate_limiter.arelease(client_key)
+                    if render_count:
+                        tracer.record("view.render", render_seconds, count=render_count)
+
+        # WSGI에서는 뷰를 실행한 이벤트 루프가 뷰가 끝나면 닫히므로, 응답을 전송하는 루프에서 생성
+        stream = turn_coordinator.stream(
+            session.pk,
+            idempotency_key,
+            make_stream,
+            resume_from=last_event_id,
+            detach=isinstance(request, ASGIRequest),
+        )
+        return _sse_response(stream, last_event_id)
+
+
+def _sse_response(chunks: AsyncIterator[str], last_event_id: int = 0) -> StreamingHttpResponse:
+    """응답 조각들을 SSE 이벤트로 전송 (이벤트 id는 턴의 조각 순번, 마지막에 done 이벤트)"""
+
+    async def events() -> AsyncGenerator[str, None]:
+        event_id = last_event_id
+        async for chunk in chunks:
+            event_id += 1
+            yield sse_event(chunk, event_id)
+        yield sse_event("", event="done")
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    response["X-Accel-Buffering"] = "no"  # nginx 버퍼링 비활성화
+    return response
+
+
+async def _single_chunk(chunk: str) -> AsyncGenerator[str, None]:
+    yield chunk
+
+
+def _rate_limited_response(request, exc: RateLimitExceeded) -> HttpResponse:
+    """사용량 제한 초과 응답 (429, Retry-After). 채팅 응답의 오류 영역에 메시지를 표시"""
+    response = HttpResponse(
+        render_to_string(
+            template_name="roleplay/_chat_response.html",
+            context={"error_message": str(exc)},
+            request=request,
+        ),
+        status=429,
+    )
+    response["Retry-After"] = str(exc.retry_after)
+    return response
 
-                human_message = Message(role="user", content=message)
-                ai_message = Message(role="assistant", content="Loading ...")
-
-                yield render_to_string(
-                    template_name="roleplay/_chat_response.html",
-                    context={"human_message": human_message, "ai_message": ai_message},
-                    request=request,
-                )
-
-                config = SimpleChatConfig(instruction=session.instruction)
-                chat_service = ChatService(
-                    config=config,
-                    model=session.model,
-                    temperature=session.temperature,
-                    max_tokens=session.max_tokens,
-                    chat_history_store=store,
-                )
-                chat_response: ChatResponse = chat_service.send(message)
-                ai_message.content = str(chat_response)
-                yield render_to_string(
-                    template_name="roleplay/_chat_response.html",
-                    context={"chat_response": chat_response, "ai_message": ai_message},
-                    request=request,
-                )
+
+async def _message_page(store: DjangoChatHistoryStore, before_id: int | None = None) -> dict:
+    """before_id 이전의 최근 메시지 한 페이지와, 더 이전 메시지가 있는지 여부"""
+    message_list = await store.aget_messages(limit=MESSAGE_PAGE_SIZE + 1, before_id=before_id)
+    has_previous = len(message_list) > MESSAGE_PAGE_SIZE
+    return {
+        "message_list": message_list[-MESSAGE_PAGE_SIZE:],
+        "has_previous": has_previous,
+    }
+
+
+@login_required
+async def chat_messages(request, pk) -> HttpResponse:
+    """위로 스크롤할 때 HTMX로 불러오는 이전 메시지 페이지"""
+
+    try:
+        before_id = int(request.GET["before_id"])
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest("before_id is required.")
+
+    user = await request.auser()
+    session = await aget_object_or_404(ChatSession, pk=pk, user=user)
+    store = DjangoChatHistoryStore(session=session)
+
+    context_data = {
+        "session": session,
+        **await _message_page(store, before_id=before_id),
+    }
+    return render(request, "roleplay/_message_page.html", context_data)
+
+
+@login_required
+async def suggested_phrases(request, pk) -> HttpResponse:
+    """advice 패널이 HTMX로 요청하는 마지막 assistant 메시지의 추천 표현
+
+    대화 모델과 따로 (저렴한 모델로) 생성하고 assistant 메시지별로 캐시합니다.
+    """
+
+    suggester = PhraseSuggester.from_settings()
+    if suggester is None:
+        return HttpResponseBadRequest("Suggested phrases are generated with the reply.")
+
+    user = await request.auser()
+    session = await aget_object_or_404(ChatSession, pk=pk, user=user)
+
+    # 진행 중인 턴이 있으면 응답이 대화 기록에 저장될 때까지 기다린 뒤 조회
+    async with turn_coordinator.session_lock(session.pk):
+        message_list = await CachedChatHistoryStore(session=session).aget_messages(limit=suggester.context_messages)
+
+    context_data = {"suggested_phrases": []}
+    last_message = message_list[-1] if message_list else None
+    if last_message and last_message.role == "assistant" and last_message.id is not None:
+        cache_key = SUGGESTED_PHRASES_CACHE_KEY.format(message_id=last_message.id)
+        phrases = await cache.aget(cache_key)
+        if phrases is None:
+            try:
+                phrases = await suggester.asuggest(session.instruction, message_list)
             except Exception as e:
-                yield render_to_string(
-                    template_name="roleplay/_chat_response.html",
-                    context={"error_message": str(e)},
-                    request=request,
-                )
-
-        response = StreamingHttpResponse(make_stream(), content_type="text/event-stream")
-        response["Cache-Control"] = "no-cache, no-store, must-revalidate"
-        response["X-Accel-Buffering"] = "no"  # nginx 버퍼링 비활성화
-        return response
+                return render(request, "roleplay/_suggested_phrases.html", {"error_message": str(e)})
+            await cache.aset(cache_key, phrases, SUGGESTED_PHRASES_CACHE_TIMEOUT)
+        context_data["suggested_phrases"] = phrases
+
+    return render(request, "roleplay/_suggested_phrases.html", context_data)
+
+
+@staff_member_required
+def client_pool_stats(request) -> JsonResponse:
+    """OpenAI 클라이언트 커넥션 풀 통계 (풀 크기 조정용, 현재 워커 프로세스 기준)"""
+    return JsonResponse(client_registry.stats())
+
+
+@staff_member_required
+def response_cache_stats(request) -> JsonResponse:
+    """응답 캐시 적중률 통계 (현재 워커 프로세스 기준)"""
+    response_cache = get_response_cache()
+    return JsonResponse(response_cache.stats() if response_cache else {"enabled": False})
+
+
+@staff_member_required
+def circuit_breaker_stats(request) -> JsonResponse:
+    """모델별 서킷 브레이커 상태와 재시도/차단 지표 (현재 워커 프로세스 기준)"""
+    return JsonResponse(get_circuit_breaker_stats())
+
+
+@staff_member_required
+def model_routing_stats(request) -> JsonResponse:
+    """모델별 최근 TTFT/생성 속도와 대체 모델 라우팅 통계 (현재 워커 프로세스 기준)"""
+    router = get_model_router()
+    return JsonResponse(router.stats() if router else {"enabled": False})
+
+
+@staff_member_required
+def tracing_stats(request) -> JsonResponse:
+    """채팅 턴의 단계별(span 이름별) 지연 시간 통계 (현재 워커 프로세스의 최근 span 기준)"""
+    ring_buffer = get_ring_buffer(get_tracer())
+    return JsonResponse(ring_buffer.stats() if ring_buffer else {"enabled": False})